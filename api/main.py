@@ -2,17 +2,28 @@
 FastAPI REST API服务
 提供HTTP接口供外部调用
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
 from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
 from langraph_customer_service.agents import CustomerServiceAgent
 from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.embedding_service import start_embedding_service, stop_embedding_service
+from langraph_customer_service.knowledge_base.embeddings import configure_inference_threads
 from langraph_customer_service.state import ConversationState
+from langraph_customer_service.llm_client import llm_client
+from langraph_customer_service.session_store import create_session_store, InMemorySessionStore
+from langraph_customer_service.checkpoint import acreate_checkpointer
 from langraph_customer_service.utils import log
 from config import settings
 
@@ -62,28 +73,84 @@ app.add_middleware(
 
 # 全局变量：存储Agent和会话状态
 agent: Optional[CustomerServiceAgent] = None
-sessions: Dict[str, ConversationState] = {}
+sessions = create_session_store()
+# 启动各阶段耗时（毫秒）
+startup_timings: Dict[str, Any] = {}
+# 就绪状态：预热完成前为 loading，负载均衡据 /ready 决定是否转发流量
+readiness: Dict[str, Any] = {"status": "loading", "phase": "startup"}
+warmup_task: Optional[asyncio.Task] = None
+
+
+def _elapsed_ms(started: float) -> float:
+    """自 started 以来经过的毫秒数"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _warm_up() -> Dict[str, Any]:
+    """预热嵌入模型、索引和重排序模型（在线程池中执行）"""
+    timings: Dict[str, Any] = {}
+    if agent.knowledge_base is not None:
+        readiness["phase"] = "knowledge_base"
+        timings["knowledge_base"] = agent.knowledge_base.warm_up()
+    if agent.reranker is not None:
+        readiness["phase"] = "reranker"
+        timings["reranker"] = agent.reranker.warm_up()
+    return timings
+
+
+async def _run_warmup():
+    """后台预热，完成后标记服务就绪；预热失败不阻止服务，首个请求时再加载"""
+    started = time.perf_counter()
+    try:
+        startup_timings["warmup"] = await asyncio.to_thread(_warm_up)
+        startup_timings["warmup"]["total"] = _elapsed_ms(started)
+        log.info(f"预热完成: {json.dumps(startup_timings['warmup'])}")
+    except Exception as e:
+        log.error(f"预热失败: {e}", exc_info=True)
+        readiness["warmup_error"] = str(e)
+    readiness["status"] = "ready"
+    readiness["phase"] = "ready"
 
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时初始化"""
-    global agent
+    global agent, warmup_task
     
     log.info("初始化智能客服API服务...")
     
+    started = time.perf_counter()
     try:
-        # 加载知识库
+        # 线程数需在加载任何模型之前设置
+        configure_inference_threads()
+        
+        # 加载知识库（索引mmap映射、文档按需读取，嵌入模型默认在首次查询时加载）
         kb = KnowledgeBase()
         if kb.load():
             log.info("知识库加载成功")
+            startup_timings["knowledge_base"] = kb.load_timings
         else:
             log.warning("知识库未找到，使用无知识库模式")
             kb = None
         
-        # 创建Agent
-        agent = CustomerServiceAgent(knowledge_base=kb)
-        log.info("智能客服Agent初始化完成")
+        # 创建Agent（启用检查点时对话状态由检查点存储持久化，重启后可恢复）
+        step = time.perf_counter()
+        checkpointer = await acreate_checkpointer()
+        startup_timings["checkpointer"] = _elapsed_ms(step)
+        
+        step = time.perf_counter()
+        agent = CustomerServiceAgent(knowledge_base=kb, checkpointer=checkpointer)
+        startup_timings["agent"] = _elapsed_ms(step)
+        
+        startup_timings["total"] = _elapsed_ms(started)
+        log.info(f"智能客服Agent初始化完成，启动耗时: {json.dumps(startup_timings)}")
+        
+        # 预热放到后台：端口先开始监听，/ready 在预热完成前返回503
+        if settings.warmup_enabled:
+            readiness["phase"] = "warmup"
+            warmup_task = asyncio.create_task(_run_warmup())
+        else:
+            readiness.update(status="ready", phase="ready")
         
     except Exception as e:
         log.error(f"初始化失败: {e}", exc_info=True)
@@ -94,7 +161,22 @@ async def startup_event():
 async def shutdown_event():
     """应用关闭时清理"""
     log.info("关闭智能客服API服务...")
-    sessions.clear()
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    # 外部存储的会话由多个worker共享，只清理进程内存储
+    if isinstance(sessions, InMemorySessionStore):
+        sessions.clear()
+    # SQLite检查点持有数据库连接，关闭以落盘
+    conn = getattr(agent.checkpointer, "conn", None) if agent is not None else None
+    if conn is not None:
+        await conn.close()
+    if agent is not None and agent.search_batcher is not None:
+        await asyncio.to_thread(agent.search_batcher.close)
+    if agent is not None:
+        agent.tool_executor.close()
+        agent.history.close()
+    if agent is not None and agent.knowledge_base is not None:
+        await asyncio.to_thread(agent.knowledge_base.save_query_cache)
 
 
 @app.get("/", tags=["系统"])
@@ -104,7 +186,8 @@ async def root():
         "name": "智能客服系统 API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready"
     }
 
 
@@ -116,14 +199,60 @@ async def health_check():
         "knowledge_base": agent.knowledge_base is not None if agent else False
     }
     
+    if readiness["status"] != "ready":
+        status = "loading"
+    else:
+        status = "healthy" if all(services.values()) else "degraded"
+    
     return HealthResponse(
-        status="healthy" if all(services.values()) else "degraded",
+        status=status,
         version="1.0.0",
         timestamp=datetime.now().isoformat(),
         services=services
     )
 
 
+@app.get("/ready", tags=["系统"])
+async def ready():
+    """就绪检查：模型预热完成后返回200，之前返回503"""
+    if readiness["status"] != "ready":
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+
+async def _load_session(request: ChatRequest) -> Tuple[str, ConversationState]:
+    """获取或创建会话状态"""
+    session_id = request.session_id or f"session_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    
+    # 启用检查点时历史状态由Agent按 session_id 恢复，只需传入会话标识
+    if agent.checkpointer is not None:
+        return session_id, ConversationState(session_id=session_id, user_id=request.user_id)
+    
+    state = await sessions.aget(session_id)
+    
+    # 如果是新会话，创建状态
+    if state is None:
+        state = ConversationState(
+            session_id=session_id,
+            user_id=request.user_id
+        )
+    
+    return session_id, state
+
+
+async def _save_session(session_id: str, state: ConversationState):
+    """更新会话存储（超出容量或过期的会话由存储自行淘汰）"""
+    if agent.checkpointer is not None:
+        # 状态已由检查点存储持久化
+        return
+    await sessions.aset(session_id, state)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.post("/chat", response_model=ChatResponse, tags=["对话"])
 async def chat(request: ChatRequest):
     """
@@ -139,35 +268,19 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=503, detail="服务未就绪")
     
     try:
-        # 获取或创建会话状态
-        session_id = request.session_id or f"session_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-        state = sessions.get(session_id)
-        
-        # 如果是新会话，创建状态
-        if state is None:
-            state = ConversationState(
-                session_id=session_id,
-                user_id=request.user_id
-            )
+        session_id, state = await _load_session(request)
         
-        # 处理对话
+        # 处理对话（异步执行，LLM请求期间不阻塞事件循环）
         log.info(f"处理消息: session_id={session_id}, message={request.message[:50]}...")
-        response_text, updated_state = agent.chat(request.message, state)
+        response_text, updated_state = await agent.achat(request.message, state)
         
-        # 更新会话缓存
-        sessions[session_id] = updated_state
-        
-        # 清理过期会话（保留最近100个）
-        if len(sessions) > 100:
-            oldest_keys = sorted(sessions.keys())[:50]
-            for key in oldest_keys:
-                del sessions[key]
+        await _save_session(session_id, updated_state)
         
         return ChatResponse(
             response=response_text,
             session_id=session_id,
-            intent=updated_state.intent,
-            requires_human=updated_state.requires_human
+            intent=updated_state.get("intent"),
+            requires_human=updated_state.get("requires_human", False)
         )
         
     except Exception as e:
@@ -175,6 +288,57 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
 
 
+@app.post("/chat/stream", tags=["对话"])
+async def chat_stream(request: ChatRequest):
+    """
+    以 Server-Sent Events 流式返回客服回复
+    
+    事件类型：
+    - token: 回复片段，data 为 {"content": "..."}
+    - end: 结束事件，data 为完整的 ChatResponse（含 intent、session_id、requires_human）
+    - error: 处理失败，data 为 {"detail": "..."}
+    
+    Args:
+        request: 聊天请求
+    """
+    if agent is None:
+        raise HTTPException(status_code=503, detail="服务未就绪")
+    
+    session_id, state = await _load_session(request)
+    log.info(f"流式处理消息: session_id={session_id}, message={request.message[:50]}...")
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for event in agent.astream_chat(request.message, state):
+                if event["type"] == "token":
+                    yield _sse("token", {"content": event["content"]})
+                    continue
+                
+                updated_state = event["state"]
+                await _save_session(session_id, updated_state)
+                
+                final = ChatResponse(
+                    response=event["response"],
+                    session_id=session_id,
+                    intent=updated_state.get("intent"),
+                    requires_human=updated_state.get("requires_human", False)
+                )
+                yield _sse("end", final.model_dump())
+        
+        except Exception as e:
+            log.error(f"流式处理对话时出错: {e}", exc_info=True)
+            yield _sse("error", {"detail": f"处理失败: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 关闭 Nginx 缓冲，保证逐 token 下发
+        }
+    )
+
+
 @app.delete("/session/{session_id}", tags=["会话"])
 async def delete_session(session_id: str):
     """
@@ -183,8 +347,15 @@ async def delete_session(session_id: str):
     Args:
         session_id: 会话ID
     """
-    if session_id in sessions:
-        del sessions[session_id]
+    if agent is not None and agent.checkpointer is not None:
+        if await agent.aget_state(session_id) is None:
+            raise HTTPException(status_code=404, detail="会话不存在")
+        await agent.adelete_session(session_id)
+        return {"message": f"会话 {session_id} 已删除"}
+    
+    if agent is not None:
+        agent.history.forget(session_id)
+    if await sessions.adelete(session_id):
         return {"message": f"会话 {session_id} 已删除"}
     else:
         raise HTTPException(status_code=404, detail="会话不存在")
@@ -198,25 +369,30 @@ async def get_session(session_id: str):
     Args:
         session_id: 会话ID
     """
-    if session_id not in sessions:
+    if agent is not None and agent.checkpointer is not None:
+        state = await agent.aget_state(session_id)
+    else:
+        state = await sessions.aget(session_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="会话不存在")
     
-    state = sessions[session_id]
+    messages = state.get("messages", [])
     
     return {
         "session_id": session_id,
-        "user_id": state.user_id,
-        "message_count": len(state.messages),
-        "intent": state.intent,
-        "status": state.status,
-        "requires_human": state.requires_human,
+        "user_id": state.get("user_id"),
+        "message_count": len(messages),
+        "intent": state.get("intent"),
+        "status": state.get("status"),
+        "requires_human": state.get("requires_human", False),
+        "history_summary": state.get("history_summary"),
         "recent_messages": [
             {
                 "role": msg.role,
                 "content": msg.content,
                 "timestamp": msg.timestamp.isoformat()
             }
-            for msg in state.get_recent_messages(5)
+            for msg in messages[-5:]
         ]
     }
 
@@ -224,10 +400,22 @@ async def get_session(session_id: str):
 @app.get("/stats", tags=["统计"])
 async def get_stats():
     """获取系统统计信息"""
+    session_stats = await asyncio.to_thread(sessions.get_stats)
     return {
-        "active_sessions": len(sessions),
-        "total_messages": sum(len(s.messages) for s in sessions.values()),
+        "active_sessions": session_stats["active_sessions"],
+        "sessions": session_stats,
         "agent_status": "active" if agent else "inactive",
+        "intent_fast_path": agent.rule_classifier.get_stats() if agent and agent.rule_classifier else None,
+        "semantic_cache": agent.semantic_cache.get_stats() if agent and agent.semantic_cache else None,
+        "query_cache": (
+            agent.knowledge_base.query_cache.get_stats()
+            if agent and agent.knowledge_base and agent.knowledge_base.query_cache else None
+        ),
+        "startup": startup_timings,
+        "search_batcher": agent.search_batcher.get_stats() if agent and agent.search_batcher else None,
+        "reranker": agent.reranker.get_stats() if agent and agent.reranker else None,
+        "tools": agent.tool_executor.get_stats() if agent else None,
+        "llm_cache": llm_client.cache.get_stats() if llm_client.cache else None,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -245,14 +433,71 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+def _run_production(host: str, port: int, workers: int):
+    """
+    生产模式启动
+    
+    多worker时：会话和检查点改存进程外存储，嵌入模型由单独的嵌入服务进程加载一次，
+    各worker通过本地套接字调用，避免每个进程各加载一份模型
+    """
+    embedding_process = None
+    
+    if workers > 1:
+        if settings.session_backend == "memory":
+            log.warning("多worker模式下内存会话无法共享，自动切换为SQLite会话存储")
+            os.environ["SESSION_BACKEND"] = "sqlite"
+        
+        # 启用检查点时会话状态以检查点为准，各worker各自的内存检查点会让请求落到其他worker时丢失历史
+        if settings.checkpoint_backend.lower() == "memory":
+            log.warning("多worker模式下内存检查点无法共享，对话历史会随请求分配到不同worker而丢失，自动切换为SQLite检查点存储")
+            os.environ["CHECKPOINT_BACKEND"] = "sqlite"
+        
+        if not settings.embedding_service_address:
+            if sys.platform == "win32":
+                address = "127.0.0.1:8765"
+            else:
+                address = str(settings.data_dir / "embedding.sock")
+            # 未配置密钥时每次启动随机生成，不使用可从源码得知的默认值
+            authkey = settings.embedding_service_authkey or os.urandom(32).hex()
+            log.info(f"启动共享嵌入服务: {address}")
+            embedding_process = start_embedding_service(address, authkey.encode("utf-8"))
+            # worker 进程重新加载配置时读取这些环境变量
+            os.environ["EMBEDDING_SERVICE_ADDRESS"] = address
+            os.environ["EMBEDDING_SERVICE_AUTHKEY"] = authkey
+    
+    log.info(f"启动API服务（生产模式）: http://{host}:{port}, workers={workers}")
+    try:
+        uvicorn.run(
+            "api.main:app",
+            host=host,
+            port=port,
+            workers=workers,
+            reload=False,
+            log_level=settings.log_level.lower()
+        )
+    finally:
+        stop_embedding_service(embedding_process)
+
+
 def main():
     """启动API服务"""
-    log.info(f"启动API服务: http://0.0.0.0:8000")
+    parser = argparse.ArgumentParser(description="智能客服API服务")
+    parser.add_argument("--host", default=settings.api_host, help="监听地址")
+    parser.add_argument("--port", type=int, default=settings.api_port, help="监听端口")
+    parser.add_argument("--workers", type=int, default=settings.api_workers, help="worker进程数（仅生产模式）")
+    parser.add_argument("--prod", action="store_true", help="生产模式：关闭自动重载，支持多worker")
+    args = parser.parse_args()
+    
+    if args.prod:
+        _run_production(args.host, args.port, args.workers)
+        return
+    
+    log.info(f"启动API服务: http://{args.host}:{args.port}")
     uvicorn.run(
         "api.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,  # 开发模式，生产环境应设为False
+        host=args.host,
+        port=args.port,
+        reload=True,  # 开发模式，生产环境请使用 --prod
         log_level=settings.log_level.lower()
     )
 
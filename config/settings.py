@@ -3,6 +3,7 @@
 负责加载和管理所有系统配置
 """
 from pathlib import Path
+from typing import List, Dict, Any
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -56,12 +57,140 @@ class Settings(BaseSettings):
         default="BAAI/bge-large-zh-v1.5",
         alias="EMBEDDING_MODEL"
     )
+    # 嵌入模型推理后端：torch / onnx（download_model.py --export-onnx 导出，默认使用int8量化模型）
+    embedding_backend: str = Field(default="torch", alias="EMBEDDING_BACKEND")
+    embedding_onnx_file: str = Field(default="model_int8.onnx", alias="EMBEDDING_ONNX_FILE")
+    # 本地模型目录，为空时为 ./models/<EMBEDDING_MODEL 的模型名>
+    embedding_model_path: str = Field(default="", alias="EMBEDDING_MODEL_PATH")
+    # CPU推理线程数（嵌入模型和重排序模型，torch / onnx 均生效），0 表示使用框架默认值
+    inference_threads: int = Field(default=0, alias="INFERENCE_THREADS")
+    inference_interop_threads: int = Field(default=0, alias="INFERENCE_INTEROP_THREADS")
+    # 启动预热：服务启动后在后台加载模型并跑几轮合成推理，完成前 /ready 返回503
+    warmup_enabled: bool = Field(default=True, alias="WARMUP_ENABLED")
+    warmup_rounds: int = Field(default=3, alias="WARMUP_ROUNDS")
     
     # 系统配置
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
     max_conversation_history: int = Field(default=10, alias="MAX_CONVERSATION_HISTORY")
+    # 历史压缩配置：超出窗口的早期消息合并进摘要，工具调用记录只保留最近几次
+    history_summary_enabled: bool = Field(default=True, alias="HISTORY_SUMMARY_ENABLED")
+    # 摘要使用的轻量模型，不随 DEFAULT_MODEL 变化；设为空字符串时使用 DEFAULT_MODEL
+    history_summary_model: str = Field(default="Qwen/Qwen2.5-7B-Instruct", alias="HISTORY_SUMMARY_MODEL")
+    # 消息超出窗口该条数后才一次性裁剪并生成摘要，避免窗口填满后每轮都调用摘要模型
+    history_summary_margin: int = Field(default=6, alias="HISTORY_SUMMARY_MARGIN")
+    max_tool_call_history: int = Field(default=5, alias="MAX_TOOL_CALL_HISTORY")
+    # 工具执行：同一轮相互独立的工具调用并行执行，超时或异常时按指数退避重试
+    tool_max_workers: int = Field(default=8, alias="TOOL_MAX_WORKERS")
+    tool_timeout: float = Field(default=5.0, alias="TOOL_TIMEOUT")  # 单次调用超时（秒）
+    tool_max_retries: int = Field(default=1, alias="TOOL_MAX_RETRIES")
+    tool_retry_backoff: float = Field(default=0.2, alias="TOOL_RETRY_BACKOFF")  # 首次重试前等待（秒）
+    # 按工具覆盖超时和重试次数（JSON），有副作用的工具不重试
+    tool_policies: Dict[str, Dict[str, Any]] = Field(
+        default={"process_refund": {"retries": 0}},
+        alias="TOOL_POLICIES"
+    )
+    history_format_cache_size: int = Field(default=1000, alias="HISTORY_FORMAT_CACHE_SIZE")
     vector_store_path: str = Field(default="./data/vector_store", alias="VECTOR_STORE_PATH")
     
+    # 向量索引配置：flat / hnsw / ivf_flat / ivf_pq，均为归一化向量上的内积（余弦相似度）
+    kb_index_type: str = Field(default="flat", alias="KB_INDEX_TYPE")
+    kb_hnsw_m: int = Field(default=32, alias="KB_HNSW_M")
+    kb_ef_search: int = Field(default=64, alias="KB_EF_SEARCH")
+    kb_ivf_nlist: int = Field(default=1024, alias="KB_IVF_NLIST")
+    kb_ivf_nprobe: int = Field(default=16, alias="KB_IVF_NPROBE")
+    kb_pq_m: int = Field(default=64, alias="KB_PQ_M")
+    kb_pq_nbits: int = Field(default=8, alias="KB_PQ_NBITS")
+    kb_score_threshold: float = Field(default=0.3, alias="KB_SCORE_THRESHOLD")
+    # 混合检索：BM25词法检索与向量检索各召回 candidates 个候选，按加权RRF融合
+    kb_lexical_enabled: bool = Field(default=True, alias="KB_LEXICAL_ENABLED")
+    kb_hybrid_candidates: int = Field(default=20, alias="KB_HYBRID_CANDIDATES")
+    kb_rrf_k: int = Field(default=60, alias="KB_RRF_K")
+    kb_rrf_dense_weight: float = Field(default=1.0, alias="KB_RRF_DENSE_WEIGHT")
+    kb_rrf_lexical_weight: float = Field(default=1.0, alias="KB_RRF_LEXICAL_WEIGHT")
+    # 词法命中至少需覆盖的查询词比例；查询本身是SKU/型号编码且词法已命中时跳过嵌入模型
+    kb_lexical_min_match: float = Field(default=0.5, alias="KB_LEXICAL_MIN_MATCH")
+    kb_lexical_skip_dense: bool = Field(default=True, alias="KB_LEXICAL_SKIP_DENSE")
+    # 重排序：检索 candidates 个候选后用交叉编码器重新打分保留前 top_k 个，超出时间预算时沿用检索顺序
+    kb_rerank_enabled: bool = Field(default=False, alias="KB_RERANK_ENABLED")
+    kb_rerank_model: str = Field(default="./models/bge-reranker-base", alias="KB_RERANK_MODEL")
+    kb_rerank_backend: str = Field(default="torch", alias="KB_RERANK_BACKEND")  # torch / onnx
+    kb_rerank_onnx_file: str = Field(default="model_int8.onnx", alias="KB_RERANK_ONNX_FILE")
+    kb_rerank_candidates: int = Field(default=20, alias="KB_RERANK_CANDIDATES")
+    kb_rerank_top_k: int = Field(default=3, alias="KB_RERANK_TOP_K")
+    kb_rerank_budget_ms: float = Field(default=150.0, alias="KB_RERANK_BUDGET_MS")
+    kb_rerank_batch_size: int = Field(default=8, alias="KB_RERANK_BATCH_SIZE")
+    kb_rerank_max_length: int = Field(default=512, alias="KB_RERANK_MAX_LENGTH")
+    # 元数据过滤：候选文档不超过该数量时用保存的向量精确计算，否则在索引内按ID过滤
+    kb_filter_exact_max: int = Field(default=4096, alias="KB_FILTER_EXACT_MAX")
+    # 各意图检索时使用的元数据过滤条件（JSON），未列出的意图不过滤
+    kb_intent_filters: Dict[str, Dict[str, Any]] = Field(
+        default={"product_info": {"category": ["product", "tech"]}, "refund_request": {"category": "faq"}},
+        alias="KB_INTENT_FILTERS"
+    )
+    # 知识库加载配置：mmap映射段索引（多进程共享页缓存，只对IVF类索引生效），是否在加载时预先加载嵌入模型
+    kb_mmap_index: bool = Field(default=True, alias="KB_MMAP_INDEX")
+    kb_preload_model: bool = Field(default=False, alias="KB_PRELOAD_MODEL")
+    # 文档分块配置（token数）：bge模型输入上限为512，检索时每个命中块前后各补 neighbors 块
+    kb_chunk_size: int = Field(default=256, alias="KB_CHUNK_SIZE")
+    kb_chunk_overlap: int = Field(default=32, alias="KB_CHUNK_OVERLAP")
+    kb_chunk_neighbors: int = Field(default=1, alias="KB_CHUNK_NEIGHBORS")
+    # 段内文档向量的存储精度：float32 或 float16（磁盘和页缓存占用减半，读出时转回float32）
+    kb_vector_dtype: str = Field(default="float32", alias="KB_VECTOR_DTYPE")  # float32 / float16
+    # 近重复检测：余弦相似度不低于该值的文档对视为重复，分块矩阵乘法的块大小
+    kb_dedup_threshold: float = Field(default=0.95, alias="KB_DEDUP_THRESHOLD")
+    kb_dedup_block_size: int = Field(default=2048, alias="KB_DEDUP_BLOCK_SIZE")
+    # 删除/更新的文档占比超过该值时，保存后自动合并段
+    kb_compact_deleted_ratio: float = Field(default=0.2, alias="KB_COMPACT_DELETED_RATIO")
+    # 查询向量缓存：按归一化查询文本缓存嵌入向量，大小为0时关闭
+    kb_query_cache_size: int = Field(default=10000, alias="KB_QUERY_CACHE_SIZE")
+    kb_query_cache_persist: bool = Field(default=False, alias="KB_QUERY_CACHE_PERSIST")
+    # 检索微批处理：合并短时间内并发到达的检索请求
+    kb_batch_enabled: bool = Field(default=False, alias="KB_BATCH_ENABLED")
+    kb_batch_max_size: int = Field(default=32, alias="KB_BATCH_MAX_SIZE")
+    kb_batch_max_wait_ms: float = Field(default=5.0, alias="KB_BATCH_MAX_WAIT_MS")
+    
+    # 意图识别配置
+    rule_intent_enabled: bool = Field(default=True, alias="RULE_INTENT_ENABLED")
+    rule_intent_threshold: float = Field(default=0.9, alias="RULE_INTENT_THRESHOLD")
+    # 单次调用模式：意图识别与闲聊回复合并为一次LLM调用
+    single_pass_mode: bool = Field(default=False, alias="SINGLE_PASS_MODE")
+    
+    # 语义回复缓存配置
+    semantic_cache_enabled: bool = Field(default=True, alias="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(default=0.95, alias="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_ttl: int = Field(default=3600, alias="SEMANTIC_CACHE_TTL")
+    semantic_cache_max_size: int = Field(default=1000, alias="SEMANTIC_CACHE_MAX_SIZE")
+    # 只缓存不依赖用户个人工具结果的意图
+    semantic_cache_intents: List[str] = Field(default=["product_info"], alias="SEMANTIC_CACHE_INTENTS")
+    
+    # LLM补全缓存配置：none / memory / sqlite
+    llm_cache_backend: str = Field(default="none", alias="LLM_CACHE_BACKEND")
+    llm_cache_max_size: int = Field(default=1024, alias="LLM_CACHE_MAX_SIZE")
+    llm_cache_path: str = Field(default="./data/llm_cache.sqlite", alias="LLM_CACHE_PATH")
+    
+    # 会话存储配置：memory / sqlite / redis
+    session_backend: str = Field(default="memory", alias="SESSION_BACKEND")
+    session_max_size: int = Field(default=1000, alias="SESSION_MAX_SIZE")
+    session_ttl: int = Field(default=1800, alias="SESSION_TTL")
+    session_max_memory_mb: int = Field(default=256, alias="SESSION_MAX_MEMORY_MB")
+    session_sqlite_path: str = Field(default="./data/sessions.sqlite", alias="SESSION_SQLITE_PATH")
+    redis_url: str = Field(default="redis://localhost:6379/0", alias="REDIS_URL")
+    
+    # 对话检查点配置：none / memory / sqlite，启用后对话状态由LangGraph检查点按会话持久化；
+    # sqlite 检查点只支持异步接口（achat / aget_state / adelete_session）
+    checkpoint_backend: str = Field(default="none", alias="CHECKPOINT_BACKEND")
+    checkpoint_path: str = Field(default="./data/checkpoints.sqlite", alias="CHECKPOINT_PATH")
+    
+    # 服务部署配置
+    api_host: str = Field(default="0.0.0.0", alias="API_HOST")
+    api_port: int = Field(default=8000, alias="API_PORT")
+    api_workers: int = Field(default=1, alias="API_WORKERS")
+    # 共享嵌入服务地址："host:port" 或Unix套接字路径，为空时各进程自行加载模型
+    embedding_service_address: str = Field(default="", alias="EMBEDDING_SERVICE_ADDRESS")
+    # 嵌入服务连接密钥（服务基于pickle通信，密钥泄露即可执行任意代码）：--prod 内置启动时为空则每次随机生成，
+    # 单独部署嵌入服务时必须设置
+    embedding_service_authkey: str = Field(default="", alias="EMBEDDING_SERVICE_AUTHKEY")
+    
     # 业务配置
     customer_service_name: str = Field(default="智能客服小助手", alias="CUSTOMER_SERVICE_NAME")
     company_name: str = Field(default="示例科技有限公司", alias="COMPANY_NAME")
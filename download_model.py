@@ -1,43 +1,107 @@
 """
 Download embedding model to local
 Use China mirror for faster download
+
+用法:
+    python download_model.py                          # 下载 bge-large-zh-v1.5
+    python download_model.py --model small            # 下载更小更快的 bge-small-zh-v1.5
+    python download_model.py --export-onnx            # 下载后导出ONNX并做int8量化（EMBEDDING_BACKEND=onnx）
+    python download_model.py --reranker --export-onnx # 同时下载并导出重排序模型
 """
+import argparse
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
+from langraph_customer_service.knowledge_base.embeddings import MODEL_PRESETS, local_model_path
+from langraph_customer_service.knowledge_base.onnx_utils import export_onnx
+
+RERANKER_MODEL = "BAAI/bge-reranker-base"
+MODEL_SIZES = {
+    "BAAI/bge-large-zh-v1.5": "~1.3GB",
+    "BAAI/bge-small-zh-v1.5": "~95MB",
+    RERANKER_MODEL: "~1.1GB",
+}
+
+
+def download_embedding_model(model_name: str) -> Path:
+    """下载嵌入模型并保存到 ./models 下"""
+    target = local_model_path(model_name)
+
+    print("="*60)
+    print("Model Download")
+    print("="*60)
+    print(f"Model: {model_name}")
+    print(f"Size: {MODEL_SIZES.get(model_name, 'unknown')}")
+    print("Mirror: https://hf-mirror.com")
+    print(f"Save to: {target}")
+    print("="*60)
+    print()
+    print("Downloading... This may take 5-10 minutes...")
+    print()
 
-print("="*60)
-print("Model Download")
-print("="*60)
-print("Model: BAAI/bge-large-zh-v1.5")
-print("Size: ~1.3GB")
-print("Mirror: https://hf-mirror.com")
-print("Cache location: C:\\Users\\User\\.cache\\huggingface\\hub\\")
-print("="*60)
-print()
-print("Downloading... This may take 5-10 minutes...")
-print()
-
-try:
     # 下载模型
-    model = SentenceTransformer('BAAI/bge-large-zh-v1.5')
-    
+    model = SentenceTransformer(model_name)
+    model.save(str(target))
+
     # 测试模型
     print("\n模型下载成功！")
     print("测试模型...")
-    
+
     test_text = ["你好", "世界"]
     embeddings = model.encode(test_text)
-    
+
     print(f"✓ 模型工作正常！")
     print(f"  向量维度: {embeddings.shape}")
-    print(f"  模型已缓存到: {model._modules['0'].auto_model.config._name_or_path}")
+    print(f"  模型已保存到: {target}")
     print()
-    print("现在可以运行项目了！")
-    
-except Exception as e:
-    print(f"\n下载失败: {e}")
-    print("\n备选方案:")
-    print("1. 使用VPN/代理")
-    print("2. 手动下载: https://hf-mirror.com/BAAI/bge-large-zh-v1.5")
-    print("3. 跳过知识库功能，直接测试对话")
+    return target
+
+
+def download_reranker() -> Path:
+    """下载重排序模型并保存到 ./models 下"""
+    from sentence_transformers import CrossEncoder
+
+    target = local_model_path(RERANKER_MODEL)
+    print(f"下载重排序模型: {RERANKER_MODEL} ({MODEL_SIZES[RERANKER_MODEL]}) -> {target}")
+    CrossEncoder(RERANKER_MODEL).save(str(target))
+    print(f"✓ 重排序模型已保存到: {target}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载本地模型")
+    parser.add_argument(
+        "--model", default="large",
+        help=f"嵌入模型：{' / '.join(MODEL_PRESETS)} 或完整模型名（默认 large）"
+    )
+    parser.add_argument("--export-onnx", action="store_true", help="导出ONNX模型（EMBEDDING_BACKEND=onnx 使用）")
+    parser.add_argument("--no-quantize", action="store_true", help="只导出fp32 ONNX模型，不做int8量化")
+    parser.add_argument("--reranker", action="store_true", help=f"同时下载重排序模型 {RERANKER_MODEL}")
+    args = parser.parse_args()
+
+    model_name = MODEL_PRESETS.get(args.model, args.model)
+    try:
+        target = download_embedding_model(model_name)
+        if args.export_onnx:
+            path = export_onnx(target, "embedding", quantize=not args.no_quantize)
+            print(f"✓ ONNX模型已导出: {path}")
+
+        if args.reranker:
+            reranker_path = download_reranker()
+            if args.export_onnx:
+                path = export_onnx(reranker_path, "rerank", quantize=not args.no_quantize)
+                print(f"✓ 重排序ONNX模型已导出: {path}")
+
+        if model_name != MODEL_PRESETS["large"]:
+            print(f"请在配置中设置 EMBEDDING_MODEL={model_name}，并重新导入知识库")
+        print("现在可以运行项目了！")
+
+    except Exception as e:
+        print(f"\n下载失败: {e}")
+        print("\n备选方案:")
+        print("1. 使用VPN/代理")
+        print(f"2. 手动下载: https://hf-mirror.com/{model_name}")
+        print("3. 跳过知识库功能，直接测试对话")
+
 
+if __name__ == "__main__":
+    main()
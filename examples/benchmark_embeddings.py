@@ -0,0 +1,143 @@
+"""
+嵌入模型后端基准测试
+在现有知识库上比较各后端（PyTorch fp32 / ONNX fp32 / ONNX int8 / 小模型）的编码延迟和检索一致性
+
+以 PyTorch 全精度模型的检索结果为基准：
+    - 延迟：单条查询编码的 p50 / p95，以及批量编码文档的吞吐
+    - 精度：各后端 top-k 结果与基准 top-k 的重合率（recall@k），同一模型的后端另算查询向量与基准的余弦相似度
+
+用法:
+    python examples/benchmark_embeddings.py --top-k 5
+    python examples/benchmark_embeddings.py --queries queries.txt --backends torch onnx-int8 small
+"""
+import sys
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+
+# 开发调试：添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.embeddings import (
+    MODEL_PRESETS, OnnxEmbeddingModel, load_local_embedding_model, local_model_path
+)
+from langraph_customer_service.knowledge_base.onnx_utils import ONNX_NAME, ONNX_INT8_NAME
+from langraph_customer_service.utils import log
+
+
+DEFAULT_QUERIES = [
+    "iPhone 15 Pro 多少钱",
+    "MacBook Air 续航多久",
+    "退款需要多长时间到账",
+    "七天无理由退货的条件是什么",
+    "AirPods 怎么连接安卓手机",
+    "订单可以修改收货地址吗",
+    "保修期是多久",
+    "怎么开发票",
+]
+
+
+def load_backend(name: str):
+    """按名称加载待测后端"""
+    if name == "torch":
+        return load_local_embedding_model("torch")
+    if name in ("onnx", "onnx-int8"):
+        return OnnxEmbeddingModel(local_model_path(), ONNX_INT8_NAME if name == "onnx-int8" else ONNX_NAME)
+    if name == "small":
+        return load_local_embedding_model("torch", local_model_path(MODEL_PRESETS["small"]))
+    raise ValueError(f"未知后端: {name}")
+
+
+def measure(model, queries: List[str], documents: List[str], batch_size: int) -> Dict[str, Any]:
+    """测量编码延迟并生成向量"""
+    # 预热，排除首次推理的图构建开销
+    model.encode(queries[:2], normalize_embeddings=True)
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        model.encode([query], normalize_embeddings=True)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    doc_vectors = np.asarray(model.encode(documents, batch_size=batch_size, normalize_embeddings=True), dtype="float32")
+    elapsed = time.perf_counter() - started
+
+    return {
+        "query_vectors": np.asarray(model.encode(queries, normalize_embeddings=True), dtype="float32"),
+        "doc_vectors": doc_vectors,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "docs_per_sec": len(documents) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def top_k(query_vectors: np.ndarray, doc_vectors: np.ndarray, k: int) -> np.ndarray:
+    """精确检索每个查询的 top-k 文档序号"""
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入模型后端基准测试")
+    parser.add_argument(
+        "--backends", nargs="+", default=["torch", "onnx", "onnx-int8", "small"],
+        help="待测后端：torch / onnx / onnx-int8 / small，第一个为基准"
+    )
+    parser.add_argument("--queries", type=Path, default=None, help="查询文件，每行一条，默认使用内置查询")
+    parser.add_argument("--top-k", type=int, default=5, help="比较检索结果的 top-k")
+    parser.add_argument("--batch-size", type=int, default=32, help="文档编码批大小")
+    args = parser.parse_args()
+
+    kb = KnowledgeBase()
+    if not kb.load():
+        log.error("知识库不存在，请先运行 examples/init_knowledge_base.py")
+        return
+    documents = [doc["content"] for doc in kb.get_all_documents()]
+    queries = (
+        [line.strip() for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+        if args.queries else DEFAULT_QUERIES
+    )
+    k = min(args.top_k, len(documents))
+    log.info(f"基准测试: {len(documents)} 条文档, {len(queries)} 个查询, top-{k}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in args.backends:
+        try:
+            model = load_backend(name)
+        except Exception as e:
+            log.warning(f"跳过后端 {name}: {e}")
+            continue
+        results[name] = measure(model, queries, documents, args.batch_size)
+        results[name]["top_k"] = top_k(results[name]["query_vectors"], results[name]["doc_vectors"], k)
+        del model
+
+    if not results:
+        return
+    baseline_name = next(iter(results))
+    baseline = results[baseline_name]
+
+    print(f"\n基准: {baseline_name}（模型 {settings.embedding_model}）")
+    print(f"{'后端':<12}{'p50(ms)':>10}{'p95(ms)':>10}{'docs/sec':>12}{f'recall@{k}':>12}{'查询余弦':>10}")
+    for name, result in results.items():
+        overlap = np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(result["top_k"], baseline["top_k"])
+        ])
+        # 不同模型的向量空间不可比，只对同一模型的后端计算余弦
+        if result["query_vectors"].shape == baseline["query_vectors"].shape and name != "small":
+            cosine = f"{np.mean(np.sum(result['query_vectors'] * baseline['query_vectors'], axis=1)):.4f}"
+        else:
+            cosine = "-"
+        print(
+            f"{name:<12}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+            f"{result['docs_per_sec']:>12.1f}{overlap:>12.3f}{cosine:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+知识库近重复检测
+直接读取知识库保存的文档向量做分块矩阵乘法，不加载嵌入模型
+
+用法:
+    python examples/find_duplicates.py
+    python examples/find_duplicates.py --threshold 0.98 --limit 50
+    python examples/find_duplicates.py --delete     # 删除每对中后写入的文档并保存
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# 开发调试：添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.utils import log
+
+
+def preview(text: str, width: int = 40) -> str:
+    """单行预览文档内容"""
+    text = " ".join(text.split())
+    return text if len(text) <= width else text[:width] + "..."
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库近重复检测")
+    parser.add_argument(
+        "--threshold", type=float, default=settings.kb_dedup_threshold,
+        help=f"余弦相似度阈值（默认 {settings.kb_dedup_threshold}）"
+    )
+    parser.add_argument(
+        "--block-size", type=int, default=settings.kb_dedup_block_size,
+        help=f"分块矩阵乘法的块大小（默认 {settings.kb_dedup_block_size}）"
+    )
+    parser.add_argument("--limit", type=int, default=20, help="最多打印的重复对数")
+    parser.add_argument("--delete", action="store_true", help="删除每对中后写入的文档并保存知识库")
+    args = parser.parse_args()
+
+    kb = KnowledgeBase()
+    # 只读取保存的向量，不需要嵌入模型
+    if not kb.load(preload_model=False):
+        log.error("知识库不存在，请先运行 examples/init_knowledge_base.py")
+        return
+
+    pairs = kb.find_near_duplicates(args.threshold, args.block_size)
+    print(f"\n{kb.count} 条文档中发现 {len(pairs)} 对近重复（阈值 {args.threshold}）")
+    for pair in pairs[:args.limit]:
+        doc_a, doc_b = kb.get_document(pair["id_a"]), kb.get_document(pair["id_b"])
+        print(f"\n{pair['score']:.4f}")
+        print(f"  {pair['id_a']}: {preview(doc_a['content'])}")
+        print(f"  {pair['id_b']}: {preview(doc_b['content'])}")
+
+    if args.delete and pairs:
+        duplicates = sorted({pair["id_b"] for pair in pairs})
+        deleted = kb.delete_documents(duplicates)
+        kb.save()
+        print(f"\n已删除 {deleted} 条重复文档")
+
+
+if __name__ == "__main__":
+    main()
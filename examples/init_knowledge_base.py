@@ -200,13 +200,22 @@ def main():
     metadata.extend([{"category": "faq", "type": "policy"}] * 7)
     metadata.extend([{"category": "tech", "type": "tutorial"}] * 4)
     
-    # 添加到知识库
-    kb.add_documents(all_docs, metadata)
+    # 按稳定ID分块同步到已有知识库：内容未变化的块不会重新编码
+    ids = [f"{meta['category']}-{meta['type']}-{i:03d}" for i, meta in enumerate(metadata)]
+    kb.load()
+    stats = kb.ingest_documents(all_docs, ids, metadata)
     
-    # 保存知识库
+    # 删除本次清单中已不存在的文档（及旧版未分块的文档）
+    current = set(ids)
+    stats["deleted"] += kb.delete_documents([
+        doc["id"] for doc in kb.get_all_documents()
+        if doc["metadata"].get("parent_id") not in current
+    ])
+    
+    # 保存知识库（只写入变化的部分）
     kb.save()
     
-    log.info(f"知识库初始化完成！共添加 {len(all_docs)} 条文档")
+    log.info(f"知识库初始化完成！共 {kb.count} 条文档，本次同步: {stats}")
     
     # 测试检索
     log.info("\n测试知识库检索...")
@@ -220,7 +229,8 @@ def main():
         log.info(f"\n查询: {query}")
         results = kb.search(query, top_k=2)
         for i, result in enumerate(results, 1):
-            log.info(f"结果{i} (相似度: {result['score']:.4f}):")
+            score = "-" if result["score"] is None else f"{result['score']:.4f}"
+            log.info(f"结果{i} (相似度: {score}):")
             log.info(f"{result['document'][:100]}...")
 
 
@@ -1,4 +1,5 @@
 """智能代理模块"""
 from .customer_service import CustomerServiceAgent
+from .intent_rules import RuleBasedIntentClassifier
 
-__all__ = ["CustomerServiceAgent"]
+__all__ = ["CustomerServiceAgent", "RuleBasedIntentClassifier"]
@@ -2,32 +2,87 @@
 智能客服Agent
 基于LangGraph实现的多轮对话客服系统
 """
-from typing import Dict, Any, List, Optional, Literal
+from typing import Dict, Any, List, Optional, Literal, AsyncIterator, Tuple
+import asyncio
 import json
 import re
 from datetime import datetime
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda, RunnableConfig
 
+from langraph_customer_service.agents.intent_rules import RuleBasedIntentClassifier
+from langraph_customer_service.checkpoint import is_async_only
+from langraph_customer_service.history import HistoryCompactor
 from langraph_customer_service.state import ConversationState, Message
 from langraph_customer_service.llm_client import llm_client
-from langraph_customer_service.knowledge_base import KnowledgeBase
-from langraph_customer_service.tools import query_order, process_refund, check_inventory, get_logistics_info
+from langraph_customer_service.knowledge_base import (
+    KnowledgeBase, SemanticCache, SearchBatcher, CrossEncoderReranker
+)
+from langraph_customer_service.tools import (
+    query_order, process_refund, check_inventory, get_logistics_info, ToolRegistry, ToolExecutor
+)
 from config import settings
 from langraph_customer_service.utils import log
 
 
+# 需要调用业务工具的意图
+TOOL_INTENTS = ("order_query", "refund_request", "inventory_check", "logistics_query")
+
+# 依赖上文的追问（指代、承接），回复取决于对话历史，不能复用语义缓存
+FOLLOW_UP_PATTERN = re.compile(r"它|这个|那个|这款|那款|这些|那些|这种|那种|上面|刚才|之前|前面|^那|^还有|^再|呢[？?]?$")
+
+
 class CustomerServiceAgent:
     """智能客服Agent"""
     
-    def __init__(self, knowledge_base: Optional[KnowledgeBase] = None):
+    def __init__(
+        self,
+        knowledge_base: Optional[KnowledgeBase] = None,
+        single_pass: Optional[bool] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None
+    ):
         """
         初始化客服Agent
         
         Args:
             knowledge_base: 知识库实例
+            single_pass: 是否启用单次调用模式，默认使用配置
+            checkpointer: 检查点存储，提供后对话状态由其按 session_id 持久化，
+                调用方每轮只需传入新消息
         """
         self.knowledge_base = knowledge_base
+        self.single_pass = settings.single_pass_mode if single_pass is None else single_pass
+        self.checkpointer = checkpointer
+        
+        # 规则意图分类器：意图明确的请求跳过LLM分类
+        self.rule_classifier = (
+            RuleBasedIntentClassifier(threshold=settings.rule_intent_threshold)
+            if settings.rule_intent_enabled else None
+        )
+        
+        # 语义回复缓存：重复的产品咨询直接复用回复，跳过检索和生成
+        self.semantic_cache = (
+            SemanticCache(knowledge_base)
+            if knowledge_base is not None and settings.semantic_cache_enabled else None
+        )
+        
+        # 检索微批处理：并发会话的检索请求合并为一次批量检索
+        self.search_batcher = (
+            SearchBatcher(knowledge_base)
+            if knowledge_base is not None and settings.kb_batch_enabled else None
+        )
+        
+        # 重排序：多取候选由交叉编码器重新打分，提示词中只放最相关的几条
+        self.reranker = (
+            CrossEncoderReranker()
+            if knowledge_base is not None and settings.kb_rerank_enabled else None
+        )
+        
+        # 历史压缩：状态只保留最近窗口，早期对话合并进摘要
+        self.history = HistoryCompactor()
+        
         self.graph = self._build_graph()
         
         # 工具映射
@@ -37,6 +92,9 @@ class CustomerServiceAgent:
             "check_inventory": check_inventory,
             "get_logistics_info": get_logistics_info
         }
+        # 工具执行引擎：按工具设置超时和重试，同一轮的独立调用并行执行
+        self.tool_registry = ToolRegistry.from_tools(self.tools)
+        self.tool_executor = ToolExecutor(self.tool_registry)
         
         log.info("智能客服Agent初始化完成")
     
@@ -46,29 +104,55 @@ class CustomerServiceAgent:
         # 创建状态图
         workflow = StateGraph(ConversationState)
         
-        # 添加节点
-        workflow.add_node("classify_intent", self._classify_intent)
-        workflow.add_node("retrieve_knowledge", self._retrieve_knowledge)
-        workflow.add_node("call_tools", self._call_tools)
-        workflow.add_node("generate_response", self._generate_response)
-        workflow.add_node("check_satisfaction", self._check_satisfaction)
+        # 添加节点（同时提供同步/异步实现，invoke 与 ainvoke 共用同一张图）
+        workflow.add_node("retrieve_knowledge", self._node(self._retrieve_knowledge, self._aretrieve_knowledge))
+        workflow.add_node("call_tools", self._node(self._call_tools, self._acall_tools))
+        workflow.add_node("generate_response", self._node(self._generate_response, self._agenerate_response))
+        workflow.add_node("check_satisfaction", self._node(self._check_satisfaction, self._acheck_satisfaction))
+        workflow.add_node("use_draft", self._node(self._use_draft, self._ause_draft))
+        workflow.add_node("compact_history", self._node(self._compact_history, self._acompact_history))
         
-        # 设置入口点
-        workflow.set_entry_point("classify_intent")
+        if self.single_pass:
+            # 单次调用模式：一次LLM调用完成意图识别，闲聊直接采用起草的回复
+            workflow.add_node("plan_turn", self._node(self._plan_turn, self._aplan_turn))
+            workflow.set_entry_point("plan_turn")
+            workflow.add_conditional_edges(
+                "plan_turn",
+                self._route_after_plan,
+                {
+                    "knowledge": "retrieve_knowledge",
+                    "tool": "call_tools",
+                    "general": "generate_response",
+                    "draft": "use_draft"
+                }
+            )
+        else:
+            workflow.add_node("classify_intent", self._node(self._classify_intent, self._aclassify_intent))
+            
+            # 设置入口点
+            workflow.set_entry_point("classify_intent")
+            
+            # 添加条件边
+            workflow.add_conditional_edges(
+                "classify_intent",
+                self._route_after_intent,
+                {
+                    "knowledge": "retrieve_knowledge",
+                    "tool": "call_tools",
+                    "general": "generate_response"
+                }
+            )
         
-        # 添加条件边
+        # 知识检索后生成回复（命中语义缓存时直接采用缓存回复）
         workflow.add_conditional_edges(
-            "classify_intent",
-            self._route_after_intent,
+            "retrieve_knowledge",
+            self._route_after_retrieve,
             {
-                "knowledge": "retrieve_knowledge",
-                "tool": "call_tools",
-                "general": "generate_response"
+                "generate": "generate_response",
+                "draft": "use_draft"
             }
         )
-        
-        # 知识检索后生成回复
-        workflow.add_edge("retrieve_knowledge", "generate_response")
+        workflow.add_edge("use_draft", "check_satisfaction")
         
         # 工具调用后生成回复
         workflow.add_edge("call_tools", "generate_response")
@@ -76,17 +160,23 @@ class CustomerServiceAgent:
         # 生成回复后检查满意度
         workflow.add_edge("generate_response", "check_satisfaction")
         
-        # 条件结束
+        # 条件结束：结束前压缩对话历史
         workflow.add_conditional_edges(
             "check_satisfaction",
             self._should_continue,
             {
-                "continue": END,
-                "escalate": END
+                "continue": "compact_history",
+                "escalate": "compact_history"
             }
         )
+        workflow.add_edge("compact_history", END)
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
+    
+    @staticmethod
+    def _node(func, afunc) -> RunnableLambda:
+        """将同步与异步两种实现包装为同一个图节点"""
+        return RunnableLambda(func, afunc=afunc, name=func.__name__.lstrip("_"))
     
     def _classify_intent(self, state: ConversationState) -> Dict[str, Any]:
         """
@@ -95,16 +185,57 @@ class CustomerServiceAgent:
         """
         log.info("执行意图分类")
         
+        fast_result = self._fast_path_intent(state)
+        if fast_result is not None:
+            return fast_result
+        
+        response = llm_client.invoke(self._build_intent_messages(state))
+        return self._parse_intent(response, state)
+    
+    async def _aclassify_intent(
+        self,
+        state: ConversationState,
+        config: Optional[RunnableConfig] = None
+    ) -> Dict[str, Any]:
+        """意图分类节点（异步）"""
+        log.info("执行意图分类")
+        
+        fast_result = self._fast_path_intent(state)
+        if fast_result is not None:
+            return fast_result
+        
+        response = await llm_client.ainvoke(self._build_intent_messages(state), config=config)
+        return self._parse_intent(response, state)
+    
+    def _fast_path_intent(self, state: ConversationState) -> Optional[Dict[str, Any]]:
+        """
+        规则快速分类
+        命中时直接返回意图分类结果，否则返回None交给LLM
+        """
+        if self.rule_classifier is None:
+            return None
+        
+        messages = state.get("messages", [])
+        user_message = messages[-1].content if messages else ""
+        
+        result = self.rule_classifier.classify(user_message)
+        if result is None:
+            return None
+        
+        log.info(f"规则意图命中: {result['intent']}, 置信度: {result['confidence']}")
+        return self._apply_intent(result, state)
+    
+    def _build_intent_messages(self, state: ConversationState) -> List[Dict[str, str]]:
+        """构造意图分类的LLM消息"""
         # 获取最新用户消息
         messages = state.get("messages", [])
         user_message = messages[-1].content if messages else ""
         
         # 构造意图分类prompt
-        recent_messages = messages[-3:] if len(messages) > 3 else messages
         prompt = f"""你是一个专业的客服意图分类器。请分析用户的问题，识别意图和提取关键实体。
 
 对话历史：
-{self._format_history(recent_messages)}
+{self._format_history(state, 3)}
 
 当前用户问题：{user_message}
 
@@ -119,6 +250,7 @@ class CustomerServiceAgent:
 请以JSON格式返回：
 {{
     "intent": "意图类型",
+    "intents": ["消息中包含多个诉求时列出全部意图类型，如同时查订单和物流"],
     "entities": {{
         "order_id": "订单号（如适用）",
         "product_name": "商品名称（如适用）",
@@ -131,37 +263,133 @@ class CustomerServiceAgent:
 }}
 """
         
-        response = llm_client.invoke([
+        return [
             {"role": "system", "content": "你是一个专业的意图分类器，只返回JSON格式的结果。"},
             {"role": "user", "content": prompt}
-        ])
-        
+        ]
+    
+    def _parse_intent(self, response: str, state: ConversationState) -> Dict[str, Any]:
+        """解析意图分类结果"""
         try:
             # 解析意图
             result = self._extract_json(response)
-            intent = result.get("intent", "general_chat")
-            entities = result.get("entities", {})
-            
-            # 获取或初始化 context
-            context = dict(state.get("context", {}))
-            context["needs_tool"] = result.get("needs_tool", False)
-            context["needs_knowledge"] = result.get("needs_knowledge", False)
-            
-            log.info(f"意图识别: {intent}, 实体: {entities}")
+            return self._apply_intent(result, state)
             
+        except Exception as e:
+            log.error(f"意图分类失败: {e}")
             return {
-                "intent": intent,
-                "entities": entities,
-                "context": context
+                "intent": "general_chat",
+                "entities": {},
+                "context": {"needs_tool": False, "needs_knowledge": False}
             }
-            
+    
+    def _plan_turn(self, state: ConversationState) -> Dict[str, Any]:
+        """
+        单次调用模式的意图识别节点
+        一次结构化输出同时返回意图、实体，以及闲聊场景下的回复草稿
+        """
+        log.info("执行意图识别（单次调用模式）")
+        
+        fast_result = self._fast_path_intent(state)
+        if fast_result is not None:
+            return {**fast_result, "draft_response": None}
+        
+        response = llm_client.invoke(
+            self._build_plan_messages(state),
+            response_format={"type": "json_object"}
+        )
+        return self._parse_plan(response, state)
+    
+    async def _aplan_turn(
+        self,
+        state: ConversationState,
+        config: Optional[RunnableConfig] = None
+    ) -> Dict[str, Any]:
+        """单次调用模式的意图识别节点（异步）"""
+        log.info("执行意图识别（单次调用模式）")
+        
+        fast_result = self._fast_path_intent(state)
+        if fast_result is not None:
+            return {**fast_result, "draft_response": None}
+        
+        response = await llm_client.ainvoke(
+            self._build_plan_messages(state),
+            response_format={"type": "json_object"},
+            config=config
+        )
+        return self._parse_plan(response, state)
+    
+    def _build_plan_messages(self, state: ConversationState) -> List[Dict[str, str]]:
+        """在意图分类prompt基础上，要求闲聊场景直接起草回复"""
+        messages = self._build_intent_messages(state)
+        messages[0] = {
+            "role": "system",
+            "content": f"你是{settings.customer_service_name}，代表{settings.company_name}为客户提供专业、友好的服务，"
+                       f"同时负责识别用户意图。只返回JSON格式的结果。"
+        }
+        messages[1]["content"] += """
+如果意图是 general_chat，且既不需要工具也不需要知识库，请在JSON中额外返回 "answer" 字段，
+直接给出礼貌、简洁的客服回复；其他情况 "answer" 返回空字符串。
+"""
+        return messages
+    
+    def _parse_plan(self, response: str, state: ConversationState) -> Dict[str, Any]:
+        """解析单次调用结果，闲聊回复草稿写入 draft_response"""
+        try:
+            result = self._extract_json(response)
         except Exception as e:
             log.error(f"意图分类失败: {e}")
             return {
                 "intent": "general_chat",
                 "entities": {},
-                "context": {"needs_tool": False, "needs_knowledge": False}
+                "context": {"needs_tool": False, "needs_knowledge": False},
+                "draft_response": None
             }
+        
+        update = self._apply_intent(result, state)
+        
+        draft = None
+        if (
+            update["intent"] == "general_chat"
+            and not result.get("needs_tool")
+            and not result.get("needs_knowledge")
+        ):
+            draft = (result.get("answer") or "").strip() or None
+        
+        update["draft_response"] = draft
+        return update
+    
+    def _use_draft(self, state: ConversationState) -> Dict[str, Any]:
+        """直接采用现成回复（单次调用起草或语义缓存命中），不再调用LLM"""
+        log.info("采用现成回复，跳过回复生成")
+        return self._finish_response(state["draft_response"])
+    
+    async def _ause_draft(self, state: ConversationState) -> Dict[str, Any]:
+        """采用起草回复（异步）"""
+        return self._use_draft(state)
+    
+    def _apply_intent(self, result: Dict[str, Any], state: ConversationState) -> Dict[str, Any]:
+        """将意图分类结果写回状态"""
+        intent = result.get("intent", "general_chat")
+        entities = result.get("entities", {})
+        
+        # 获取或初始化 context
+        context = dict(state.get("context", {}))
+        context["needs_tool"] = result.get("needs_tool", False)
+        context["needs_knowledge"] = result.get("needs_knowledge", False)
+        # 一条消息中的多个工具类诉求，主意图排在第一位
+        extra = result.get("intents") if isinstance(result.get("intents"), list) else []
+        context["intents"] = list(dict.fromkeys(
+            [intent] + [name for name in extra if name in TOOL_INTENTS]
+        ))
+        
+        log.info(f"意图识别: {context['intents'] if len(context['intents']) > 1 else intent}, 实体: {entities}")
+        
+        return {
+            "intent": intent,
+            "entities": entities,
+            "context": context
+        }
     
     def _retrieve_knowledge(self, state: ConversationState) -> Dict[str, Any]:
         """
@@ -177,8 +405,29 @@ class CustomerServiceAgent:
         messages = state.get("messages", [])
         user_message = messages[-1].content if messages else ""
         
-        # 检索相关文档
-        results = self.knowledge_base.search(user_message, top_k=3)
+        if self._use_semantic_cache(state):
+            cached = self.semantic_cache.lookup(user_message, self._semantic_cache_scope(state))
+            if cached is not None:
+                return {"retrieved_docs": [], "draft_response": cached}
+        
+        # 检索相关文档：按意图限定知识类别，类别内没有相关文档时再全库检索
+        # 启用重排序时多取候选，重排序后保留前 kb_rerank_top_k 个
+        top_k = settings.kb_rerank_candidates if self.reranker is not None else 3
+        filters = settings.kb_intent_filters.get(state.get("intent"))
+        results = self._search_knowledge(user_message, filters, top_k)
+        if not results and filters:
+            log.info(f"过滤条件 {filters} 下没有相关文档，改为全库检索")
+            results = self._search_knowledge(user_message, None, top_k)
+        
+        if self.reranker is not None:
+            try:
+                results = self.reranker.rerank(user_message, results, settings.kb_rerank_top_k)
+            except Exception as e:
+                log.error(f"重排序失败，沿用检索顺序: {e}")
+                results = results[:settings.kb_rerank_top_k]
+        
+        # 同一文档的命中块合并，并补上相邻块
+        results = self.knowledge_base.expand_chunks(results)
         
         if results:
             retrieved_docs = [r["document"] for r in results]
@@ -188,89 +437,178 @@ class CustomerServiceAgent:
             log.info("未检索到相关文档")
             return {"retrieved_docs": []}
     
+    def _search_knowledge(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]],
+        top_k: int = 3
+    ) -> List[Dict[str, Any]]:
+        """检索知识库（启用微批处理时经由批处理器）"""
+        if self.search_batcher is not None:
+            return self.search_batcher.search(query, top_k=top_k, filters=filters)
+        return self.knowledge_base.search(query, top_k=top_k, filters=filters)
+    
+    async def _aretrieve_knowledge(self, state: ConversationState) -> Dict[str, Any]:
+        """知识检索节点（异步）：向量检索是CPU密集操作，放到线程池执行，避免阻塞事件循环"""
+        return await asyncio.to_thread(self._retrieve_knowledge, state)
+    
     def _call_tools(self, state: ConversationState) -> Dict[str, Any]:
         """
         工具调用节点
-        根据意图调用相应的业务工具
+        根据意图规划工具调用，相互独立的调用并行执行
         """
-        intent = state.get("intent")
+        intents = state.get("context", {}).get("intents") or [state.get("intent")]
         entities = state.get("entities", {})
-        tool_calls = state.get("tool_calls", [])
-        log.info(f"执行工具调用: intent={intent}")
+        log.info(f"执行工具调用: intents={intents}")
         
-        tool_result = None
+        records: List[Dict[str, Any]] = []
+        calls, deferred, missing = self._plan_tool_calls(intents, entities, state.get("tool_calls", []))
+        records.extend(self.tool_executor.run(calls))
+        if deferred:
+            # 依赖本批结果的调用（只有订单号的物流查询）在第二批执行
+            calls, _, more_missing = self._plan_tool_calls(
+                deferred, entities, state.get("tool_calls", []) + records, records, allow_deferred=False
+            )
+            records.extend(self.tool_executor.run(calls))
+            missing += more_missing
+        return self._finish_tool_calls(state, records, missing)
+    
+    async def _acall_tools(self, state: ConversationState) -> Dict[str, Any]:
+        """工具调用节点（异步）"""
+        intents = state.get("context", {}).get("intents") or [state.get("intent")]
+        entities = state.get("entities", {})
+        log.info(f"执行工具调用: intents={intents}")
         
-        try:
-            if intent == "order_query":
-                order_id = entities.get("order_id")
-                if order_id:
-                    tool_result = query_order(order_id)
-                
-            elif intent == "refund_request":
-                order_id = entities.get("order_id")
-                reason = entities.get("reason", "用户申请退款")
-                if order_id:
-                    tool_result = process_refund(order_id, reason)
-            
-            elif intent == "inventory_check":
-                product_name = entities.get("product_name")
-                if product_name:
-                    tool_result = check_inventory(product_name)
+        records: List[Dict[str, Any]] = []
+        calls, deferred, missing = self._plan_tool_calls(intents, entities, state.get("tool_calls", []))
+        records.extend(await self.tool_executor.arun(calls))
+        if deferred:
+            calls, _, more_missing = self._plan_tool_calls(
+                deferred, entities, state.get("tool_calls", []) + records, records, allow_deferred=False
+            )
+            records.extend(await self.tool_executor.arun(calls))
+            missing += more_missing
+        return self._finish_tool_calls(state, records, missing)
+    
+    def _plan_tool_calls(
+        self,
+        intents: List[str],
+        entities: Dict[str, Any],
+        tool_calls: List[Dict[str, Any]],
+        turn_calls: Optional[List[Dict[str, Any]]] = None,
+        allow_deferred: bool = True
+    ) -> Tuple[List[Dict[str, Any]], List[str], List[str]]:
+        """
+        将本轮意图规划为可立即执行的工具调用
+        
+        Args:
+            intents: 本轮需要处理的意图
+            entities: 抽取到的实体
+            tool_calls: 已有的工具调用记录，用于补全参数
+            turn_calls: 本轮已执行的工具调用记录，有副作用的工具只复用本轮的查询结果
+            allow_deferred: 是否允许推迟到下一批执行
+        
+        Returns:
+            (工具调用列表, 推迟执行的意图, 缺少必要参数的意图)
+        """
+        calls: List[Dict[str, Any]] = []
+        deferred: List[str] = []
+        missing: List[str] = []
+        turn_calls = turn_calls or []
+        for intent in intents:
+            call = self._tool_call_for(intent, entities, tool_calls, turn_calls)
+            if call is not None:
+                calls.append(call)
+            elif intent == "logistics_query" and entities.get("order_id") and allow_deferred:
+                deferred.append(intent)
+            else:
+                missing.append(intent)
+        
+        if deferred and not any(call["tool"] == "query_order" for call in calls):
+            # 只有订单号的物流查询：先查订单取得物流单号
+            calls.append(self._tool_call_for("order_query", entities, tool_calls, turn_calls))
+        return calls, deferred, missing
+    
+    def _tool_call_for(
+        self,
+        intent: str,
+        entities: Dict[str, Any],
+        tool_calls: List[Dict[str, Any]],
+        turn_calls: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """按意图和实体构造工具调用，缺少必要参数时返回None"""
+        if intent == "order_query":
+            order_id = entities.get("order_id")
+            if order_id:
+                return {"intent": intent, "tool": "query_order", "args": {"order_id": order_id}}
+        
+        elif intent == "refund_request":
+            order_id = entities.get("order_id")
+            if order_id:
+                args = {"order_id": order_id, "reason": entities.get("reason", "用户申请退款")}
+                # 本轮已查询过该订单时直接复用；之前轮次的结果可能已过期（订单状态会变），由退款流程重新查询
+                order = self._recent_order(turn_calls, order_id)
+                if order is not None:
+                    args["order"] = order
+                return {"intent": intent, "tool": "process_refund", "args": args}
+        
+        elif intent == "inventory_check":
+            product_name = entities.get("product_name")
+            if product_name:
+                return {"intent": intent, "tool": "check_inventory", "args": {"product_name": product_name}}
+        
+        elif intent == "logistics_query":
+            tracking_number = entities.get("tracking_number")
             
-            elif intent == "logistics_query":
-                tracking_number = entities.get("tracking_number")
-                
-                # 如果当前没有物流单号，尝试从上一次订单查询中获取
-                if not tracking_number and tool_calls:
-                    for call in reversed(tool_calls):
-                        if call.get("intent") == "order_query":
-                            result = call.get("result", {})
-                            if result.get("success"):
-                                data = result.get("data", {})
-                                tracking_number = data.get("tracking_number")
-                                if tracking_number:
-                                    log.info(f"从上下文中获取物流单号: {tracking_number}")
-                                    break
-                
+            # 如果当前没有物流单号，尝试从上一次订单查询中获取
+            if not tracking_number:
+                order = self._recent_order(tool_calls, entities.get("order_id"))
+                tracking_number = order.get("tracking_number") if order else None
                 if tracking_number:
-                    tool_result = get_logistics_info(tracking_number)
+                    log.info(f"从上下文中获取物流单号: {tracking_number}")
             
-            if tool_result:
-                # 使用 operator.add，直接返回新的工具调用，会自动追加
-                new_tool_call = {
-                    "intent": intent,
-                    "result": tool_result,
-                    "timestamp": datetime.now().isoformat()
-                }
-                log.info(f"工具调用成功: {intent}")
-                return {"tool_calls": [new_tool_call]}
-            else:
-                log.warning(f"工具调用失败: 缺少必要参数")
-                # 返回一个错误信息的工具调用记录，而不是空字典
-                error_call = {
-                    "intent": intent,
-                    "result": {
-                        "success": False,
-                        "message": f"缺少必要参数，无法执行{intent}操作",
-                        "data": None
-                    },
-                    "timestamp": datetime.now().isoformat()
-                }
-                return {"tool_calls": [error_call]}
-                
-        except Exception as e:
-            log.error(f"工具调用异常: {e}")
-            # 返回异常信息，而不是空字典
-            error_call = {
+            if tracking_number:
+                return {"intent": intent, "tool": "get_logistics_info", "args": {"tracking_number": tracking_number}}
+        
+        return None
+    
+    @staticmethod
+    def _recent_order(tool_calls: List[Dict[str, Any]], order_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """最近一次成功的订单查询结果，指定订单号时只匹配该订单"""
+        for call in reversed(tool_calls):
+            if call.get("intent") != "order_query":
+                continue
+            result = call.get("result") or {}
+            data = result.get("data") or {}
+            if result.get("success") and (order_id is None or data.get("order_id") == order_id):
+                return data
+        return None
+    
+    def _finish_tool_calls(
+        self,
+        state: ConversationState,
+        records: List[Dict[str, Any]],
+        missing: List[str]
+    ) -> Dict[str, Any]:
+        """合并本轮的工具调用记录，缺少参数的意图记为失败"""
+        for intent in missing:
+            log.warning(f"工具调用失败: 缺少必要参数, intent={intent}")
+            # 返回一个错误信息的工具调用记录，而不是空字典
+            records.append({
                 "intent": intent,
                 "result": {
                     "success": False,
-                    "message": f"工具调用异常: {str(e)}",
+                    "message": f"缺少必要参数，无法执行{intent}操作",
                     "data": None
                 },
                 "timestamp": datetime.now().isoformat()
-            }
-            return {"tool_calls": [error_call]}
+            })
+        
+        # 记录本轮的调用数，生成回复时带上本轮全部结果
+        context = dict(state.get("context", {}))
+        context["turn_tool_calls"] = len(records)
+        # 直接返回新的工具调用，会自动追加
+        return {"tool_calls": records, "context": context}
     
     def _generate_response(self, state: ConversationState) -> Dict[str, Any]:
         """
@@ -279,6 +617,66 @@ class CustomerServiceAgent:
         """
         log.info("生成回复")
         
+        response = llm_client.invoke(self._build_response_messages(state))
+        
+        if self._use_semantic_cache(state):
+            self._remember_response(state, response)
+        
+        return self._finish_response(response)
+    
+    async def _agenerate_response(
+        self,
+        state: ConversationState,
+        config: Optional[RunnableConfig] = None
+    ) -> Dict[str, Any]:
+        """
+        生成回复节点（异步）
+        
+        透传 config 以便 astream_events 能收到模型的逐 token 回调
+        """
+        log.info("生成回复")
+        
+        response = await llm_client.ainvoke(self._build_response_messages(state), config=config)
+        
+        if self._use_semantic_cache(state):
+            await asyncio.to_thread(self._remember_response, state, response)
+        
+        return self._finish_response(response)
+    
+    def _use_semantic_cache(self, state: ConversationState) -> bool:
+        """
+        当前轮次是否适用语义缓存：仅限走知识检索、且不依赖工具结果的意图；
+        缓存只按当前消息匹配，依赖上文的追问（如“那它多少钱”）不使用
+        """
+        if self.semantic_cache is None:
+            return False
+        context = state.get("context", {})
+        messages = state.get("messages", [])
+        return (
+            state.get("intent") in settings.semantic_cache_intents
+            and context.get("needs_knowledge", False)
+            and not context.get("needs_tool", False)
+            and bool(messages)
+            and not FOLLOW_UP_PATTERN.search(messages[-1].content.strip())
+        )
+    
+    @staticmethod
+    def _semantic_cache_scope(state: ConversationState) -> str:
+        """语义缓存范围：意图及其检索过滤条件，过滤条件变化后旧条目不再命中"""
+        intent = state.get("intent")
+        filters = settings.kb_intent_filters.get(intent)
+        return f"{intent}|{json.dumps(filters, ensure_ascii=False, sort_keys=True)}"
+    
+    def _remember_response(self, state: ConversationState, response: str):
+        """将生成的回复写入语义缓存"""
+        messages = state.get("messages", [])
+        try:
+            self.semantic_cache.store(messages[-1].content, self._semantic_cache_scope(state), response)
+        except Exception as e:
+            log.warning(f"写入语义缓存失败: {e}")
+    
+    def _build_response_messages(self, state: ConversationState) -> List[Dict[str, str]]:
+        """构造回复生成的LLM消息"""
         messages = state.get("messages", [])
         tool_calls = state.get("tool_calls", [])
         retrieved_docs = state.get("retrieved_docs", [])
@@ -289,10 +687,13 @@ class CustomerServiceAgent:
         # 构建上下文
         context_parts = []
         
-        # 添加工具调用结果
+        # 添加工具调用结果（本轮并行执行的全部调用）
         if tool_calls:
-            latest_tool_call = tool_calls[-1]
-            context_parts.append(f"工具调用结果：\n{json.dumps(latest_tool_call['result'], ensure_ascii=False, indent=2)}")
+            turn_calls = tool_calls[-max(1, state.get("context", {}).get("turn_tool_calls", 1)):]
+            results = [call["result"] for call in turn_calls]
+            context_parts.append(
+                f"工具调用结果：\n{json.dumps(results[0] if len(results) == 1 else results, ensure_ascii=False, indent=2)}"
+            )
         
         # 添加检索到的知识
         if retrieved_docs:
@@ -314,8 +715,7 @@ class CustomerServiceAgent:
 """
         
         # 构建对话历史
-        recent_messages = messages[-5:] if len(messages) > 5 else messages
-        history = self._format_history(recent_messages)
+        history = self._format_history(state, 5)
         
         # 生成回复
         prompt = f"""对话历史：
@@ -328,12 +728,14 @@ class CustomerServiceAgent:
 
 请生成专业、友好的回复："""
         
-        response = llm_client.invoke([
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
-        ])
-        
-        # 创建新消息 - 使用 operator.add，messages 会自动追加
+        ]
+    
+    def _finish_response(self, response: str) -> Dict[str, Any]:
+        """将LLM回复写回状态"""
+        # 创建新消息 - messages 会自动追加
         new_message = Message(role="assistant", content=response)
         
         log.info(f"回复生成完成: {len(response)} 字符")
@@ -363,7 +765,11 @@ class CustomerServiceAgent:
                 "status": "escalated"
             }
         else:
-            return {"status": "completed"}
+            return {"requires_human": False, "status": "completed"}
+    
+    async def _acheck_satisfaction(self, state: ConversationState) -> Dict[str, Any]:
+        """满意度检查节点（异步）：纯规则判断，直接复用同步实现"""
+        return self._check_satisfaction(state)
     
     def _route_after_intent(self, state: ConversationState) -> Literal["knowledge", "tool", "general"]:
         """意图分类后的路由决策"""
@@ -375,19 +781,38 @@ class CustomerServiceAgent:
         else:
             return "general"
     
+    def _route_after_retrieve(self, state: ConversationState) -> Literal["generate", "draft"]:
+        """知识检索后的路由决策：命中语义缓存时跳过生成节点"""
+        if state.get("draft_response"):
+            return "draft"
+        return "generate"
+    
+    def _route_after_plan(self, state: ConversationState) -> Literal["knowledge", "tool", "general", "draft"]:
+        """单次调用模式下的路由决策：已有回复草稿时跳过生成节点"""
+        if state.get("draft_response"):
+            return "draft"
+        return self._route_after_intent(state)
+    
     def _should_continue(self, state: ConversationState) -> Literal["continue", "escalate"]:
         """判断是否继续对话"""
         if state.get("requires_human", False):
             return "escalate"
         return "continue"
     
-    def _format_history(self, messages: List[Message]) -> str:
-        """格式化对话历史"""
-        formatted = []
-        for msg in messages:
-            role_name = "用户" if msg.role == "user" else "客服"
-            formatted.append(f"{role_name}: {msg.content}")
-        return "\n".join(formatted)
+    def _compact_history(self, state: ConversationState) -> Dict[str, Any]:
+        """
+        历史压缩节点
+        将消息和工具调用记录裁剪到窗口内，早期对话合并进摘要
+        """
+        return self.history.compact(state)
+    
+    async def _acompact_history(self, state: ConversationState) -> Dict[str, Any]:
+        """历史压缩节点（异步）"""
+        return await self.history.acompact(state)
+    
+    def _format_history(self, state: ConversationState, limit: int) -> str:
+        """格式化最近 limit 条对话历史（含早期对话摘要），按会话缓存"""
+        return self.history.format_history(state, limit)
     
     def _extract_json(self, text: str) -> Dict[str, Any]:
         """
@@ -406,21 +831,42 @@ class CustomerServiceAgent:
         
         raise ValueError("无法从响应中提取JSON")
     
-    def chat(self, user_input: str, state: Optional[Dict[str, Any]] = None) -> tuple[str, Dict[str, Any]]:
+    def _prepare_input(
+        self,
+        user_input: str,
+        state: Optional[Dict[str, Any]]
+    ) -> tuple[Dict[str, Any], Optional[RunnableConfig]]:
         """
-        处理用户输入并返回回复
+        根据已有状态和用户输入构造本轮工作流输入
         
-        Args:
-            user_input: 用户输入
-            state: 对话状态（可选，如果是新对话则为None）
+        启用检查点时只发送新消息和本轮需重置的字段，历史状态由检查点存储按
+        thread_id（即 session_id）恢复；否则沿用传入的完整状态
         
         Returns:
-            (回复文本, 更新后的状态)
+            (工作流输入, 运行配置)
         """
+        # 创建新的用户消息 - 由 append_or_replace 自动追加
+        user_message = Message(role="user", content=user_input)
+        
+        # 每轮都需要重置的字段，避免上一轮的检索结果和回复草稿串到本轮
+        turn_reset = {
+            "messages": [user_message],  # 会自动追加到现有消息
+            "retrieved_docs": [],
+            "draft_response": None
+        }
+        
+        if self.checkpointer is not None:
+            state = state or {}
+            session_id = state.get("session_id") or self._new_session_id()
+            input_state = {"session_id": session_id, **turn_reset}
+            if state.get("user_id"):
+                input_state["user_id"] = state["user_id"]
+            return input_state, self._thread_config(session_id)
+        
         # 创建或更新状态
         if state is None:
             state = {
-                "session_id": f"session_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                "session_id": self._new_session_id(),
                 "messages": [],
                 "intent": None,
                 "entities": {},
@@ -432,17 +878,153 @@ class CustomerServiceAgent:
                 "status": "active"
             }
         
-        # 创建新的用户消息 - 使用 operator.add，会自动追加
-        user_message = Message(role="user", content=user_input)
-        
         # 准备输入状态 - 添加用户消息
+        # 无检查点时图从空状态开始，需带上已压缩到窗口内的历史消息
         input_state = dict(state)
-        input_state["messages"] = [user_message]  # 会自动追加到现有消息
+        input_state.update(turn_reset)
+        input_state["messages"] = list(state.get("messages", [])) + [user_message]
+        return input_state, None
+    
+    @staticmethod
+    def _new_session_id() -> str:
+        """生成新的会话ID"""
+        return f"session_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    
+    @staticmethod
+    def _thread_config(session_id: str) -> RunnableConfig:
+        """会话对应的检查点线程配置"""
+        return {"configurable": {"thread_id": session_id}}
+    
+    def chat(self, user_input: str, state: Optional[Dict[str, Any]] = None) -> tuple[str, Dict[str, Any]]:
+        """
+        处理用户输入并返回回复
+        
+        Args:
+            user_input: 用户输入
+            state: 对话状态（可选，如果是新对话则为None）；启用检查点时只需包含 session_id
+        
+        Returns:
+            (回复文本, 更新后的状态)
+        """
+        self._require_sync_checkpointer()
+        input_state, config = self._prepare_input(user_input, state)
         
         # 执行工作流
-        result_state = self.graph.invoke(input_state)
+        result_state = self.graph.invoke(input_state, config)
         
         # LangGraph 返回的是字典
         response = result_state.get("current_response", "")
         
         return response, result_state
+    
+    async def achat(self, user_input: str, state: Optional[Dict[str, Any]] = None) -> tuple[str, Dict[str, Any]]:
+        """
+        异步处理用户输入并返回回复
+        
+        供 FastAPI 等异步服务调用，LLM请求不会阻塞事件循环
+        
+        Args:
+            user_input: 用户输入
+            state: 对话状态（可选，如果是新对话则为None）；启用检查点时只需包含 session_id
+        
+        Returns:
+            (回复文本, 更新后的状态)
+        """
+        input_state, config = self._prepare_input(user_input, state)
+        
+        result_state = await self.graph.ainvoke(input_state, config)
+        
+        response = result_state.get("current_response", "")
+        
+        return response, result_state
+    
+    def get_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        从检查点存储读取会话状态
+        
+        Args:
+            session_id: 会话ID
+        
+        Returns:
+            会话状态，未启用检查点或会话不存在时返回None
+        """
+        if self.checkpointer is None:
+            return None
+        self._require_sync_checkpointer()
+        snapshot = self.graph.get_state(self._thread_config(session_id))
+        return snapshot.values or None
+    
+    async def aget_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """异步读取会话状态"""
+        if self.checkpointer is None:
+            return None
+        snapshot = await self.graph.aget_state(self._thread_config(session_id))
+        return snapshot.values or None
+    
+    def delete_session(self, session_id: str):
+        """删除会话在检查点存储中的全部记录"""
+        self._require_sync_checkpointer()
+        self.history.forget(session_id)
+        if self.checkpointer is not None:
+            self.checkpointer.delete_thread(session_id)
+    
+    def _require_sync_checkpointer(self):
+        """同步接口不能使用只支持异步的检查点存储"""
+        if is_async_only(self.checkpointer):
+            raise RuntimeError(
+                "SQLite检查点存储只支持异步接口，请改用 achat() / aget_state() / adelete_session()，"
+                "或使用 CHECKPOINT_BACKEND=memory"
+            )
+    
+    async def adelete_session(self, session_id: str):
+        """异步删除会话检查点"""
+        self.history.forget(session_id)
+        if self.checkpointer is not None:
+            await self.checkpointer.adelete_thread(session_id)
+    
+    async def astream_chat(
+        self,
+        user_input: str,
+        state: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式处理用户输入
+        
+        基于 LangGraph 的 astream_events，逐个产出回复生成节点的 token，
+        最后产出一次包含完整状态的结束事件
+        
+        Args:
+            user_input: 用户输入
+            state: 对话状态（可选，如果是新对话则为None）
+        
+        Yields:
+            {"type": "token", "content": "..."} 或 {"type": "end", "response": "...", "state": {...}}
+        """
+        input_state, config = self._prepare_input(user_input, state)
+        
+        streamed = False
+        result_state: Dict[str, Any] = {}
+        
+        async for event in self.graph.astream_events(input_state, config, version="v2"):
+            kind = event["event"]
+            
+            if kind == "on_chat_model_stream":
+                # 只转发回复生成节点的输出，意图分类的JSON不下发给用户
+                if event.get("metadata", {}).get("langgraph_node") != "generate_response":
+                    continue
+                content = event["data"]["chunk"].content
+                if content:
+                    streamed = True
+                    yield {"type": "token", "content": content}
+            
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # 根节点结束事件携带最终状态
+                result_state = event["data"].get("output") or {}
+        
+        response = result_state.get("current_response", "")
+        
+        # 回复未经模型流式生成（如命中缓存）时，整体作为一个 token 下发
+        if not streamed and response:
+            yield {"type": "token", "content": response}
+        
+        yield {"type": "end", "response": response, "state": result_state}
@@ -0,0 +1,201 @@
+"""
+规则意图识别模块
+在调用LLM之前，用正则和关键词快速识别意图明确的请求
+"""
+from typing import Dict, Any, List, Optional
+import re
+import threading
+
+
+# 实体抽取规则
+ORDER_ID_PATTERN = re.compile(r"(?<![A-Za-z0-9])ORD\d+", re.IGNORECASE)
+TRACKING_NUMBER_PATTERN = re.compile(r"(?<![A-Za-z0-9])SF\d{6,}", re.IGNORECASE)
+PRODUCT_PATTERN = re.compile(
+    r"iPhone\s*\d+\s*(?:Pro\s*Max|Pro|Plus)?|MacBook\s*(?:Pro|Air)?|AirPods\s*(?:Pro)?",
+    re.IGNORECASE
+)
+REFUND_REASON_PATTERN = re.compile(r"(?:因为|由于|原因是|原因[:：])\s*(.+)")
+# 不是发起退款：否定（"不要退款"）或询问已有退款的进度（"退款进度"）
+REFUND_NEGATION_PATTERN = re.compile(r"(?:不|没|别|无需|不用|不想|取消)[^，。,.!！?？]{0,3}(?:退款|退货|退钱)")
+REFUND_STATUS_PATTERN = re.compile(r"(?:退款|退货)\s*(?:进度|状态|到账|到哪|多久|什么时候|怎么样|了吗|成功)")
+# 退款会直接调用有副作用的 process_refund，规则命中也只给出低于阈值的置信度，由LLM确认
+RULE_REFUND_CONFIDENCE = 0.6
+
+# 关键词表
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "refund_request": ["退款", "退货", "退钱", "申请退"],
+    "logistics_query": ["物流", "快递", "运单", "到哪了", "到哪里", "派送", "配送进度"],
+    "order_query": ["订单", "查单", "发货了吗", "发货没", "下的单"],
+    "inventory_check": ["库存", "有货", "有没有货", "还有货", "缺货", "现货"],
+}
+
+
+class RuleBasedIntentClassifier:
+    """基于正则和关键词的意图快速分类器"""
+
+    def __init__(self, threshold: float = 0.9):
+        """
+        初始化规则分类器
+
+        Args:
+            threshold: 置信度阈值，低于该值时交给LLM分类
+        """
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._total = 0
+        self._hits = 0
+        self._intent_hits: Dict[str, int] = {}
+
+    def extract_entities(self, text: str) -> Dict[str, Any]:
+        """
+        抽取订单号、物流单号、商品名称和退款原因
+
+        Args:
+            text: 用户消息
+
+        Returns:
+            实体字典，只包含抽取到的字段
+        """
+        entities: Dict[str, Any] = {}
+
+        match = ORDER_ID_PATTERN.search(text)
+        if match:
+            entities["order_id"] = match.group(0).upper()
+
+        match = TRACKING_NUMBER_PATTERN.search(text)
+        if match:
+            entities["tracking_number"] = match.group(0).upper()
+
+        match = PRODUCT_PATTERN.search(text)
+        if match:
+            entities["product_name"] = " ".join(match.group(0).split())
+
+        match = REFUND_REASON_PATTERN.search(text)
+        if match:
+            entities["reason"] = match.group(1).strip("。！!，, ")
+
+        return entities
+
+    def match_keywords(self, text: str) -> List[str]:
+        """
+        返回消息中命中关键词的所有意图
+
+        Args:
+            text: 用户消息
+
+        Returns:
+            意图列表，按关键词表顺序排列
+        """
+        return [
+            intent for intent, keywords in INTENT_KEYWORDS.items()
+            if any(keyword in text for keyword in keywords)
+        ]
+
+    def score(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        对消息打分，不考虑阈值
+
+        Args:
+            text: 用户消息
+
+        Returns:
+            与LLM分类结果同结构的字典，无法判断时返回None
+        """
+        entities = self.extract_entities(text)
+        matched = self.match_keywords(text)
+
+        scores: Dict[str, float] = {}
+
+        # 退款：否定和进度查询不算退款申请；其余也不走快速路径，交给LLM确认
+        if "refund_request" in matched and (
+            REFUND_NEGATION_PATTERN.search(text) or REFUND_STATUS_PATTERN.search(text)
+        ):
+            matched.remove("refund_request")
+        if "refund_request" in matched:
+            scores["refund_request"] = RULE_REFUND_CONFIDENCE
+
+        # 物流：物流单号本身就足够明确
+        if "tracking_number" in entities:
+            scores["logistics_query"] = 0.95
+        elif "logistics_query" in matched:
+            scores["logistics_query"] = 0.7
+
+        # 订单：有订单号且有订单关键词最明确，只有订单号次之
+        if "order_id" in entities:
+            if "order_query" in matched:
+                scores["order_query"] = 0.95
+            elif not matched:
+                scores["order_query"] = 0.9
+            else:
+                scores["order_query"] = 0.7
+
+        # 库存：需要能识别出商品
+        if "inventory_check" in matched:
+            scores["inventory_check"] = 0.95 if "product_name" in entities else 0.6
+
+        if not scores:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        intent, confidence = ranked[0]
+
+        # 多个意图同样明确时视为歧义，交给LLM
+        if len(ranked) > 1 and ranked[1][1] >= confidence:
+            confidence -= 0.2
+
+        if intent == "refund_request":
+            entities.setdefault("reason", "用户申请退款")
+
+        # 一条消息中的其他明确诉求（如"查订单ORD001和物流"），工具节点会一并并行执行
+        intents = [
+            name for name, value in ranked
+            if name == intent or value >= 0.9 or (name in matched and value >= 0.7)
+        ]
+
+        return {
+            "intent": intent,
+            "intents": intents,
+            "entities": entities,
+            "confidence": confidence,
+            "needs_tool": True,
+            "needs_knowledge": False
+        }
+
+    def classify(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        规则分类，并记录命中统计
+
+        Args:
+            text: 用户消息
+
+        Returns:
+            置信度达到阈值时返回分类结果，否则返回None
+        """
+        result = self.score(text)
+        hit = result is not None and result["confidence"] >= self.threshold
+
+        with self._lock:
+            self._total += 1
+            if hit:
+                self._hits += 1
+                intent = result["intent"]
+                self._intent_hits[intent] = self._intent_hits.get(intent, 0) + 1
+
+        return result if hit else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取命中统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "total": self._total,
+                "hits": self._hits,
+                "fallbacks": self._total - self._hits,
+                "hit_rate": self._hits / self._total if self._total else 0.0,
+                "intent_hits": dict(self._intent_hits),
+                "threshold": self.threshold
+            }
@@ -0,0 +1,65 @@
+"""
+对话状态持久化模块
+为LangGraph工作流创建检查点存储（checkpointer），以 session_id 作为 thread_id
+
+SQLite检查点使用 AsyncSqliteSaver，只能配合异步接口使用；同步的 chat() 等方法
+需要 memory 检查点或不启用检查点
+"""
+from typing import Optional
+from pathlib import Path
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from config import settings
+from langraph_customer_service.utils import log
+
+
+async def acreate_checkpointer(backend: Optional[str] = None) -> Optional[BaseCheckpointSaver]:
+    """
+    创建异步检查点存储，供 achat() / astream_chat() 使用
+
+    Args:
+        backend: none / memory / sqlite，默认使用配置
+
+    Returns:
+        检查点存储实例，backend 为 none 时返回None
+    """
+    backend = (backend or settings.checkpoint_backend).lower()
+
+    if backend == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        path = _ensure_parent(settings.checkpoint_path)
+        log.info(f"使用SQLite检查点存储（异步）: {path}")
+        return AsyncSqliteSaver(await aiosqlite.connect(str(path)))
+
+    return _create_basic(backend)
+
+
+def is_async_only(checkpointer: Optional[BaseCheckpointSaver]) -> bool:
+    """检查点存储是否只支持异步接口（AsyncSqliteSaver）"""
+    if checkpointer is None:
+        return False
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        return False
+    return isinstance(checkpointer, AsyncSqliteSaver)
+
+
+def _create_basic(backend: str) -> Optional[BaseCheckpointSaver]:
+    """创建非SQLite的检查点存储"""
+    if backend == "memory":
+        log.info("使用内存检查点存储")
+        return MemorySaver()
+
+    if backend != "none":
+        log.warning(f"未知的检查点存储后端: {backend}，不启用检查点")
+    return None
+
+
+def _ensure_parent(path: str) -> Path:
+    """确保数据库所在目录存在"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,275 @@
+"""
+对话历史压缩模块
+将对话状态裁剪到固定窗口，窗口之外的早期消息在后台增量合并进摘要，
+并按会话缓存格式化后的历史文本，使长会话的提示词和内存开销保持平稳
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+import threading
+from config import settings
+from langraph_customer_service.state import ConversationState, Message, ReplaceList
+from langraph_customer_service.utils import log
+
+
+SUMMARY_PROMPT = """请将以下客服对话内容合并进已有摘要，生成一段新的简洁摘要。
+保留用户身份、订单号、商品、诉求和已给出的处理结论，省略寒暄，不超过200字。
+
+已有摘要：
+{summary}
+
+新增对话：
+{history}
+
+新的摘要："""
+
+
+class HistoryCompactor:
+    """
+    对话历史压缩器
+
+    messages 超过 max_messages + margin 条时一次裁剪回最近 max_messages 条，
+    避免窗口填满后每轮都要重新生成摘要；tool_calls 只保留最近 max_tool_calls 次。
+
+    被移出窗口的消息先放入 unsummarized_messages，由后台线程用轻量模型增量合并进
+    history_summary，不占用回复的响应时间；摘要在之后某一轮压缩时写回状态，
+    写回之前格式化历史会带上这些消息，提示词中不会丢失内容
+    """
+
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        max_tool_calls: Optional[int] = None,
+        summarize: Optional[bool] = None,
+        cache_size: Optional[int] = None,
+        llm=None,
+        margin: Optional[int] = None
+    ):
+        """
+        初始化历史压缩器
+
+        Args:
+            max_messages: 保留的最近消息条数，默认使用配置
+            max_tool_calls: 保留的最近工具调用次数，默认使用配置
+            summarize: 是否将移出窗口的消息合并进摘要，默认使用配置
+            cache_size: 格式化历史缓存的最大会话数，默认使用配置
+            llm: 生成摘要的LLM客户端，默认按 HISTORY_SUMMARY_MODEL 懒加载
+            margin: 超出窗口多少条消息后才裁剪并生成摘要，默认使用配置
+        """
+        # 至少保留一问一答，满意度检查依赖上一条用户消息
+        self.max_messages = max(2, max_messages if max_messages is not None else settings.max_conversation_history)
+        self.max_tool_calls = max(1, max_tool_calls if max_tool_calls is not None else settings.max_tool_call_history)
+        self.summarize = settings.history_summary_enabled if summarize is None else summarize
+        self.cache_size = cache_size if cache_size is not None else settings.history_format_cache_size
+        self.margin = max(0, margin if margin is not None else settings.history_summary_margin)
+
+        self._llm = llm
+        # (会话ID, 条数) -> (历史指纹, 格式化文本)，按访问顺序排列
+        self._format_cache: "OrderedDict[Tuple[str, int], Tuple[tuple, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 会话ID -> (起始摘要, 合并的消息指纹, 摘要任务)
+        self._tasks: Dict[str, Tuple[str, tuple, Future]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+        self._closed = False
+
+    @property
+    def llm(self):
+        """摘要用LLM客户端（首次使用时创建）"""
+        if self._llm is None:
+            from langraph_customer_service.llm_client import LLMClient
+
+            self._llm = LLMClient(
+                model=settings.history_summary_model or None,
+                temperature=0.3,
+                max_tokens=400
+            )
+        return self._llm
+
+    def compact(self, state: ConversationState) -> Dict[str, Any]:
+        """
+        压缩对话状态（不等待LLM）
+
+        裁剪超出窗口的消息，写回已完成的后台摘要，并为尚未摘要的消息启动后台任务
+
+        Args:
+            state: 当前对话状态
+
+        Returns:
+            状态更新，无需压缩时返回空字典
+        """
+        update, dropped = self._trim(state)
+        if not self.summarize or not state.get("session_id"):
+            return update
+
+        session_id = state["session_id"]
+        summary = state.get("history_summary") or ""
+        pending = list(state.get("unsummarized_messages") or []) + dropped
+        changed = bool(dropped)
+
+        finished = self._collect(session_id, summary, pending)
+        if finished is not None:
+            summary, covered = finished
+            update["history_summary"] = summary
+            pending = pending[covered:]
+            changed = True
+
+        # 摘要持续失败时待摘要消息最多保留两批
+        limit = 2 * (self.max_messages + self.margin)
+        if len(pending) > limit:
+            log.warning(f"待摘要消息过多，丢弃最早的 {len(pending) - limit} 条")
+            pending = pending[-limit:]
+            changed = True
+
+        if changed:
+            update["unsummarized_messages"] = pending
+        if pending:
+            self._schedule(session_id, summary, pending)
+        return update
+
+    async def acompact(self, state: ConversationState) -> Dict[str, Any]:
+        """压缩对话状态（异步），摘要在后台线程生成，不阻塞事件循环"""
+        return self.compact(state)
+
+    def _collect(self, session_id: str, summary: str, pending: List[Message]) -> Optional[Tuple[str, int]]:
+        """
+        取出会话已完成的后台摘要
+
+        Returns:
+            (新摘要, 已合并的待摘要消息数)，没有可用结果时返回None
+        """
+        with self._lock:
+            task = self._tasks.get(session_id)
+            if task is None or not task[2].done():
+                return None
+            del self._tasks[session_id]
+
+        base_summary, fingerprint, future = task
+        try:
+            new_summary = future.result()
+        except Exception as e:
+            log.warning(f"生成对话摘要失败，将重新生成: {e}")
+            return None
+
+        # 任务启动后状态被其他进程更新过（如多worker），结果作废
+        covered = fingerprint[0]
+        if base_summary != summary or self._fingerprint(pending[:covered]) != fingerprint:
+            return None
+        return new_summary, covered
+
+    def _schedule(self, session_id: str, summary: str, pending: List[Message]):
+        """为待摘要消息启动后台摘要任务（同一会话同时只有一个）"""
+        with self._lock:
+            if self._closed or session_id in self._tasks:
+                return
+            messages = self._build_summary_messages(summary, pending)
+            future = self._pool.submit(lambda: self.llm.invoke(messages).strip())
+            self._tasks[session_id] = (summary, self._fingerprint(pending), future)
+
+    @staticmethod
+    def _fingerprint(messages: List[Message]) -> tuple:
+        """一组消息的指纹"""
+        return (len(messages), messages[0].timestamp if messages else None, messages[-1].timestamp if messages else None)
+
+    def format_history(self, state: ConversationState, limit: int) -> str:
+        """
+        格式化最近 limit 条消息，窗口之外的内容以摘要开头
+
+        同一会话历史未变化时直接返回缓存的文本
+
+        Args:
+            state: 对话状态
+            limit: 纳入的最近消息条数
+
+        Returns:
+            格式化后的历史文本
+        """
+        # 尚未合并进摘要的消息仍按原文展示
+        messages = list(state.get("unsummarized_messages") or []) + list(state.get("messages", []))
+        recent = messages[-limit:] if len(messages) > limit else messages
+        summary = state.get("history_summary") or ""
+
+        session_id = state.get("session_id")
+        if not session_id:
+            return self._render(recent, summary)
+
+        key = (session_id, limit)
+        fingerprint = (
+            len(recent),
+            recent[0].timestamp if recent else None,
+            recent[-1].timestamp if recent else None,
+            summary
+        )
+
+        with self._lock:
+            cached = self._format_cache.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                self._format_cache.move_to_end(key)
+                return cached[1]
+
+        text = self._render(recent, summary)
+
+        with self._lock:
+            self._format_cache[key] = (fingerprint, text)
+            self._format_cache.move_to_end(key)
+            while len(self._format_cache) > self.cache_size:
+                self._format_cache.popitem(last=False)
+
+        return text
+
+    def forget(self, session_id: str):
+        """清除会话的格式化历史缓存和未写回的摘要任务"""
+        with self._lock:
+            for key in [k for k in self._format_cache if k[0] == session_id]:
+                del self._format_cache[key]
+            task = self._tasks.pop(session_id, None)
+        if task is not None:
+            task[2].cancel()
+
+    def close(self, wait: bool = False):
+        """
+        关闭后台摘要线程池
+
+        未写回的摘要随之丢弃，对应消息仍保存在会话的 unsummarized_messages 中，
+        重启后的下一轮压缩会重新摘要
+
+        Args:
+            wait: 是否等待正在执行的摘要完成；排队中的任务总是取消
+        """
+        with self._lock:
+            self._closed = True
+            self._tasks.clear()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _trim(self, state: ConversationState) -> Tuple[Dict[str, Any], List[Message]]:
+        """裁剪消息和工具调用记录，返回 (状态更新, 被移出窗口的消息)"""
+        update: Dict[str, Any] = {}
+        dropped: List[Message] = []
+
+        messages = state.get("messages", [])
+        if len(messages) > self.max_messages + self.margin:
+            dropped = messages[:-self.max_messages]
+            update["messages"] = ReplaceList(messages[-self.max_messages:])
+            log.debug(f"压缩对话历史: 移出 {len(dropped)} 条消息")
+
+        tool_calls = state.get("tool_calls", [])
+        if len(tool_calls) > self.max_tool_calls:
+            update["tool_calls"] = ReplaceList(tool_calls[-self.max_tool_calls:])
+
+        return update, dropped
+
+    def _build_summary_messages(self, summary: str, dropped: List[Message]) -> List[Dict[str, str]]:
+        """构造增量摘要的LLM消息"""
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "无",
+            history=self._render(dropped, "")
+        )
+        return [{"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _render(messages: List[Message], summary: str) -> str:
+        """将摘要和消息渲染为文本"""
+        formatted = [f"早前对话摘要: {summary}"] if summary else []
+        for msg in messages:
+            role_name = "用户" if msg.role == "user" else "客服"
+            formatted.append(f"{role_name}: {msg.content}")
+        return "\n".join(formatted)
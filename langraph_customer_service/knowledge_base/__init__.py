@@ -1,4 +1,9 @@
 """知识库模块"""
 from .vector_store import KnowledgeBase
+from .index import IndexSpec
+from .chunking import DocumentChunker
+from .semantic_cache import SemanticCache
+from .search_batcher import SearchBatcher
+from .reranker import CrossEncoderReranker
 
-__all__ = ["KnowledgeBase"]
+__all__ = ["KnowledgeBase", "IndexSpec", "DocumentChunker", "SemanticCache", "SearchBatcher", "CrossEncoderReranker"]
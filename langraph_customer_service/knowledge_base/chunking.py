@@ -0,0 +1,160 @@
+"""
+文档分块模块
+按中文句子边界将长文档切分为不超过嵌入模型长度上限的块，相邻块之间保留重叠
+"""
+from typing import Dict, Any, List, Optional, Callable
+import re
+from config import settings
+
+
+# 句末标点（含其后紧跟的右引号/右括号）或换行处断句
+_SENTENCE_END = re.compile(r"([。！？；!?;…]+[”’」』）)\]]*|\n+)")
+# CJK字符逐字计为一个token，其余按连续字母数字/单个符号计
+_TOKEN = re.compile(r"[㐀-鿿豈-﫿]|[A-Za-z0-9]+|[^\sA-Za-z0-9㐀-鿿豈-﫿]")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算token数（无分词器时使用，bge中文模型对汉字逐字切分，估算较准）"""
+    return len(_TOKEN.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    按中英文句末标点和换行切分句子，标点保留在句尾
+
+    Args:
+        text: 文本
+
+    Returns:
+        句子列表（去除首尾空白并丢弃空句，按换行断开的句子保留一个换行符）
+    """
+    parts = _SENTENCE_END.split(text)
+    sentences = []
+    # split 结果为 [句子, 分隔符, 句子, 分隔符, ...]
+    for i in range(0, len(parts), 2):
+        body = parts[i].strip()
+        if not body:
+            continue
+        delimiter = parts[i + 1] if i + 1 < len(parts) else ""
+        sentences.append(body + ("\n" if delimiter.startswith("\n") else delimiter))
+    return sentences
+
+
+class DocumentChunker:
+    """
+    文档分块器
+
+    以句子为单位累积到 chunk_size 个token为一块，下一块开头重复上一块末尾
+    不超过 overlap 个token的句子；单句超长时按字符硬切
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        """
+        初始化分块器
+
+        Args:
+            chunk_size: 每块最多token数，默认使用配置
+            overlap: 相邻块重叠的最多token数，默认使用配置
+            count_tokens: token计数函数，默认按字符估算；可传入嵌入模型分词器
+        """
+        self.chunk_size = chunk_size if chunk_size is not None else settings.kb_chunk_size
+        self.overlap = overlap if overlap is not None else settings.kb_chunk_overlap
+        if self.overlap >= self.chunk_size:
+            raise ValueError("分块重叠长度必须小于分块长度")
+        self.count_tokens = count_tokens or estimate_tokens
+
+    def split(self, text: str) -> List[Dict[str, Any]]:
+        """
+        切分单个文档
+
+        Args:
+            text: 文档内容
+
+        Returns:
+            块列表，每项包含 text 和 overlap（开头与上一块重复的字符数，重组时去除）
+        """
+        sentences = []
+        for sentence in split_sentences(text):
+            sentences.extend(self._split_long(sentence))
+
+        chunks: List[Dict[str, Any]] = []
+        current: List[str] = []
+        current_tokens = 0
+        carried = 0  # current 开头从上一块带过来的句子数
+
+        for sentence in sentences:
+            tokens = self.count_tokens(sentence)
+            if current and current_tokens + tokens > self.chunk_size and len(current) > carried:
+                chunks.append(self._make_chunk(current, carried))
+                current, current_tokens = self._tail(current)
+                carried = len(current)
+                # 重叠部分加上新句子仍超长时放弃重叠
+                if current_tokens + tokens > self.chunk_size:
+                    current, current_tokens, carried = [], 0, 0
+            current.append(sentence)
+            current_tokens += tokens
+
+        if len(current) > carried or not chunks:
+            chunks.append(self._make_chunk(current, carried))
+        return chunks
+
+    def _make_chunk(self, sentences: List[str], carried: int) -> Dict[str, Any]:
+        """组装块文本，记录开头重叠部分的长度"""
+        return {
+            "text": "".join(sentences).rstrip(),
+            "overlap": len("".join(sentences[:carried]))
+        }
+
+    def _tail(self, sentences: List[str]):
+        """取末尾不超过 overlap 个token的句子作为下一块的开头"""
+        tail: List[str] = []
+        tokens = 0
+        for sentence in reversed(sentences):
+            count = self.count_tokens(sentence)
+            if tokens + count > self.overlap:
+                break
+            tail.insert(0, sentence)
+            tokens += count
+        return tail, tokens
+
+    def _split_long(self, sentence: str) -> List[str]:
+        """超过 chunk_size 的单句按字符二分硬切"""
+        if self.count_tokens(sentence) <= self.chunk_size:
+            return [sentence]
+        middle = len(sentence) // 2
+        return self._split_long(sentence[:middle]) + self._split_long(sentence[middle:])
+
+
+def chunk_id(parent_id: str, index: int) -> str:
+    """块的文档ID"""
+    return f"{parent_id}#{index}"
+
+
+def assemble_chunks(chunks: List[Dict[str, Any]]) -> str:
+    """
+    将同一文档的相邻块按顺序拼接，去除重叠部分
+
+    Args:
+        chunks: 块列表，每项包含 content 和 metadata（chunk_index / chunk_overlap）
+
+    Returns:
+        拼接后的文本；不连续的块之间用省略号分隔
+    """
+    chunks = sorted(chunks, key=lambda c: c["metadata"]["chunk_index"])
+    parts = []
+    previous = None
+    for chunk in chunks:
+        index = chunk["metadata"]["chunk_index"]
+        text = chunk["content"]
+        if previous is not None and index == previous + 1:
+            text = text[chunk["metadata"].get("chunk_overlap", 0):]
+        elif previous is not None:
+            parts.append("\n……\n")
+        parts.append(text)
+        previous = index
+    return "".join(parts)
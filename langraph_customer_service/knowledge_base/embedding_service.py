@@ -0,0 +1,123 @@
+"""
+共享嵌入服务
+在独立进程中加载一次嵌入模型，通过本地套接字为多个API worker提供向量计算
+"""
+from typing import Optional
+from multiprocessing.connection import Listener
+from pathlib import Path
+import multiprocessing
+import threading
+import time
+from langraph_customer_service.knowledge_base.embeddings import (
+    configure_inference_threads,
+    load_local_embedding_model,
+    parse_service_address,
+    service_authkey,
+    RemoteEmbeddingModel,
+)
+from langraph_customer_service.utils import log
+
+
+def _handle_connection(conn, model, lock: threading.Lock):
+    """处理单个客户端连接上的所有请求"""
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                return
+
+            try:
+                command = message[0]
+                if command == "encode":
+                    _, sentences, kwargs = message
+                    # 模型内部已多线程并行，串行化请求避免线程争抢
+                    with lock:
+                        result = model.encode(sentences, **kwargs)
+                elif command == "dimension":
+                    result = model.get_sentence_embedding_dimension()
+                elif command == "ping":
+                    result = "pong"
+                else:
+                    raise ValueError(f"未知命令: {command}")
+                conn.send(("ok", result))
+            except Exception as e:
+                log.error(f"嵌入服务处理请求失败: {e}")
+                conn.send(("error", str(e)))
+
+
+def serve(address: str, authkey: bytes):
+    """
+    启动嵌入服务（阻塞）
+
+    Args:
+        address: 监听地址，"host:port" 或Unix套接字路径
+        authkey: 连接认证密钥
+    """
+    parsed = parse_service_address(address)
+    if isinstance(parsed, str) and Path(parsed).exists():
+        # 清理上次异常退出遗留的套接字文件
+        Path(parsed).unlink()
+
+    configure_inference_threads()
+    model = load_local_embedding_model()
+    lock = threading.Lock()
+
+    with Listener(parsed, authkey=authkey) as listener:
+        log.info(f"嵌入服务已启动: {address}")
+        while True:
+            conn = listener.accept()
+            threading.Thread(
+                target=_handle_connection,
+                args=(conn, model, lock),
+                daemon=True
+            ).start()
+
+
+def start_embedding_service(
+    address: str,
+    authkey: bytes,
+    timeout: float = 300.0
+) -> multiprocessing.Process:
+    """
+    在子进程中启动嵌入服务，并等待其就绪
+
+    Args:
+        address: 监听地址
+        authkey: 连接认证密钥
+        timeout: 等待模型加载完成的最长时间（秒）
+
+    Returns:
+        服务进程
+    """
+    # 使用 spawn，避免 fork 继承父进程中已初始化的 torch 线程池
+    ctx = multiprocessing.get_context("spawn")
+    process = ctx.Process(target=serve, args=(address, authkey), name="embedding-service", daemon=True)
+    process.start()
+
+    client = RemoteEmbeddingModel(address, authkey)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not process.is_alive():
+            raise RuntimeError("嵌入服务进程启动失败")
+        if client.ping():
+            log.info("嵌入服务就绪")
+            return process
+        time.sleep(0.5)
+
+    process.terminate()
+    raise TimeoutError(f"嵌入服务在 {timeout} 秒内未就绪")
+
+
+def stop_embedding_service(process: Optional[multiprocessing.Process]):
+    """停止嵌入服务进程"""
+    if process is not None and process.is_alive():
+        process.terminate()
+        process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    # 单独部署嵌入服务：python -m langraph_customer_service.knowledge_base.embedding_service
+    from config import settings
+
+    serve(settings.embedding_service_address, service_authkey())
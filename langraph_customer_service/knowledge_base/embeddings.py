@@ -0,0 +1,301 @@
+"""
+嵌入模型模块
+负责加载本地嵌入模型（PyTorch 或 ONNX Runtime 后端），以及访问共享嵌入服务的客户端
+"""
+from typing import List, Union, Tuple, Optional
+from multiprocessing.connection import Client
+from pathlib import Path
+import json
+import os
+import threading
+import numpy as np
+from config import settings
+from langraph_customer_service.utils import log
+
+
+MODELS_DIR = Path("./models")
+# 可选的本地模型：large 精度最高，small 体积约为其 1/13，CPU上编码快数倍
+MODEL_PRESETS = {
+    "large": "BAAI/bge-large-zh-v1.5",
+    "small": "BAAI/bge-small-zh-v1.5",
+}
+
+
+def local_model_path(model_name: Optional[str] = None) -> Path:
+    """
+    本地模型目录
+
+    Args:
+        model_name: 模型名称（如 BAAI/bge-small-zh-v1.5），默认使用配置
+
+    Returns:
+        配置了 EMBEDDING_MODEL_PATH 时为该路径，否则为 ./models/<模型名>
+    """
+    if model_name is None and settings.embedding_model_path:
+        return Path(settings.embedding_model_path)
+    name = model_name or settings.embedding_model
+    return MODELS_DIR / name.split("/")[-1]
+
+
+def embedding_fingerprint() -> str:
+    """嵌入模型及推理后端的标识，不同后端生成的向量有细微差异，缓存需区分"""
+    if settings.embedding_backend == "onnx":
+        return f"{settings.embedding_model}:onnx:{settings.embedding_onnx_file}"
+    return settings.embedding_model
+
+
+def configure_inference_threads(threads: Optional[int] = None, interop_threads: Optional[int] = None):
+    """
+    固定CPU推理的线程数
+
+    OpenMP/MKL 环境变量只在 torch 首次导入前生效，因此需在加载任何模型之前调用；
+    torch 已导入时再通过 set_num_threads 调整。多个worker进程共用一台机器时，
+    每个进程的线程数之和不应超过核数，否则线程互相争抢反而变慢
+
+    Args:
+        threads: 算子内并行线程数，默认使用配置，0 表示不修改
+        interop_threads: 算子间并行线程数，默认使用配置，0 表示不修改
+    """
+    threads = settings.inference_threads if threads is None else threads
+    interop_threads = settings.inference_interop_threads if interop_threads is None else interop_threads
+    if threads <= 0 and interop_threads <= 0:
+        return
+
+    if threads > 0:
+        for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+            os.environ[name] = str(threads)
+
+    try:
+        import torch
+    except ImportError:
+        return
+    if threads > 0:
+        torch.set_num_threads(threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # 已经执行过并行计算后不能再修改
+            log.warning(f"设置算子间线程数失败: {e}")
+    log.info(f"推理线程数: intra={torch.get_num_threads()}, inter={torch.get_num_interop_threads()}")
+
+
+def load_local_embedding_model(backend: Optional[str] = None, model_path: Optional[Path] = None):
+    """
+    加载本地嵌入模型
+
+    Args:
+        backend: 推理后端 torch / onnx，默认使用配置
+        model_path: 模型目录，默认使用配置
+
+    Returns:
+        SentenceTransformer 或 OnnxEmbeddingModel 实例（encode 接口一致）
+    """
+    backend = backend or settings.embedding_backend
+    model_path = Path(model_path or local_model_path())
+
+    # 检查本地模型路径
+    if not model_path.exists():
+        raise FileNotFoundError(f"务必搞清楚，不允许自动下载 太慢了！本地模型不存在: {model_path}")
+
+    log.info(f"使用本地模型: {model_path} ({backend})")
+    if backend == "onnx":
+        return OnnxEmbeddingModel(model_path, settings.embedding_onnx_file, settings.inference_threads)
+    if backend != "torch":
+        raise ValueError(f"不支持的嵌入模型后端: {backend}")
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(str(model_path))
+
+
+class OnnxEmbeddingModel:
+    """
+    ONNX Runtime 嵌入模型
+
+    加载 download_model.py --export-onnx 导出的（int8量化）模型，按 sentence-transformers
+    的池化配置取句向量；接口与 SentenceTransformer.encode 保持一致
+    """
+
+    def __init__(self, model_path: Path, onnx_file: str, threads: int = 0):
+        """
+        Args:
+            model_path: 模型目录（含分词器和导出的ONNX文件）
+            onnx_file: ONNX文件名
+            threads: 算子内并行线程数，0 表示由 onnxruntime 决定
+        """
+        from transformers import AutoTokenizer
+        from langraph_customer_service.knowledge_base.onnx_utils import create_session
+
+        onnx_path = model_path / onnx_file
+        if not onnx_path.exists():
+            raise FileNotFoundError(f"ONNX模型不存在: {onnx_path}，请先运行 python download_model.py --export-onnx")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+        self.session = create_session(onnx_path, threads)
+        self._input_names = {item.name for item in self.session.get_inputs()}
+        self._dimension = None
+
+        self.max_seq_length = 512
+        config_path = model_path / "sentence_bert_config.json"
+        if config_path.exists():
+            self.max_seq_length = json.loads(config_path.read_text(encoding="utf-8")).get("max_seq_length", 512)
+
+        # bge 系列使用 [CLS] 池化，其他模型按 sentence-transformers 的池化配置
+        self.pooling = "cls"
+        pooling_path = model_path / "1_Pooling" / "config.json"
+        if pooling_path.exists():
+            pooling = json.loads(pooling_path.read_text(encoding="utf-8"))
+            if pooling.get("pooling_mode_mean_tokens"):
+                self.pooling = "mean"
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        生成嵌入向量
+
+        Args:
+            sentences: 文本或文本列表
+            batch_size: 每次前向计算的文本数
+            normalize_embeddings: 是否L2归一化
+            **kwargs: 兼容 SentenceTransformer.encode 的其他参数（忽略）
+
+        Returns:
+            单条文本时为一维向量，否则为向量矩阵
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        # 按长度排序后组批，减少填充
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            vectors = self._forward([texts[i] for i in batch])
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+
+        result = np.vstack(embeddings).astype("float32") if embeddings else np.zeros((0, 0), dtype="float32")
+        if normalize_embeddings and len(result):
+            result /= np.linalg.norm(result, axis=1, keepdims=True).clip(min=1e-12)
+        return result[0] if single else result
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        """一批文本的前向计算和池化"""
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        feed = {name: encoded[name].astype("int64") for name in self._input_names if name in encoded}
+        hidden = self.session.run(None, feed)[0]
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        mask = encoded["attention_mask"][..., None].astype("float32")
+        return (hidden * mask).sum(axis=1) / mask.sum(axis=1).clip(min=1e-9)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """向量维度"""
+        if self._dimension is None:
+            self._dimension = int(self.encode(["维度"]).shape[1])
+        return self._dimension
+
+
+def parse_service_address(address: str) -> Union[str, Tuple[str, int]]:
+    """
+    解析嵌入服务地址
+
+    Args:
+        address: "host:port" 表示TCP地址，其他视为Unix套接字路径（Windows下为命名管道）
+
+    Returns:
+        multiprocessing.connection 可用的地址
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address and "\\" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+class RemoteEmbeddingModel:
+    """
+    共享嵌入服务的客户端
+
+    接口与 SentenceTransformer.encode 保持一致，多个worker进程通过本地套接字
+    调用同一个嵌入服务进程，模型只需加载一次
+    """
+
+    def __init__(self, address: str, authkey: bytes):
+        """
+        Args:
+            address: 嵌入服务地址
+            authkey: 连接认证密钥
+        """
+        self.address = parse_service_address(address)
+        self.authkey = authkey
+        # multiprocessing 连接不是线程安全的，每个线程单独建立连接
+        self._local = threading.local()
+        self._dimension = None
+
+    def _request(self, message: tuple):
+        """发送请求并返回结果，连接断开时重连一次"""
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None:
+                    conn = Client(self.address, authkey=self.authkey)
+                    self._local.conn = conn
+                conn.send(message)
+                status, payload = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                if attempt == 1:
+                    raise
+
+        if status != "ok":
+            raise RuntimeError(f"嵌入服务调用失败: {payload}")
+        return payload
+
+    def encode(self, sentences: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """
+        生成嵌入向量
+
+        Args:
+            sentences: 文本或文本列表
+            **kwargs: 透传给服务端 SentenceTransformer.encode 的参数
+
+        Returns:
+            嵌入向量矩阵
+        """
+        # 进度条只在服务端有意义
+        kwargs.pop("show_progress_bar", None)
+        return self._request(("encode", sentences, kwargs))
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """向量维度"""
+        if self._dimension is None:
+            self._dimension = self._request(("dimension",))
+        return self._dimension
+
+    def ping(self) -> bool:
+        """检查服务是否可用"""
+        try:
+            return self._request(("ping",)) == "pong"
+        except (OSError, EOFError, RuntimeError):
+            return False
+
+
+def service_authkey() -> bytes:
+    """嵌入服务的连接密钥，未配置时报错（不使用默认密钥）"""
+    if not settings.embedding_service_authkey:
+        raise ValueError("未设置 EMBEDDING_SERVICE_AUTHKEY，无法连接或启动共享嵌入服务")
+    return settings.embedding_service_authkey.encode("utf-8")
+
+
+def create_remote_model() -> RemoteEmbeddingModel:
+    """按配置创建嵌入服务客户端"""
+    log.info(f"使用共享嵌入服务: {settings.embedding_service_address}")
+    return RemoteEmbeddingModel(settings.embedding_service_address, service_authkey())
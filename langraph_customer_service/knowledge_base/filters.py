@@ -0,0 +1,170 @@
+"""
+元数据过滤模块
+为文档元数据建立倒排索引，把过滤条件解析为满足条件的文档行号，供检索时限定候选范围
+
+过滤条件为 {字段: 条件} 字典，多个字段之间为"且"：
+    {"category": "faq"}                          等于
+    {"category": ["product", "tech"]}            属于集合
+    {"price": {"gte": 1000, "lt": 8000}}         数值区间（gt / gte / lt / lte）
+    {"category": {"in": ["faq"]}, "type": {"eq": "policy"}}
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import json
+import numpy as np
+
+
+MetadataFilter = Dict[str, Any]
+
+_RANGE_OPS = ("gt", "gte", "lt", "lte")
+_OPS = ("eq", "in") + _RANGE_OPS
+# 缓存的过滤结果数
+_CACHE_SIZE = 64
+
+
+def _as_number(value: Any) -> Optional[float]:
+    """可参与区间比较的数值（CSV导入的数字字符串也算），其他返回None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _hashable(value: Any) -> bool:
+    """可作为倒排索引键的取值"""
+    return isinstance(value, (str, int, float, bool)) or value is None
+
+
+def filter_key(filters: Optional[MetadataFilter]) -> str:
+    """过滤条件的规范化字符串，用于缓存和合并相同条件的检索请求"""
+    return json.dumps(filters or {}, ensure_ascii=False, sort_keys=True, default=sorted)
+
+
+class MetadataIndex:
+    """
+    元数据倒排索引
+
+    每个字段记录 取值 -> 行号列表；列表类型的取值（如标签）按元素分别索引。
+    数值取值另外追加到数组中，区间查询时排序后二分查找
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Dict[Any, List[int]]] = {}
+        self._numbers: Dict[str, Tuple[List[float], List[int]]] = {}
+        # 字段 -> (有序数值, 对应行号)，有新文档加入时失效
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def add(self, start: int, metadata: List[Dict[str, Any]]):
+        """
+        索引一批连续的文档行
+
+        Args:
+            start: 第一条文档的行号
+            metadata: 元数据列表
+        """
+        for row, meta in enumerate(metadata, start):
+            for name, value in meta.items():
+                for item in (value if isinstance(value, (list, tuple)) else [value]):
+                    if _hashable(item):
+                        self._values.setdefault(name, {}).setdefault(item, []).append(row)
+                    number = _as_number(item)
+                    if number is not None:
+                        values, rows = self._numbers.setdefault(name, ([], []))
+                        values.append(number)
+                        rows.append(row)
+                        self._sorted.pop(name, None)
+        if metadata:
+            self._cache.clear()
+
+    def rows(self, filters: MetadataFilter) -> np.ndarray:
+        """
+        满足过滤条件的行号（含已删除的行，由调用方排除）
+
+        Args:
+            filters: 过滤条件
+
+        Returns:
+            升序的int64行号数组
+
+        Raises:
+            ValueError: 条件格式不正确
+        """
+        key = filter_key(filters)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        result: Optional[np.ndarray] = None
+        for name, condition in filters.items():
+            rows = self._match(name, condition)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        if result is None:
+            raise ValueError("过滤条件不能为空")
+
+        self._cache[key] = result
+        while len(self._cache) > _CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+    def _match(self, name: str, condition: Any) -> np.ndarray:
+        """单个字段的匹配行号"""
+        if not isinstance(condition, dict):
+            if isinstance(condition, (list, tuple, set)):
+                return self._match_values(name, condition)
+            return self._match_values(name, [condition])
+
+        unknown = set(condition) - set(_OPS)
+        if unknown:
+            raise ValueError(f"不支持的过滤操作: {sorted(unknown)}，可用: {list(_OPS)}")
+
+        result: Optional[np.ndarray] = None
+        if "eq" in condition:
+            result = self._match_values(name, [condition["eq"]])
+        if "in" in condition:
+            rows = self._match_values(name, condition["in"])
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        if any(op in condition for op in _RANGE_OPS):
+            rows = self._match_range(name, condition)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result if result is not None else np.zeros(0, dtype="int64")
+
+    def _match_values(self, name: str, values) -> np.ndarray:
+        """取值属于集合的行号"""
+        index = self._values.get(name, {})
+        rows = [index[value] for value in values if _hashable(value) and value in index]
+        if not rows:
+            return np.zeros(0, dtype="int64")
+        return np.unique(np.concatenate([np.asarray(r, dtype="int64") for r in rows]))
+
+    def _match_range(self, name: str, condition: Dict[str, Any]) -> np.ndarray:
+        """数值落在区间内的行号"""
+        if name not in self._numbers:
+            return np.zeros(0, dtype="int64")
+        if name not in self._sorted:
+            values, rows = self._numbers[name]
+            order = np.argsort(values, kind="stable")
+            self._sorted[name] = (np.asarray(values)[order], np.asarray(rows, dtype="int64")[order])
+        values, rows = self._sorted[name]
+
+        low, high = 0, len(values)
+        if "gte" in condition:
+            low = max(low, int(np.searchsorted(values, float(condition["gte"]), side="left")))
+        if "gt" in condition:
+            low = max(low, int(np.searchsorted(values, float(condition["gt"]), side="right")))
+        if "lte" in condition:
+            high = min(high, int(np.searchsorted(values, float(condition["lte"]), side="right")))
+        if "lt" in condition:
+            high = min(high, int(np.searchsorted(values, float(condition["lt"]), side="left")))
+        if low >= high:
+            return np.zeros(0, dtype="int64")
+        return np.unique(rows[low:high])
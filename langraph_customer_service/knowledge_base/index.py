@@ -0,0 +1,173 @@
+"""
+向量索引模块
+按索引规格创建内积（余弦相似度）FAISS索引，支持 Flat / HNSW / IVF-Flat / IVF-PQ
+"""
+from typing import Literal, Optional
+from pathlib import Path
+import faiss
+import numpy as np
+from pydantic import BaseModel, Field
+from config import settings
+from langraph_customer_service.utils import log
+
+
+# k-means 每个聚类中心至少需要的训练样本数（低于此值FAISS会给出警告，聚类质量明显下降）
+MIN_POINTS_PER_CENTROID = 39
+# 过滤检索时放大后的 efSearch 上限
+MAX_FILTERED_EF_SEARCH = 4096
+
+
+class IndexSpec(BaseModel):
+    """向量索引规格"""
+    type: Literal["flat", "hnsw", "ivf_flat", "ivf_pq"] = Field(default="flat", description="索引类型")
+    hnsw_m: int = Field(default=32, description="HNSW每个节点的邻居数")
+    ef_construction: int = Field(default=200, description="HNSW构建时的候选列表大小")
+    ef_search: int = Field(default=64, description="HNSW检索时的候选列表大小")
+    nlist: int = Field(default=1024, description="IVF聚类中心数")
+    nprobe: int = Field(default=16, description="IVF检索时访问的聚类数")
+    pq_m: int = Field(default=64, description="PQ子向量个数，需整除向量维度")
+    pq_nbits: int = Field(default=8, description="PQ每个子向量的编码位数")
+
+    @classmethod
+    def from_settings(cls) -> "IndexSpec":
+        """按配置创建索引规格"""
+        return cls(
+            type=settings.kb_index_type,
+            hnsw_m=settings.kb_hnsw_m,
+            ef_search=settings.kb_ef_search,
+            nlist=settings.kb_ivf_nlist,
+            nprobe=settings.kb_ivf_nprobe,
+            pq_m=settings.kb_pq_m,
+            pq_nbits=settings.kb_pq_nbits
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["IndexSpec"]:
+        """读取旧版单文件存储旁的 index_spec.json，文件不存在时返回None"""
+        if not path.exists():
+            return None
+        return cls.model_validate_json(path.read_text(encoding="utf-8"))
+
+
+def build_index(spec: IndexSpec, embeddings: np.ndarray) -> faiss.Index:
+    """
+    按规格创建索引，需要训练的索引用传入的向量训练
+
+    训练样本不足以支撑配置的聚类数时自动缩小 nlist；连PQ码本都无法训练时
+    退回 Flat 索引，spec 会被原地更新为实际使用的参数
+
+    Args:
+        spec: 索引规格
+        embeddings: 归一化后的float32向量矩阵，用于训练（不会加入索引）
+
+    Returns:
+        内积度量的FAISS索引
+    """
+    dimension = embeddings.shape[1]
+    count = embeddings.shape[0]
+
+    if spec.type in ("ivf_flat", "ivf_pq"):
+        nlist = min(spec.nlist, max(1, count // MIN_POINTS_PER_CENTROID))
+        if spec.type == "ivf_pq" and (count < 2 ** spec.pq_nbits or dimension % spec.pq_m != 0):
+            log.warning(
+                f"训练样本({count})不足或维度({dimension})不能被pq_m({spec.pq_m})整除，退回Flat索引"
+            )
+            spec.type = "flat"
+        elif nlist != spec.nlist:
+            log.warning(f"训练样本只有 {count} 条，IVF聚类数由 {spec.nlist} 调整为 {nlist}")
+            spec.nlist = nlist
+        spec.nprobe = min(spec.nprobe, spec.nlist)
+
+    if spec.type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+    elif spec.type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, spec.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = spec.ef_construction
+    elif spec.type == "ivf_flat":
+        index = faiss.index_factory(dimension, f"IVF{spec.nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.index_factory(
+            dimension, f"IVF{spec.nlist},PQ{spec.pq_m}x{spec.pq_nbits}", faiss.METRIC_INNER_PRODUCT
+        )
+
+    if not index.is_trained:
+        log.info(f"训练 {spec.type} 索引: {count} 条样本, nlist={spec.nlist}")
+        index.train(embeddings)
+
+    apply_search_params(index, spec)
+    log.info(f"创建向量索引: type={spec.type}, dim={dimension}")
+    return index
+
+
+def apply_search_params(index: faiss.Index, spec: IndexSpec):
+    """设置检索参数（nprobe / efSearch），这两项不随索引文件持久化"""
+    if spec.type == "hnsw":
+        faiss.ParameterSpace().set_index_parameter(index, "efSearch", spec.ef_search)
+    elif spec.type in ("ivf_flat", "ivf_pq"):
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", spec.nprobe)
+
+
+def migrate_l2_index(index: faiss.Index) -> faiss.Index:
+    """
+    将旧版 IndexFlatL2 索引转换为归一化向量上的 IndexFlatIP
+
+    旧版本直接存储未归一化的向量，Flat索引可以无损取回并重建
+    """
+    vectors = index.reconstruct_n(0, index.ntotal)
+    faiss.normalize_L2(vectors)
+    migrated = faiss.IndexFlatIP(index.d)
+    migrated.add(vectors)
+    log.info(f"旧版L2索引已转换为内积索引: {index.ntotal} 条向量")
+    return migrated
+
+
+def make_search_params(
+    spec: IndexSpec,
+    selector=None,
+    selectivity: float = 1.0
+) -> Optional[faiss.SearchParameters]:
+    """
+    构造带ID过滤的检索参数，无过滤条件时返回None（使用索引自身的检索参数）
+
+    传入检索参数时FAISS不再读取索引上设置的 nprobe / efSearch，需一并带上。
+    过滤条件只放行一小部分文档时，按比例放大 nprobe / efSearch，
+    否则访问的聚类或候选列表中可能凑不满 top_k 个合格结果
+
+    Args:
+        spec: 索引规格
+        selector: FAISS ID选择器
+        selectivity: 选择器放行的文档占比（0~1]
+    """
+    if selector is None:
+        return None
+    scale = 1.0 / max(selectivity, 1e-6)
+    if spec.type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=min(int(spec.ef_search * scale), MAX_FILTERED_EF_SEARCH))
+    if spec.type in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(int(spec.nprobe * scale), spec.nlist))
+    return faiss.SearchParameters(sel=selector)
+
+
+def make_id_selector(local_ids: np.ndarray, count: int) -> faiss.IDSelector:
+    """
+    只放行给定段内序号的位图选择器
+
+    Args:
+        local_ids: 放行的段内序号
+        count: 段内向量总数
+    """
+    mask = np.zeros(count, dtype=bool)
+    mask[local_ids] = True
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(count, faiss.swig_ptr(bitmap))
+    # IDSelectorBitmap 只持有指针，位图需保持存活
+    selector.referenced_objects = [bitmap]
+    return selector
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """取回索引中的全部向量（IVF索引先建立直接映射；PQ编码为有损还原）"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
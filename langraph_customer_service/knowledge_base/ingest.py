@@ -0,0 +1,448 @@
+"""
+知识库批量导入模块
+流式读取 JSONL / CSV 导出文件，按固定批次切分、多进程编码并写入知识库，可断点续传
+
+读取+分块、编码、写入索引三个阶段分别在不同线程中运行，通过有界队列衔接，
+编码当前批次的同时准备下一批并写入上一批；内存占用只与批次大小有关，与文件大小无关
+
+用法:
+    kb-ingest catalog.jsonl faq.csv --id-field sku --text-field description --processes 4
+"""
+from typing import Dict, Any, List, Optional, Iterator, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+from config import settings
+from langraph_customer_service.knowledge_base.vector_store import KnowledgeBase
+from langraph_customer_service.knowledge_base.chunking import DocumentChunker
+from langraph_customer_service.utils import log
+
+
+# 各阶段之间最多积压的批次数
+QUEUE_DEPTH = 2
+
+
+@dataclass
+class IngestBatch:
+    """流水线中的一批文档"""
+    # 本批包含的源记录数
+    records: int
+    # 本批写入后各文件已处理的记录数，保存后写入断点
+    progress: Dict[str, int]
+    texts: List[str] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    metadata: List[Dict[str, Any]] = field(default_factory=list)
+    # 文档重新分块后需要删除的旧块
+    stale: List[str] = field(default_factory=list)
+    # 需要调用嵌入模型的行（新增或内容有变化）
+    to_encode: List[int] = field(default_factory=list)
+    # 编码结果：文档ID -> 向量
+    embeddings: Dict[str, np.ndarray] = field(default_factory=dict)
+
+
+def read_records(
+    path: Path,
+    id_field: str,
+    text_field: str,
+    metadata_fields: Optional[List[str]] = None,
+    skip: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取 JSONL / CSV 文件中的文档
+
+    Args:
+        path: 文件路径，按扩展名识别格式（.jsonl / .ndjson / .csv）
+        id_field: 文档ID字段，缺失时以"文件名-序号"作为ID
+        text_field: 文档正文字段
+        metadata_fields: 作为元数据保留的字段，默认保留ID和正文以外的全部字段
+        skip: 跳过开头的记录数（断点续传）
+
+    Yields:
+        包含 id、text、metadata 的字典；正文为空的记录返回 text 为空字符串，由调用方跳过
+    """
+    suffix = path.suffix.lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if suffix in (".jsonl", ".ndjson"):
+            rows = (json.loads(line) for line in f if line.strip())
+        elif suffix == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            raise ValueError(f"不支持的文件格式: {path}（支持 .jsonl / .ndjson / .csv）")
+
+        for ordinal, row in enumerate(rows):
+            if ordinal < skip:
+                continue
+            if metadata_fields is None:
+                metadata = {k: v for k, v in row.items() if k not in (id_field, text_field)}
+            else:
+                metadata = {k: row[k] for k in metadata_fields if k in row}
+            yield {
+                "id": str(row.get(id_field) or f"{path.stem}-{ordinal}"),
+                "text": (row.get(text_field) or "").strip(),
+                "metadata": metadata
+            }
+
+
+class IngestCheckpoint:
+    """
+    导入断点
+
+    记录每个文件已写入并保存的记录数，中断后重新运行时从断点继续；
+    全部导入完成后删除
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: 断点文件路径
+        """
+        self.path = path
+        self.progress: Dict[str, int] = {}
+
+    def load(self) -> bool:
+        """读取断点，文件不存在时返回False"""
+        if not self.path.exists():
+            return False
+        self.progress = json.loads(self.path.read_text(encoding="utf-8"))["files"]
+        return True
+
+    def save(self, progress: Dict[str, int]):
+        """原子写入断点（先写临时文件再替换）"""
+        self.progress = dict(progress)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"files": self.progress}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        """导入完成后删除断点"""
+        if self.path.exists():
+            self.path.unlink()
+
+
+class ParallelEncoder:
+    """
+    多进程文档编码器
+
+    本地 SentenceTransformer 模型通过 start_multi_process_pool 在多个CPU进程中
+    并行编码；共享嵌入服务或单进程时直接调用 encode
+    """
+
+    def __init__(self, model, processes: int, batch_size: int):
+        """
+        Args:
+            model: 嵌入模型
+            processes: 编码进程数
+            batch_size: 每次前向计算的文本数
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.pool = None
+
+        if processes > 1 and hasattr(model, "start_multi_process_pool"):
+            # 子进程启动时读取线程数，避免每个进程都占满全部核心
+            os.environ.setdefault("OMP_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // processes)))
+            self.pool = model.start_multi_process_pool(target_devices=["cpu"] * processes)
+            log.info(f"启动 {processes} 个编码进程")
+        elif processes > 1:
+            log.warning("当前嵌入模型不支持多进程编码，使用单进程")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """生成归一化的float32文档向量"""
+        if self.pool is not None:
+            embeddings = self.model.encode_multi_process(
+                texts, self.pool, batch_size=self.batch_size, normalize_embeddings=True
+            )
+        else:
+            embeddings = self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+        return np.asarray(embeddings, dtype="float32")
+
+    def close(self):
+        """停止编码进程"""
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+
+class BulkIngestor:
+    """
+    流水线式批量导入器
+
+    读取线程：读取记录、分块、判断哪些块需要编码；
+    编码线程：对需要编码的块调用多进程编码器；
+    主线程：写入知识库，每隔若干批保存一次并更新断点
+    """
+
+    def __init__(
+        self,
+        knowledge_base: KnowledgeBase,
+        checkpoint: IngestCheckpoint,
+        batch_size: int = 512,
+        processes: int = 1,
+        encode_batch_size: int = 32,
+        save_every: int = 20,
+        chunk: bool = True
+    ):
+        """
+        Args:
+            knowledge_base: 知识库实例（已加载）
+            checkpoint: 导入断点
+            batch_size: 每批读取的源记录数
+            processes: 编码进程数
+            encode_batch_size: 每次前向计算的文本数
+            save_every: 每写入多少批保存一次知识库并更新断点
+            chunk: 是否对长文档分块
+        """
+        self.kb = knowledge_base
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.processes = processes
+        self.encode_batch_size = encode_batch_size
+        self.save_every = save_every
+        self.chunk = chunk
+
+        # 读取线程查询知识库现有内容时，与主线程的写入/保存互斥
+        self._kb_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.records = 0
+        self.rows = 0
+        self.encoded = 0
+        self.skipped = 0
+
+    def run(self, paths: List[Path], id_field: str, text_field: str, metadata_fields: Optional[List[str]]):
+        """
+        导入文件
+
+        Args:
+            paths: 输入文件列表
+            id_field: 文档ID字段
+            text_field: 文档正文字段
+            metadata_fields: 作为元数据保留的字段，None 表示保留全部其他字段
+        """
+        self.kb._load_embedding_model()
+        chunker = DocumentChunker(count_tokens=self.kb._token_counter()) if self.chunk else None
+        encoder = ParallelEncoder(self.kb.model, self.processes, self.encode_batch_size)
+
+        read_queue: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+        encode_queue: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+        threads = [
+            threading.Thread(
+                target=self._stage, name="kb-ingest-reader", daemon=True,
+                args=(lambda: self._read(paths, id_field, text_field, metadata_fields, chunker), None, read_queue)
+            ),
+            threading.Thread(
+                target=self._stage, name="kb-ingest-encoder", daemon=True,
+                args=(None, lambda batch: self._encode(batch, encoder), encode_queue, read_queue)
+            )
+        ]
+        for thread in threads:
+            thread.start()
+
+        started = time.perf_counter()
+        pending_saves = 0
+        progress = dict(self.checkpoint.progress)
+        try:
+            while True:
+                batch = encode_queue.get()
+                if batch is None:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+
+                with self._kb_lock:
+                    self.kb.upsert_documents(batch.texts, batch.ids, batch.metadata, batch.embeddings)
+                    self.kb.delete_documents(batch.stale)
+                self.records += batch.records
+                self.rows += len(batch.texts)
+                progress = batch.progress
+
+                pending_saves += 1
+                if pending_saves >= self.save_every:
+                    self._save(progress)
+                    pending_saves = 0
+                self._report(started)
+
+            self._save(progress)
+        finally:
+            self._stop.set()
+            encoder.close()
+
+        self.checkpoint.remove()
+        self._report(started, final=True)
+
+    def _stage(
+        self,
+        produce: Optional[Callable[[], Iterator[IngestBatch]]],
+        process: Optional[Callable[[IngestBatch], IngestBatch]],
+        output: "queue.Queue",
+        source: Optional["queue.Queue"] = None
+    ):
+        """
+        运行流水线的一个阶段：从生成器或上游队列取批次，处理后放入下游队列
+
+        结束时放入 None，出错时把异常传给下游，由主线程抛出
+        """
+        try:
+            if produce is not None:
+                batches = produce()
+            else:
+                batches = iter(source.get, None)
+            for batch in batches:
+                if isinstance(batch, BaseException):
+                    raise batch
+                if not self._put(output, process(batch) if process else batch):
+                    return
+            self._put(output, None)
+        except BaseException as e:
+            self._put(output, e)
+
+    def _put(self, output: "queue.Queue", item) -> bool:
+        """放入下游队列，主线程已退出时放弃并返回False"""
+        while not self._stop.is_set():
+            try:
+                output.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(
+        self,
+        paths: List[Path],
+        id_field: str,
+        text_field: str,
+        metadata_fields: Optional[List[str]],
+        chunker: Optional[DocumentChunker]
+    ) -> Iterator[IngestBatch]:
+        """读取阶段：按 batch_size 条源记录组批，跨文件连续组批"""
+        progress = dict(self.checkpoint.progress)
+        records: List[Dict[str, Any]] = []
+        for path in paths:
+            key = str(path.resolve())
+            done = progress.get(key, 0)
+            if done:
+                log.info(f"{path.name}: 从第 {done} 条记录继续")
+            for record in read_records(path, id_field, text_field, metadata_fields, skip=done):
+                done += 1
+                progress[key] = done
+                if not record["text"]:
+                    self.skipped += 1
+                else:
+                    records.append(record)
+                if len(records) >= self.batch_size:
+                    yield self._prepare(records, dict(progress), chunker)
+                    records = []
+            progress[key] = done
+        yield self._prepare(records, dict(progress), chunker)
+
+    def _prepare(
+        self,
+        records: List[Dict[str, Any]],
+        progress: Dict[str, int],
+        chunker: Optional[DocumentChunker]
+    ) -> IngestBatch:
+        """分块并找出需要编码的行"""
+        batch = IngestBatch(records=len(records), progress=progress)
+        texts = [record["text"] for record in records]
+        ids = [record["id"] for record in records]
+        metadata = [record["metadata"] for record in records]
+        if chunker is not None and records:
+            batch.texts, batch.ids, batch.metadata = self.kb.chunk_documents(texts, ids, metadata, chunker)
+        else:
+            batch.texts, batch.ids, batch.metadata = texts, ids, metadata
+
+        with self._kb_lock:
+            if chunker is not None:
+                batch.stale = self.kb.stale_chunks(batch.metadata)
+            batch.to_encode = [
+                i for i, (doc_id, text) in enumerate(zip(batch.ids, batch.texts))
+                if self.kb.needs_encoding(doc_id, text)
+            ]
+        return batch
+
+    def _encode(self, batch: IngestBatch, encoder: ParallelEncoder) -> IngestBatch:
+        """编码阶段"""
+        if batch.to_encode:
+            vectors = encoder.encode([batch.texts[i] for i in batch.to_encode])
+            batch.embeddings = {batch.ids[i]: vector for i, vector in zip(batch.to_encode, vectors)}
+            self.encoded += len(batch.to_encode)
+        return batch
+
+    def _save(self, progress: Dict[str, int]):
+        """保存知识库，提交后再更新断点（断点之前的记录一定已落盘）"""
+        with self._kb_lock:
+            self.kb.save()
+        self.checkpoint.save(progress)
+
+    def _report(self, started: float, final: bool = False):
+        """输出吞吐量"""
+        elapsed = time.perf_counter() - started
+        rate = self.records / elapsed if elapsed > 0 else 0.0
+        message = (
+            f"已导入 {self.records} 条文档（{self.rows} 行，编码 {self.encoded} 行，"
+            f"跳过空文档 {self.skipped} 条），{rate:.1f} docs/sec"
+        )
+        if final:
+            log.info(f"导入完成: {message}, 耗时 {elapsed:.1f}s, 知识库当前文档数: {self.kb.count}")
+        else:
+            log.info(message)
+
+
+def main():
+    """kb-ingest 命令行入口"""
+    parser = argparse.ArgumentParser(description="批量导入 JSONL / CSV 文件到知识库")
+    parser.add_argument("files", nargs="+", type=Path, help="输入文件（.jsonl / .ndjson / .csv）")
+    parser.add_argument("--id-field", default="id", help="文档ID字段")
+    parser.add_argument("--text-field", default="content", help="文档正文字段")
+    parser.add_argument("--metadata-fields", default=None, help="作为元数据保留的字段，逗号分隔，默认保留其他全部字段")
+    parser.add_argument("--batch-size", type=int, default=512, help="每批读取的源记录数")
+    parser.add_argument("--encode-batch-size", type=int, default=32, help="每次前向计算的文本数")
+    parser.add_argument(
+        "--processes", type=int, default=max(1, (os.cpu_count() or 1) // 2), help="编码进程数"
+    )
+    parser.add_argument("--save-every", type=int, default=20, help="每写入多少批保存一次并更新断点")
+    parser.add_argument("--no-chunk", action="store_true", help="不对长文档分块")
+    parser.add_argument("--no-compact", action="store_true", help="导入完成后不合并段")
+    parser.add_argument(
+        "--checkpoint", type=Path, default=Path(settings.vector_store_path) / "ingest_checkpoint.json",
+        help="断点文件路径"
+    )
+    parser.add_argument("--restart", action="store_true", help="忽略已有断点，从头导入")
+    args = parser.parse_args()
+
+    checkpoint = IngestCheckpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.remove()
+    elif checkpoint.load():
+        log.info(f"发现导入断点: {args.checkpoint}")
+
+    kb = KnowledgeBase()
+    kb.load()
+
+    ingestor = BulkIngestor(
+        kb,
+        checkpoint,
+        batch_size=args.batch_size,
+        processes=args.processes,
+        encode_batch_size=args.encode_batch_size,
+        save_every=args.save_every,
+        chunk=not args.no_chunk
+    )
+    metadata_fields = args.metadata_fields.split(",") if args.metadata_fields else None
+    ingestor.run(args.files, args.id_field, args.text_field, metadata_fields)
+
+    # 每次保存都会写出一个新段，导入完成后合并以减少检索时查询的索引数
+    if not args.no_compact:
+        kb.compact()
+
+
+if __name__ == "__main__":
+    main()
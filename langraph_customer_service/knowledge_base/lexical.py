@@ -0,0 +1,342 @@
+"""
+词法检索模块
+与向量索引并行维护的BM25倒排索引，按段存储，补足向量检索对SKU编码、型号等精确字符串的召回
+
+分词：编码类字符串（字母数字及 - _ . / 连接）整体作为一个词并拆出各部分；
+中文安装了 jieba 时使用搜索引擎模式分词，否则按相邻二字切分
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from pathlib import Path
+import math
+import re
+import numpy as np
+from langraph_customer_service.utils import log
+
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_CODE = re.compile(r"[A-Za-z0-9]+(?:[-_./][A-Za-z0-9]+)*")
+_CJK_RUN = re.compile(r"[㐀-鿿豈-﫿]+")
+_CODE_PART = re.compile(r"[A-Za-z0-9]+")
+
+_jieba = None
+_jieba_checked = False
+
+
+def _load_jieba():
+    """jieba 为可选依赖，未安装时返回None"""
+    global _jieba, _jieba_checked
+    if not _jieba_checked:
+        _jieba_checked = True
+        try:
+            import jieba
+            jieba.setLogLevel(60)
+            _jieba = jieba
+        except ImportError:
+            log.info("未安装 jieba，中文词法检索按二字切分")
+    return _jieba
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分词法检索用的词
+
+    Args:
+        text: 文本
+
+    Returns:
+        小写的词列表（可重复）
+    """
+    tokens: List[str] = []
+    for match in _CODE.finditer(text):
+        code = match.group().lower()
+        tokens.append(code)
+        parts = _CODE_PART.findall(code)
+        if len(parts) > 1:
+            tokens.extend(parts)
+
+    jieba = _load_jieba()
+    for match in _CJK_RUN.finditer(text):
+        run = match.group()
+        if jieba is not None:
+            tokens.extend(word for word in jieba.lcut_for_search(run) if word.strip())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _is_code_token(token: str) -> bool:
+    """编码类的词：由多段组成，或同时包含字母和数字（如 ip15p-256-blk、a17）"""
+    if not _CODE.fullmatch(token):
+        return False
+    if len(_CODE_PART.findall(token)) > 1:
+        return True
+    return any(c.isdigit() for c in token) and any(c.isalpha() for c in token)
+
+
+def is_code_query(query: str) -> bool:
+    """查询本身就是一个编码（含数字的SKU、型号、订单号等），词法精确匹配即可"""
+    query = query.strip()
+    return bool(_CODE.fullmatch(query)) and any(c.isdigit() for c in query)
+
+
+class LexicalSegment:
+    """一段连续文档的倒排索引，与同起点的向量索引段一一对应"""
+
+    def __init__(self, start: int):
+        """
+        Args:
+            start: 本段第一条文档的全局序号
+        """
+        self.start = start
+        # 已落盘的段不再追加文档
+        self.sealed = False
+        self.lengths: List[int] = []
+        self._length_array: Optional[np.ndarray] = None
+        # 词 -> (段内序号列表, 词频列表)；冻结后转为数组
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def count(self) -> int:
+        """本段文档数"""
+        return len(self.lengths)
+
+    def add(self, documents: List[str]):
+        """向尚未保存的段追加文档"""
+        for document in documents:
+            local_id = len(self.lengths)
+            counts = Counter(tokenize(document))
+            self.lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                rows, tfs = self._postings.setdefault(token, ([], []))
+                rows.append(local_id)
+                tfs.append(tf)
+        self.postings = {}
+        self._length_array = None
+
+    def length_array(self) -> np.ndarray:
+        """各文档的词数"""
+        if self._length_array is None:
+            self._length_array = np.asarray(self.lengths, dtype="float32")
+        return self._length_array
+
+    def get(self, token: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """词的倒排列表 (段内序号, 词频)"""
+        if self._postings and not self.postings:
+            self._freeze()
+        return self.postings.get(token)
+
+    def _freeze(self):
+        """列表形式的倒排转为数组"""
+        self.postings = {
+            token: (np.asarray(rows, dtype="int64"), np.asarray(tfs, dtype="float32"))
+            for token, (rows, tfs) in self._postings.items()
+        }
+
+    def save(self, path: Path):
+        """
+        保存倒排索引
+
+        以CSR形式写入 .npz：tokens 为词表，第 i 个词的倒排位于 rows/tfs 的 [indptr[i], indptr[i+1])
+        """
+        if self._postings and not self.postings:
+            self._freeze()
+        tokens = list(self.postings)
+        sizes = [len(self.postings[token][0]) for token in tokens]
+        indptr = np.zeros(len(tokens) + 1, dtype="int64")
+        np.cumsum(sizes, out=indptr[1:])
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                tokens=np.array(tokens, dtype=str),
+                indptr=indptr,
+                rows=np.concatenate([self.postings[t][0] for t in tokens]) if tokens else np.zeros(0, dtype="int64"),
+                tfs=np.concatenate([self.postings[t][1] for t in tokens]) if tokens else np.zeros(0, dtype="float32"),
+                lengths=np.asarray(self.lengths, dtype="int64")
+            )
+
+    @classmethod
+    def load(cls, path: Path, start: int) -> "LexicalSegment":
+        """读取段的倒排索引"""
+        with np.load(path, allow_pickle=False) as data:
+            tokens, indptr = data["tokens"], data["indptr"]
+            rows, tfs = data["rows"], data["tfs"]
+            lengths = data["lengths"]
+        segment = cls(start)
+        segment.sealed = True
+        segment.lengths = lengths.tolist()
+        segment.postings = {
+            str(token): (rows[indptr[i]:indptr[i + 1]], tfs[indptr[i]:indptr[i + 1]])
+            for i, token in enumerate(tokens)
+        }
+        return segment
+
+
+class LexicalIndex:
+    """
+    BM25 倒排索引
+
+    按段组织，新文档追加到最后一个未保存的段；删除的文档在检索时排除，
+    合并段时重新编号。文档总数、平均长度和文档频率按全部段（含已删除）统计
+    """
+
+    def __init__(self):
+        self.segments: List[LexicalSegment] = []
+        self._total_length = 0
+
+    @property
+    def count(self) -> int:
+        """已索引的文档数（含已删除）"""
+        return sum(segment.count for segment in self.segments)
+
+    def add(self, start: int, documents: List[str]):
+        """
+        追加文档
+
+        Args:
+            start: 第一条文档的全局序号
+            documents: 文档文本
+        """
+        if not self.segments or self.segments[-1].sealed:
+            self.segments.append(LexicalSegment(start))
+        tail = self.segments[-1]
+        before = sum(tail.lengths)
+        tail.add(documents)
+        self._total_length += sum(tail.lengths) - before
+
+    def add_segment(self, segment: LexicalSegment):
+        """追加已落盘的段"""
+        segment.sealed = True
+        self.segments.append(segment)
+        self._total_length += sum(segment.lengths)
+
+    def seal(self):
+        """最后一段已落盘，之后的文档写入新段"""
+        if self.segments:
+            self.segments[-1].sealed = True
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        rows: Optional[np.ndarray] = None,
+        deleted: Optional[np.ndarray] = None,
+        min_match: float = 0.5
+    ) -> List[Tuple[int, float]]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            k: 返回结果数
+            rows: 限定的候选行号（元数据过滤），None 表示不限定
+            deleted: 已删除的行号
+            min_match: 文档至少命中查询中多大比例的词；命中整个编码词的文档不受此限制
+
+        Returns:
+            (全局文档序号, BM25分数) 列表，按分数降序
+        """
+        terms = Counter(tokenize(query))
+        total = self.count
+        if not terms or total == 0:
+            return []
+        avgdl = self._total_length / total
+
+        all_rows, all_scores, all_matched = [], [], []
+        for token, qtf in terms.items():
+            postings = [(segment, segment.get(token)) for segment in self.segments]
+            postings = [(segment, p) for segment, p in postings if p is not None]
+            df = sum(len(p[0]) for _, p in postings)
+            if df == 0:
+                continue
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            is_code = _is_code_token(token)
+            for segment, (local, tfs) in postings:
+                lengths = segment.length_array()[local]
+                score = idf * tfs * (BM25_K1 + 1) / (tfs + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl))
+                all_rows.append(local + segment.start)
+                all_scores.append(score * qtf)
+                # 命中整个编码词视为满足最少命中比例
+                all_matched.append(np.full(len(local), len(terms) if is_code else 1, dtype="int64"))
+
+        if not all_rows:
+            return []
+        candidates, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        matched = np.bincount(inverse, weights=np.concatenate(all_matched))
+
+        keep = matched >= math.ceil(len(terms) * min_match)
+        if rows is not None:
+            keep &= np.isin(candidates, rows)
+        if deleted is not None and len(deleted):
+            keep &= ~np.isin(candidates, deleted)
+        candidates, scores = candidates[keep], scores[keep]
+
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def compact(self, live: np.ndarray) -> LexicalSegment:
+        """
+        合并所有段并移除已删除的文档，文档按保留顺序重新编号
+
+        Args:
+            live: 保留的行号（升序）
+
+        Returns:
+            合并后的段（起点为0）
+        """
+        remap = np.full(self.count, -1, dtype="int64")
+        remap[live] = np.arange(len(live))
+
+        merged = LexicalSegment(0)
+        merged.sealed = True
+        lengths = np.zeros(self.count, dtype="int64")
+        postings: Dict[str, Tuple[List[np.ndarray], List[np.ndarray]]] = {}
+        for segment in self.segments:
+            lengths[segment.start:segment.start + segment.count] = segment.lengths
+            if segment._postings and not segment.postings:
+                segment._freeze()
+            for token, (local, tfs) in segment.postings.items():
+                new_rows = remap[local + segment.start]
+                keep = new_rows >= 0
+                if keep.any():
+                    parts = postings.setdefault(token, ([], []))
+                    parts[0].append(new_rows[keep])
+                    parts[1].append(tfs[keep])
+
+        merged.lengths = lengths[live].tolist()
+        merged.postings = {
+            token: (np.concatenate(rows), np.concatenate(tfs)) for token, (rows, tfs) in postings.items()
+        }
+        return merged
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[int]],
+    weights: List[float],
+    k: int = 60
+) -> List[Tuple[int, float]]:
+    """
+    加权倒数排名融合（RRF）
+
+    每个列表中排第 r 名（从1起）的文档得分 weight / (k + r)，各列表得分相加
+
+    Args:
+        ranked_lists: 各路检索按相关度排序的文档序号
+        weights: 各路权重
+        k: 平滑常数，越大排名靠后的文档影响越大
+
+    Returns:
+        (文档序号, 融合分数) 列表，按分数降序
+    """
+    scores: Dict[int, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, row in enumerate(ranked, 1):
+            scores[row] = scores.get(row, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,112 @@
+"""
+ONNX 推理工具模块
+将本地 Hugging Face 模型导出为 ONNX 并做 int8 动态量化，创建 CPU 推理会话
+
+导出（需要 torch / transformers / onnxruntime）:
+    python -m langraph_customer_service.knowledge_base.onnx_utils ./models/bge-reranker-base --task rerank
+"""
+from typing import Literal
+from pathlib import Path
+import argparse
+from langraph_customer_service.utils import log
+
+
+ONNX_NAME = "model.onnx"
+ONNX_INT8_NAME = "model_int8.onnx"
+
+
+def export_onnx(
+    model_dir: Path,
+    task: Literal["rerank", "embedding"],
+    quantize: bool = True,
+    opset: int = 14
+) -> Path:
+    """
+    导出 ONNX 模型到模型目录
+
+    Args:
+        model_dir: 本地模型目录（Hugging Face 格式）
+        task: rerank 导出序列分类头（输出 logits），embedding 导出编码器（输出 last_hidden_state）
+        quantize: 是否额外生成 int8 动态量化模型
+        opset: ONNX opset 版本
+
+    Returns:
+        推理时应使用的模型文件（量化时为 int8 模型）
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
+
+    model_dir = Path(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+    if task == "rerank":
+        model = AutoModelForSequenceClassification.from_pretrained(str(model_dir))
+        inputs = tokenizer(["示例查询"], ["示例文档"], return_tensors="pt")
+        output_name = "logits"
+        output_axes = {0: "batch"}
+    else:
+        model = AutoModel.from_pretrained(str(model_dir))
+        inputs = tokenizer(["示例文本"], return_tensors="pt")
+        output_name = "last_hidden_state"
+        output_axes = {0: "batch", 1: "sequence"}
+    model.eval()
+
+    input_names = list(inputs.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = output_axes
+
+    onnx_path = model_dir / ONNX_NAME
+    log.info(f"导出ONNX模型: {onnx_path}")
+    with torch.no_grad():
+        # 末尾的字典按参数名传给 forward，避免与位置参数顺序不一致
+        torch.onnx.export(
+            model,
+            (dict(inputs),),
+            str(onnx_path),
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+
+    if not quantize:
+        return onnx_path
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = model_dir / ONNX_INT8_NAME
+    log.info(f"int8动态量化: {int8_path}")
+    quantize_dynamic(str(onnx_path), str(int8_path), weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def create_session(path: Path, threads: int = 0):
+    """
+    创建 CPU 推理会话
+
+    Args:
+        path: ONNX 模型文件
+        threads: 算子内并行线程数，0 表示由 onnxruntime 决定
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def main():
+    """导出命令行入口"""
+    parser = argparse.ArgumentParser(description="导出ONNX模型并做int8动态量化")
+    parser.add_argument("model_dir", type=Path, help="本地模型目录")
+    parser.add_argument("--task", choices=["rerank", "embedding"], required=True, help="模型用途")
+    parser.add_argument("--no-quantize", action="store_true", help="只导出fp32模型")
+    args = parser.parse_args()
+
+    path = export_onnx(args.model_dir, args.task, quantize=not args.no_quantize)
+    log.info(f"导出完成: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+查询向量缓存模块
+按归一化后的查询文本缓存嵌入向量，重复的问题无需再次调用嵌入模型
+"""
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from pathlib import Path
+import os
+import re
+import threading
+import unicodedata
+import numpy as np
+from langraph_customer_service.utils import log
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    归一化查询文本作为缓存键
+
+    NFKC 统一全角/半角字符，合并连续空白并去除首尾空白
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query)).strip()
+
+
+class QueryEmbeddingCache:
+    """查询向量LRU缓存"""
+
+    def __init__(self, max_size: int):
+        """
+        初始化查询向量缓存
+
+        Args:
+            max_size: 最大缓存条目数
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """
+        查询缓存
+
+        Args:
+            query: 查询文本（未归一化）
+
+        Returns:
+            命中时返回向量，否则返回None
+        """
+        key = normalize_query(query)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, query: str, embedding: np.ndarray):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, path: Path, model_name: str):
+        """
+        持久化缓存（先写临时文件再替换，避免写入中断留下损坏文件）
+
+        查询文本和向量分别保存为 .npz 中的字符串数组和float32矩阵，加载时不需要pickle
+
+        Args:
+            path: 缓存文件路径
+            model_name: 生成这些向量的嵌入模型，加载时用于校验
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        keys = np.array([key for key, _ in entries], dtype=str)
+        vectors = (
+            np.stack([embedding for _, embedding in entries]).astype("float32", copy=False)
+            if entries else np.zeros((0, 0), dtype="float32")
+        )
+        with open(tmp_path, "wb") as f:
+            np.savez(f, model=np.array(model_name, dtype=str), keys=keys, vectors=vectors)
+        os.replace(tmp_path, path)
+        log.info(f"查询向量缓存已保存: {len(entries)} 条")
+
+    def load(self, path: Path, model_name: str) -> bool:
+        """
+        加载持久化的缓存，嵌入模型不一致时丢弃
+
+        Returns:
+            是否加载成功
+        """
+        if not path.exists():
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                saved_model = str(data["model"])
+                keys, vectors = data["keys"], data["vectors"]
+        except Exception as e:
+            log.warning(f"查询向量缓存加载失败: {e}")
+            return False
+        if saved_model != model_name:
+            log.info("嵌入模型已变化，丢弃查询向量缓存")
+            return False
+
+        with self._lock:
+            for key, embedding in zip(keys[-self.max_size:], vectors[-self.max_size:]):
+                self._entries[str(key)] = embedding
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        log.info(f"查询向量缓存已加载: {len(self._entries)} 条")
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,190 @@
+"""
+重排序模块
+用本地交叉编码器（bge-reranker）对向量检索的候选文档重新打分，只保留最相关的几条
+
+支持 PyTorch 和 ONNX Runtime（可用 int8 量化模型）两种CPU推理后端；
+每次重排序有时间预算，超时则放弃重排序、沿用检索顺序
+"""
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import threading
+import time
+import numpy as np
+from config import settings
+from langraph_customer_service.knowledge_base.onnx_utils import create_session
+from langraph_customer_service.utils import log
+
+
+class CrossEncoderReranker:
+    """交叉编码器重排序"""
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        backend: Optional[str] = None,
+        budget_ms: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_length: Optional[int] = None
+    ):
+        """
+        初始化重排序器（模型在首次使用或调用 load() 时加载）
+
+        Args:
+            model_path: 本地模型目录，默认使用配置
+            backend: 推理后端 torch / onnx，默认使用配置
+            budget_ms: 每次重排序的时间预算（毫秒），默认使用配置
+            batch_size: 每次前向计算的候选数，默认使用配置
+            max_length: (查询, 文档) 拼接后的最大token数，默认使用配置
+        """
+        self.model_path = Path(model_path or settings.kb_rerank_model)
+        self.backend = backend or settings.kb_rerank_backend
+        self.budget_ms = budget_ms if budget_ms is not None else settings.kb_rerank_budget_ms
+        self.batch_size = batch_size or settings.kb_rerank_batch_size
+        self.max_length = max_length or settings.kb_rerank_max_length
+
+        self._model = None
+        self._tokenizer = None
+        self._session = None
+        self._load_lock = threading.Lock()
+
+        self.calls = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+
+    def load(self):
+        """加载模型"""
+        if self._model is not None or self._session is not None:
+            return
+        with self._load_lock:
+            if self._model is not None or self._session is not None:
+                return
+            if not self.model_path.exists():
+                raise FileNotFoundError(f"重排序模型不存在: {self.model_path}")
+
+            started = time.perf_counter()
+            if self.backend == "onnx":
+                from transformers import AutoTokenizer
+
+                onnx_path = self.model_path / settings.kb_rerank_onnx_file
+                if not onnx_path.exists():
+                    raise FileNotFoundError(
+                        f"ONNX模型不存在: {onnx_path}，请先运行 "
+                        f"python -m langraph_customer_service.knowledge_base.onnx_utils {self.model_path} --task rerank"
+                    )
+                self._tokenizer = AutoTokenizer.from_pretrained(str(self.model_path))
+                self._session = create_session(onnx_path, settings.inference_threads)
+            elif self.backend == "torch":
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(str(self.model_path), device="cpu", max_length=self.max_length)
+            else:
+                raise ValueError(f"不支持的重排序后端: {self.backend}")
+            log.info(
+                f"重排序模型加载完成: {self.model_path.name} ({self.backend}), "
+                f"耗时 {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+
+    def score(self, query: str, documents: List[str]) -> np.ndarray:
+        """
+        计算 (查询, 文档) 的相关度分数（logit，越大越相关）
+
+        Args:
+            query: 查询文本
+            documents: 文档列表
+
+        Returns:
+            与 documents 一一对应的分数
+        """
+        self.load()
+        if self._session is not None:
+            encoded = self._tokenizer(
+                [query] * len(documents), documents,
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            feed = {
+                item.name: encoded[item.name].astype("int64")
+                for item in self._session.get_inputs() if item.name in encoded
+            }
+            logits = self._session.run(None, feed)[0]
+            return np.asarray(logits, dtype="float32").reshape(len(documents), -1)[:, 0]
+
+        scores = self._model.predict(
+            [(query, document) for document in documents],
+            batch_size=len(documents),
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return np.asarray(scores, dtype="float32").reshape(-1)
+
+    def rerank(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        budget_ms: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        对检索结果重排序
+
+        候选按批次打分，每批之后检查是否超出时间预算；超时时放弃重排序，
+        直接返回检索顺序的前 top_k 条
+
+        Args:
+            query: 查询文本
+            results: 检索结果（search() 的格式，按检索分数排序）
+            top_k: 保留的结果数
+            budget_ms: 时间预算（毫秒），默认使用初始化时的设置，0 表示不限
+
+        Returns:
+            重排序后的前 top_k 条结果，带 rerank_score 字段
+        """
+        if len(results) <= 1:
+            return results[:top_k]
+
+        self.load()
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000 if budget_ms > 0 else None
+
+        documents = [result["document"] for result in results]
+        scores: List[np.ndarray] = []
+        for i in range(0, len(documents), self.batch_size):
+            scores.append(self.score(query, documents[i:i + self.batch_size]))
+            if deadline is not None and time.perf_counter() > deadline and i + self.batch_size < len(documents):
+                elapsed = (time.perf_counter() - started) * 1000
+                self._record(elapsed, timeout=True)
+                log.warning(f"重排序超出时间预算({budget_ms:.0f}ms)，已用 {elapsed:.0f}ms，沿用检索顺序")
+                return results[:top_k]
+
+        all_scores = np.concatenate(scores)
+        order = np.argsort(-all_scores, kind="stable")[:top_k]
+        self._record((time.perf_counter() - started) * 1000, timeout=False)
+        return [{**results[i], "rerank_score": float(all_scores[i])} for i in order]
+
+    def warm_up(self) -> float:
+        """
+        预热：加载模型并对合成候选打分一次，触发首次推理的图优化
+
+        Returns:
+            耗时（毫秒）
+        """
+        started = time.perf_counter()
+        self.load()
+        self.score("预热查询", ["预热文档"] * min(self.batch_size, 4))
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    def _record(self, elapsed_ms: float, timeout: bool):
+        """记录耗时统计"""
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        if timeout:
+            self.timeouts += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取重排序统计信息"""
+        return {
+            "backend": self.backend,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0
+        }
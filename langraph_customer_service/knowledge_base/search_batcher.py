@@ -0,0 +1,145 @@
+"""
+检索微批处理模块
+将短时间内并发到达的检索请求合并为一次 search_batch 调用
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import Future
+import queue
+import threading
+import time
+from config import settings
+from langraph_customer_service.knowledge_base.filters import MetadataFilter, filter_key
+from langraph_customer_service.utils import log
+
+
+class SearchBatcher:
+    """
+    检索微批处理器
+
+    后台线程从队列中取出请求，在 max_wait_ms 内继续等待更多请求，
+    凑满 max_batch_size 或等待超时后合并为一次批量检索，再把结果分发给各调用方
+    """
+
+    def __init__(
+        self,
+        knowledge_base,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        """
+        初始化微批处理器
+
+        Args:
+            knowledge_base: 知识库实例
+            max_batch_size: 单批最多合并的请求数，默认使用配置
+            max_wait_ms: 收到首个请求后等待后续请求的最长时间（毫秒），默认使用配置
+        """
+        self.knowledge_base = knowledge_base
+        self.max_batch_size = max_batch_size if max_batch_size is not None else settings.kb_batch_max_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.kb_batch_max_wait_ms) / 1000
+
+        # 请求：(查询, top_k, 过滤条件, 结果Future)；None 表示停止
+        self._queue: "queue.Queue[Optional[Tuple[str, int, Optional[MetadataFilter], Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.requests = 0
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        提交检索请求并等待结果
+
+        Args:
+            query: 查询文本
+            top_k: 返回top-k个结果
+            filters: 元数据过滤条件，条件相同的请求合并为一次批量检索
+
+        Returns:
+            检索结果列表，格式与 KnowledgeBase.search() 相同
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((query, top_k, filters, future))
+        return future.result()
+
+    def close(self):
+        """停止后台线程"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计信息"""
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0
+        }
+
+    def _ensure_started(self):
+        """首次使用时启动后台线程"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kb-search-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """后台线程主循环"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch: List[Tuple[str, int, Optional[MetadataFilter], Future]]):
+        """执行一批检索：过滤条件相同的请求合并检索，按最大 top_k 检索后为每个请求截取结果"""
+        self.batches += 1
+        self.requests += len(batch)
+
+        groups: Dict[str, List[Tuple[str, int, Optional[MetadataFilter], Future]]] = {}
+        for item in batch:
+            groups.setdefault(filter_key(item[2]), []).append(item)
+
+        for group in groups.values():
+            queries = [query for query, _, _, _ in group]
+            top_k = max(k for _, k, _, _ in group)
+            try:
+                results = self.knowledge_base.search_batch(queries, top_k=top_k, filters=group[0][2])
+            except Exception as e:
+                log.error(f"批量检索失败: {e}")
+                for _, _, _, future in group:
+                    future.set_exception(e)
+                continue
+
+            for (_, k, _, future), result in zip(group, results):
+                future.set_result(result[:k])
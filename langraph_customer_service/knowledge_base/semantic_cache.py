@@ -0,0 +1,180 @@
+"""
+语义回复缓存模块
+按查询向量的余弦相似度复用已生成的回复
+"""
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import threading
+import time
+import faiss
+import numpy as np
+from config import settings
+from langraph_customer_service.utils import log
+
+
+class SemanticCache:
+    """
+    语义回复缓存
+
+    复用知识库的嵌入模型生成查询向量，存放在小型FAISS内积索引中，
+    支持TTL过期和LRU淘汰；知识库内容变化（版本号变化）时整体失效
+    """
+
+    def __init__(
+        self,
+        knowledge_base,
+        threshold: Optional[float] = None,
+        ttl: Optional[float] = None,
+        max_size: Optional[int] = None
+    ):
+        """
+        初始化语义缓存
+
+        Args:
+            knowledge_base: 知识库实例，用于生成查询向量和判断失效
+            threshold: 命中所需的最低余弦相似度
+            ttl: 缓存条目存活时间（秒）
+            max_size: 最大缓存条目数
+        """
+        self.knowledge_base = knowledge_base
+        self.threshold = threshold if threshold is not None else settings.semantic_cache_threshold
+        self.ttl = ttl if ttl is not None else settings.semantic_cache_ttl
+        self.max_size = max_size if max_size is not None else settings.semantic_cache_max_size
+
+        # 每个缓存范围一个索引，近邻只在同范围的条目中查找
+        self._indexes: Dict[str, faiss.Index] = {}
+        # 条目按访问顺序排列：id -> (查询, 缓存范围, 回复, 写入时间)
+        self._entries: "OrderedDict[int, Tuple[str, str, str, float]]" = OrderedDict()
+        self._next_id = 0
+        self._kb_version = knowledge_base.version
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def lookup(self, query: str, scope: str) -> Optional[str]:
+        """
+        查询缓存
+
+        Args:
+            query: 用户问题
+            scope: 缓存范围（意图及检索过滤条件），只有同范围的条目才能命中
+
+        Returns:
+            命中时返回缓存的回复，否则返回None
+        """
+        embedding = self.knowledge_base.encode_queries([query])
+
+        with self._lock:
+            self._check_version()
+
+            entry_id = self._nearest(embedding, scope)
+            entry = self._entries.get(entry_id) if entry_id is not None else None
+
+            if entry is not None and time.time() - entry[3] > self.ttl:
+                self._remove(entry_id)
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+
+        log.info(f"语义缓存命中: {query[:30]} ≈ {entry[0][:30]}")
+        return entry[2]
+
+    def store(self, query: str, scope: str, response: str):
+        """
+        写入缓存
+
+        Args:
+            query: 用户问题
+            scope: 缓存范围，与 lookup() 一致
+            response: 生成的回复
+        """
+        embedding = self.knowledge_base.encode_queries([query])
+
+        with self._lock:
+            self._check_version()
+
+            # 同范围内已有足够相似的条目时不重复写入
+            if self._nearest(embedding, scope) is not None:
+                return
+
+            while len(self._entries) >= self.max_size:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+
+            entry_id = self._next_id
+            self._next_id += 1
+            if scope not in self._indexes:
+                self._indexes[scope] = faiss.IndexIDMap2(faiss.IndexFlatIP(embedding.shape[1]))
+            self._indexes[scope].add_with_ids(embedding, np.array([entry_id], dtype='int64'))
+            self._entries[entry_id] = (query, scope, response, time.time())
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+    def _nearest(self, embedding: np.ndarray, scope: str) -> Optional[int]:
+        """返回同范围内相似度达到阈值的最近条目id（需持有锁）"""
+        index = self._indexes.get(scope)
+        if index is None or index.ntotal == 0:
+            return None
+
+        scores, ids = index.search(embedding, 1)
+        if ids[0][0] == -1 or scores[0][0] < self.threshold:
+            return None
+        return int(ids[0][0])
+
+    def _remove(self, entry_id: int):
+        """删除单个条目（需持有锁）"""
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            index = self._indexes[entry[1]]
+            index.remove_ids(np.array([entry_id], dtype='int64'))
+            if index.ntotal == 0:
+                del self._indexes[entry[1]]
+
+    def _check_version(self):
+        """知识库版本变化时清空缓存（需持有锁）"""
+        if self.knowledge_base.version != self._kb_version:
+            log.info("知识库已更新，清空语义缓存")
+            self._clear()
+            self._kb_version = self.knowledge_base.version
+            self.invalidations += 1
+
+    def _clear(self):
+        """清空缓存（需持有锁）"""
+        self._indexes.clear()
+        self._entries.clear()
@@ -0,0 +1,397 @@
+"""
+知识库分段存储模块
+以只追加的段（segment）持久化知识库，清单文件（manifest）原子替换
+
+目录结构：
+    manifest.json          已提交的段列表、删除标记和索引规格，写临时文件后 os.replace 替换
+    trained_seg_000001.faiss  训练好的空索引模板（IVF类索引的聚类中心/码本）
+    seg_000001/
+        texts.bin          UTF-8 文档文本依次拼接，可直接mmap
+        offsets.npy        int64偏移数组（长度为文档数+1）
+        metadata.jsonl     每行一条文档元数据
+        ids.jsonl          每行一条 [文档ID, 内容哈希]
+        vectors.npy        归一化的文档向量（float32 或 float16），合并段和去重分析时无需重新编码
+        index.faiss        本段文档的向量索引；Flat索引不单独保存，加载时由 vectors.npy 重建
+        lexical.npz        本段文档的BM25倒排索引（CSR数组）
+
+新增文档只写新段，已有段从不改写；删除和更新在清单中记为删除标记，
+合并段时才真正移除。写入中途崩溃只会留下未被清单引用的目录，下次保存时清理
+"""
+from typing import Dict, Any, List, Optional, Sequence, Iterator, Union, Set, Tuple
+from pathlib import Path
+import bisect
+import json
+import mmap
+import os
+import shutil
+import faiss
+import numpy as np
+from langraph_customer_service.utils import log
+
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+LEXICAL_NAME = "lexical.npz"
+
+
+class IndexSegment:
+    """知识库中一段连续文档的向量索引，索引内的序号加上 start 即为全局文档序号"""
+
+    def __init__(
+        self,
+        start: int,
+        index: faiss.Index,
+        name: Optional[str] = None,
+        vectors: Optional[np.ndarray] = None
+    ):
+        """
+        Args:
+            start: 本段第一条文档的全局序号
+            index: 只包含本段向量的索引
+            name: 段目录名，尚未保存时为None
+            vectors: 已落盘段的文档向量（mmap），尚未保存的段在 add() 时累积
+        """
+        self.start = start
+        self.index = index
+        self.name = name
+        # 段内已删除文档的序号
+        self.deleted: Set[int] = set()
+
+        self._vectors = vectors
+        self._pending: List[np.ndarray] = []
+        self._selector = None
+
+    @property
+    def count(self) -> int:
+        """本段向量数（含已删除）"""
+        return self.index.ntotal
+
+    @property
+    def live_count(self) -> int:
+        """本段未删除的向量数"""
+        return self.count - len(self.deleted)
+
+    def add(self, embeddings: np.ndarray):
+        """向尚未保存的段追加向量"""
+        self.index.add(embeddings)
+        self._pending.append(embeddings)
+
+    def vectors(self) -> np.ndarray:
+        """本段全部文档向量（已落盘的段为存储精度，可能是float16）"""
+        if self._pending:
+            parts = ([self._vectors] if self._vectors is not None else []) + self._pending
+            self._vectors = np.vstack(parts)
+            self._pending = []
+        if self._vectors is None:
+            return np.zeros((0, self.index.d), dtype="float32")
+        return self._vectors
+
+    def seal(self, name: str, vectors: np.ndarray):
+        """段落盘后记录目录名，向量改为从磁盘读取"""
+        self.name = name
+        self._vectors = vectors
+        self._pending = []
+
+    def delete(self, local_id: int):
+        """标记段内文档为已删除"""
+        self.deleted.add(local_id)
+        self._selector = None
+
+    def live_ids(self) -> np.ndarray:
+        """段内未删除文档的序号（升序）"""
+        if not self.deleted:
+            return np.arange(self.count, dtype="int64")
+        deleted = np.fromiter(self.deleted, dtype="int64", count=len(self.deleted))
+        return np.setdiff1d(np.arange(self.count, dtype="int64"), deleted)
+
+    def selector(self):
+        """排除已删除文档的ID选择器，无删除时返回None"""
+        if not self.deleted:
+            return None
+        if self._selector is None:
+            ids = np.fromiter(self.deleted, dtype="int64", count=len(self.deleted))
+            batch = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+            selector = faiss.IDSelectorNot(batch)
+            # IDSelectorNot 只持有指针，被引用的对象需保持存活
+            selector.referenced_objects = [batch, ids]
+            self._selector = selector
+        return self._selector
+
+
+class TextSegment:
+    """已落盘段的文档文本，通过mmap按需读取"""
+
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: 段目录
+        """
+        self.offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        self._file = open(directory / "texts.bin", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # 长度为0的文件无法mmap
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._data[start:end].decode("utf-8")
+
+    def close(self):
+        """释放mmap和文件句柄"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class DocumentColumn:
+    """
+    按全局序号访问文档文本
+
+    已落盘的段通过 TextSegment 按需读取，尚未保存的文档保存在内存列表中；
+    对外表现为只读序列，兼容原先的 documents 列表用法
+    """
+
+    def __init__(self):
+        self._parts: List[Union[TextSegment, List[str]]] = []
+        self._starts: List[int] = []
+
+    def __len__(self) -> int:
+        if not self._parts:
+            return 0
+        return self._starts[-1] + len(self._parts[-1])
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        part = bisect.bisect_right(self._starts, i) - 1
+        return self._parts[part][i - self._starts[part]]
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self._parts:
+            for i in range(len(part)):
+                yield part[i]
+
+    def add_segment(self, texts: TextSegment):
+        """追加一个已落盘的段"""
+        self._starts.append(len(self))
+        self._parts.append(texts)
+
+    def extend(self, texts: Sequence[str]):
+        """追加尚未保存的文档"""
+        if not self._parts or not isinstance(self._parts[-1], list):
+            self._starts.append(len(self))
+            self._parts.append([])
+        self._parts[-1].extend(texts)
+
+    def pending(self) -> List[str]:
+        """尚未保存的文档"""
+        if self._parts and isinstance(self._parts[-1], list):
+            return self._parts[-1]
+        return []
+
+    def seal(self, texts: TextSegment):
+        """未保存的文档落盘后，改为从对应的段读取"""
+        if self._parts and isinstance(self._parts[-1], list):
+            self._parts[-1] = texts
+        else:
+            self.add_segment(texts)
+
+    def close(self):
+        """关闭所有段"""
+        for part in self._parts:
+            if isinstance(part, TextSegment):
+                part.close()
+        self._parts = []
+        self._starts = []
+
+
+class SegmentStore:
+    """分段存储目录"""
+
+    def __init__(self, root: Path):
+        """
+        Args:
+            root: 存储根目录
+        """
+        self.root = Path(root)
+        self.manifest_path = self.root / MANIFEST_NAME
+
+    def exists(self) -> bool:
+        """是否已有提交过的清单"""
+        return self.manifest_path.exists()
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        """读取清单，不存在时返回None"""
+        if not self.manifest_path.exists():
+            return None
+        manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"不支持的知识库存储格式: {manifest.get('format')}")
+        return manifest
+
+    def commit(self, manifest: Dict[str, Any]):
+        """原子替换清单：先写临时文件并刷盘，再 os.replace"""
+        manifest = dict(manifest, format=FORMAT_VERSION)
+        tmp_path = self.manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def next_segment_name(self) -> str:
+        """下一个段的目录名，按磁盘上已有的段编号递增，不会与任何遗留目录重名"""
+        seqs = [
+            int(path.name[4:10]) for path in self.root.glob("seg_*")
+            if path.name[4:10].isdigit()
+        ]
+        return f"seg_{max(seqs, default=0) + 1:06d}"
+
+    def write_template(self, name: str, index: faiss.Index) -> str:
+        """
+        保存训练好的空索引模板
+
+        模板文件名随首个段变化，重建知识库时不会覆盖旧清单仍在引用的模板
+
+        Returns:
+            模板文件名
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        filename = f"trained_{name}.faiss"
+        tmp_path = self.root / f"{filename}.{os.getpid()}.tmp"
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, self.root / filename)
+        return filename
+
+    def read_template(self, filename: str) -> faiss.Index:
+        """读取空索引模板"""
+        return faiss.read_index(str(self.root / filename))
+
+    def write_segment(
+        self,
+        name: str,
+        texts: Sequence[str],
+        metadata: Sequence[Dict[str, Any]],
+        ids: Sequence[Tuple[str, str]],
+        vectors: np.ndarray,
+        index: Optional[faiss.Index],
+        lexical=None,
+        vector_dtype: str = "float32"
+    ) -> Path:
+        """
+        写入一个新段：先写到临时目录，全部落盘后再重命名为正式目录
+
+        Args:
+            name: 段目录名
+            texts: 文档文本
+            metadata: 文档元数据
+            ids: (文档ID, 内容哈希) 列表
+            vectors: 文档向量
+            index: 只包含本段向量的索引，None 表示Flat索引（内容与 vectors 相同，不重复保存）
+            lexical: 本段的BM25倒排索引（LexicalSegment），未启用词法检索时为None
+            vector_dtype: 向量的存储精度 float32 / float16
+
+        Returns:
+            段目录
+        """
+        directory = self.root / name
+        tmp_dir = self.root / f"{name}.tmp"
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        with open(tmp_dir / "texts.bin", "wb") as f:
+            for i, text in enumerate(texts):
+                data = text.encode("utf-8")
+                f.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        np.save(tmp_dir / "offsets.npy", offsets)
+
+        with open(tmp_dir / "metadata.jsonl", "w", encoding="utf-8") as f:
+            for meta in metadata:
+                f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(tmp_dir / "ids.jsonl", "w", encoding="utf-8") as f:
+            for doc_id, content_hash in ids:
+                f.write(json.dumps([doc_id, content_hash], ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        np.save(tmp_dir / "vectors.npy", np.ascontiguousarray(vectors, dtype=vector_dtype))
+
+        if index is not None:
+            faiss.write_index(index, str(tmp_dir / "index.faiss"))
+
+        if lexical is not None:
+            lexical.save(tmp_dir / LEXICAL_NAME)
+
+        os.replace(tmp_dir, directory)
+        return directory
+
+    def read_texts(self, name: str) -> TextSegment:
+        """打开段的文档文本"""
+        return TextSegment(self.root / name)
+
+    def read_metadata(self, name: str) -> List[Dict[str, Any]]:
+        """读取段的全部元数据"""
+        with open(self.root / name / "metadata.jsonl", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def read_ids(self, name: str) -> List[Tuple[str, str]]:
+        """读取段的 (文档ID, 内容哈希) 列表"""
+        with open(self.root / name / "ids.jsonl", encoding="utf-8") as f:
+            return [tuple(json.loads(line)) for line in f]
+
+    def read_vectors(self, name: str) -> np.ndarray:
+        """以mmap方式读取段的文档向量（保持存储精度）"""
+        return np.load(self.root / name / "vectors.npy", mmap_mode="r")
+
+    def lexical_path(self, name: str) -> Optional[Path]:
+        """段的BM25倒排索引文件，不存在（旧版本写入的段）时返回None"""
+        path = self.root / name / LEXICAL_NAME
+        return path if path.exists() else None
+
+    def read_index(self, name: str, mmap_index: bool = False) -> faiss.Index:
+        """
+        读取段的向量索引
+
+        Args:
+            name: 段目录名
+            mmap_index: 是否以mmap方式只读映射，多个进程共享页缓存；
+                faiss 1.8 只对IVF类索引的倒排表做mmap，其他索引类型仍会完整读入内存
+        """
+        path = self.root / name / "index.faiss"
+        if not path.exists():
+            # Flat索引由mmap的向量文件重建，float16存储时检索精度与向量文件一致
+            vectors = np.ascontiguousarray(self.read_vectors(name), dtype="float32")
+            index = faiss.IndexFlatIP(vectors.shape[1])
+            index.add(vectors)
+            return index
+        path = str(path)
+        if mmap_index:
+            try:
+                return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                log.warning(f"索引不支持mmap加载，改为完整读取: {e}")
+        return faiss.read_index(path)
+
+    def cleanup(self, manifest: Dict[str, Any]):
+        """删除未被清单引用的段目录和模板（写入中途崩溃、重建或合并后遗留）"""
+        live = {segment["name"] for segment in manifest.get("segments", [])}
+        for path in self.root.glob("seg_*"):
+            if path.is_dir() and path.name not in live:
+                log.info(f"清理未引用的知识库段: {path.name}")
+                shutil.rmtree(path, ignore_errors=True)
+        for path in self.root.glob("trained_*.faiss"):
+            if path.name != manifest.get("template"):
+                path.unlink(missing_ok=True)
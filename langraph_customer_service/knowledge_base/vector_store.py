@@ -1,106 +1,648 @@
 """
 向量知识库模块
-使用FAISS进行向量检索
+使用FAISS进行向量检索，以只追加的段持久化
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterator
 from pathlib import Path
+import hashlib
 import pickle
+import threading
+import time
+import uuid
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from config import settings
+from langraph_customer_service.knowledge_base.embeddings import (
+    load_local_embedding_model, create_remote_model, embedding_fingerprint
+)
+from langraph_customer_service.knowledge_base.query_cache import QueryEmbeddingCache
+from langraph_customer_service.knowledge_base.index import (
+    IndexSpec, build_index, apply_search_params, migrate_l2_index, make_search_params, make_id_selector,
+    reconstruct_all
+)
+from langraph_customer_service.knowledge_base.storage import SegmentStore, IndexSegment, DocumentColumn
+from langraph_customer_service.knowledge_base.chunking import DocumentChunker, chunk_id, assemble_chunks
+from langraph_customer_service.knowledge_base.filters import MetadataIndex, MetadataFilter
+from langraph_customer_service.knowledge_base.lexical import (
+    LexicalIndex, LexicalSegment, is_code_query, reciprocal_rank_fusion
+)
 from langraph_customer_service.utils import log
 
 
+# 预热用的合成查询：覆盖短、中、长几种输入长度
+WARMUP_TEXTS = [
+    "你好",
+    "iPhone 15 Pro 的价格是多少，有哪些颜色可选？",
+    "我上周买的笔记本电脑屏幕出现了亮点，请问在保修期内可以免费更换吗？如果需要寄回，运费由谁承担，"
+    "大概多久可以处理完成？另外换货期间能否提供备用机？",
+]
+
+
 class KnowledgeBase:
     """向量知识库"""
     
-    def __init__(self, embedding_model: Optional[str] = None):
+    def __init__(self, embedding_model: Optional[str] = None, index_spec: Optional[IndexSpec] = None):
         """
         初始化知识库
         
         Args:
             embedding_model: 嵌入模型名称
+            index_spec: 向量索引规格，默认使用配置；load() 时以保存的规格为准
         """
         self.embedding_model_name = embedding_model or settings.embedding_model
+        self.index_spec = index_spec or IndexSpec.from_settings()
         self.model = None
-        self.index = None
-        self.documents = []
-        self.metadata = []
+        self._model_lock = threading.Lock()
+        
+        # 训练好的空索引模板，每个段的索引都从它克隆
+        self.template: Optional[faiss.Index] = None
+        # 各段的向量索引，最后一段可能是尚未保存的内存段
+        self.segments: List[IndexSegment] = []
+        self.documents = DocumentColumn()
+        self.metadata: List[Dict[str, Any]] = []
+        # 元数据倒排索引，检索过滤时使用
+        self.metadata_index = MetadataIndex()
+        # BM25词法索引，与向量检索结果融合
+        self.lexical = LexicalIndex() if settings.kb_lexical_enabled else None
+        # 每行文档的稳定ID和内容哈希（行号即全局文档序号，删除/更新后旧行保留为删除标记）
+        self.doc_ids: List[str] = []
+        self.content_hashes: List[str] = []
+        # 文档ID -> 当前有效的行号
+        self._rows: Dict[str, int] = {}
+        # 已删除的行号
+        self._deleted: Set[int] = set()
+        # 删除标记是否有尚未保存的变化
+        self._deletes_dirty = False
+        
+        # 已落盘的文档数，之后的文档在下次 save() 时写成新段
+        self._persisted = 0
+        # 当前内容对应的存储清单，None 表示下次保存时新建存储
+        self._manifest: Optional[Dict[str, Any]] = None
         
+        # 知识库版本号：内容每次变化时递增，供语义缓存等判断是否失效
+        self.version = 0
+        
+        # 最近一次 load() 各阶段耗时（毫秒）
+        self.load_timings: Dict[str, float] = {}
+        
+        self.store = SegmentStore(Path(settings.vector_store_path))
+        # 旧版单文件存储，仅用于迁移
         self.index_path = Path(settings.vector_store_path) / "faiss.index"
         self.docs_path = Path(settings.vector_store_path) / "documents.pkl"
+        self.spec_path = Path(settings.vector_store_path) / "index_spec.json"
+        self.query_cache_path = Path(settings.vector_store_path) / "query_cache.npz"
         
-        log.info(f"初始化知识库: embedding_model={self.embedding_model_name}")
+        # 查询向量缓存：重复的问题直接复用向量，跳过嵌入模型
+        self.query_cache = (
+            QueryEmbeddingCache(settings.kb_query_cache_size)
+            if settings.kb_query_cache_size > 0 else None
+        )
+        
+        log.info(f"初始化知识库: embedding_model={self.embedding_model_name}, index={self.index_spec.type}")
     
     def _load_embedding_model(self):
-        """加载嵌入模型"""
-        if self.model is None:
-            log.info("加载嵌入模型...")
-            # 检查本地模型路径
-            local_model_path = Path("./models/bge-large-zh-v1.5")
-            if local_model_path.exists():
-                log.info(f"使用本地模型: {local_model_path}")
-                self.model = SentenceTransformer(str(local_model_path))
-            else:
-               raise "务必搞清楚，不允许自动下载 太慢了！"
-            log.info("嵌入模型加载完成")
+        """加载嵌入模型（配置了共享嵌入服务时改为连接服务）"""
+        if self.model is not None:
+            return
+        # 后台预热与首个请求可能同时触发加载
+        with self._model_lock:
+            if self.model is None:
+                log.info("加载嵌入模型...")
+                if settings.embedding_service_address:
+                    self.model = create_remote_model()
+                else:
+                    self.model = load_local_embedding_model()
+                log.info("嵌入模型加载完成")
+    
+    def warm_up(self, rounds: Optional[int] = None) -> Dict[str, float]:
+        """
+        预热：加载嵌入模型，用不同长度的合成查询编码几轮，再检索一次
+        
+        首次推理要做图优化、分配内存，不预热时由上线后的第一批请求承担，表现为尾延迟尖峰；
+        检索一次使索引页进入页缓存。合成查询不写入查询向量缓存
+        
+        Args:
+            rounds: 编码轮数，默认使用配置
+        
+        Returns:
+            各阶段耗时（毫秒）
+        """
+        rounds = settings.warmup_rounds if rounds is None else rounds
+        timings: Dict[str, float] = {}
+        
+        step = time.perf_counter()
+        self._load_embedding_model()
+        timings["model"] = (time.perf_counter() - step) * 1000
+        
+        step = time.perf_counter()
+        for _ in range(rounds):
+            for text in WARMUP_TEXTS:
+                self._encode([text])
+            embeddings = self._encode(WARMUP_TEXTS)
+        timings["encode"] = (time.perf_counter() - step) * 1000
+        
+        if rounds and self.count:
+            step = time.perf_counter()
+            self._search_segments(embeddings, min(3, self.count))
+            timings["search"] = (time.perf_counter() - step) * 1000
+        
+        timings = {name: round(ms, 1) for name, ms in timings.items()}
+        log.info(f"知识库预热完成: {timings}")
+        return timings
+    
+    @property
+    def count(self) -> int:
+        """有效文档数（不含已删除）"""
+        return len(self.documents) - len(self._deleted)
+    
+    @staticmethod
+    def content_hash(document: str) -> str:
+        """文档内容哈希，内容不变的文档无需重新编码"""
+        return hashlib.sha256(document.encode("utf-8")).hexdigest()
     
     def add_document(
         self,
         document: str,
-        metadata: Optional[Dict[str, Any]] = None
-    ):
+        metadata: Optional[Dict[str, Any]] = None,
+        doc_id: Optional[str] = None
+    ) -> str:
         """
         添加单条文档到知识库
         
         Args:
             document: 文档内容
             metadata: 元数据
+            doc_id: 文档ID，默认自动生成
+        
+        Returns:
+            文档ID
         """
-        self.add_documents([document], [metadata] if metadata else None)
+        return self.add_documents(
+            [document],
+            [metadata] if metadata else None,
+            [doc_id] if doc_id else None
+        )[0]
     
     def add_documents(
         self,
         documents: List[str],
-        metadata: Optional[List[Dict[str, Any]]] = None
-    ):
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
         """
         添加文档到知识库
         
         Args:
             documents: 文档列表
             metadata: 元数据列表
+            ids: 文档ID列表，默认自动生成；ID已存在时替换原文档
+        
+        Returns:
+            文档ID列表
+        """
+        log.info(f"添加 {len(documents)} 条文档到知识库")
+        
+        embeddings = self._encode_documents(documents)
+        ids = ids or [uuid.uuid4().hex for _ in documents]
+        self._append(documents, metadata or [{} for _ in documents], ids, embeddings)
+        
+        log.info(f"知识库当前文档数: {self.count}")
+        return ids
+    
+    def upsert_documents(
+        self,
+        documents: List[str],
+        ids: List[str],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        embeddings: Optional[Dict[str, np.ndarray]] = None
+    ) -> Dict[str, int]:
+        """
+        按ID插入或更新文档
+        
+        内容和元数据都未变化的文档直接跳过；只有元数据变化时复用已有向量，
+        只对内容变化的文档调用嵌入模型
+        
+        Args:
+            documents: 文档列表
+            ids: 文档ID列表
+            metadata: 元数据列表
+            embeddings: 预先算好的归一化向量（文档ID -> 向量），命中的文档不再调用嵌入模型
+        
+        Returns:
+            各类文档数：added / updated / unchanged
+        """
+        metadata = metadata or [{} for _ in documents]
+        stats = {"added": 0, "updated": 0, "unchanged": 0}
+        
+        to_encode: List[int] = []
+        reused: List[Tuple[int, np.ndarray]] = []
+        for i, (document, doc_id, meta) in enumerate(zip(documents, ids, metadata)):
+            row = self._rows.get(doc_id)
+            if row is None:
+                stats["added"] += 1
+                to_encode.append(i)
+                continue
+            
+            same_content = self.content_hashes[row] == self.content_hash(document)
+            if same_content and self.metadata[row] == meta:
+                stats["unchanged"] += 1
+                continue
+            
+            stats["updated"] += 1
+            if same_content:
+                reused.append((i, self._vector(row)))
+            else:
+                to_encode.append(i)
+        
+        if reused:
+            rows = [i for i, _ in reused]
+            self._append(
+                [documents[i] for i in rows],
+                [metadata[i] for i in rows],
+                [ids[i] for i in rows],
+                np.vstack([vector for _, vector in reused])
+            )
+        
+        if to_encode:
+            embeddings = embeddings or {}
+            missing = [i for i in to_encode if ids[i] not in embeddings]
+            if missing:
+                encoded = self._encode_documents([documents[i] for i in missing])
+                embeddings = {**embeddings, **{ids[i]: vector for i, vector in zip(missing, encoded)}}
+            self._append(
+                [documents[i] for i in to_encode],
+                [metadata[i] for i in to_encode],
+                [ids[i] for i in to_encode],
+                np.vstack([embeddings[ids[i]] for i in to_encode]).astype('float32')
+            )
+        
+        log.info(f"文档同步完成: {stats}, 当前文档数: {self.count}")
+        return stats
+    
+    def needs_encoding(self, doc_id: str, document: str) -> bool:
+        """文档是新增的或内容有变化，upsert 时需要调用嵌入模型"""
+        row = self._rows.get(doc_id)
+        return row is None or self.content_hashes[row] != self.content_hash(document)
+    
+    def ingest_documents(
+        self,
+        documents: List[str],
+        ids: List[str],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        chunker: Optional[DocumentChunker] = None
+    ) -> Dict[str, int]:
         """
+        分块后按ID同步长文档
+        
+        每个文档按句子边界切成不超过嵌入模型长度上限的块，块ID为"文档ID#序号"，
+        元数据中记录 parent_id / chunk_index / chunk_count / chunk_overlap；
+        文档变短后多出的旧块会被删除
+        
+        Args:
+            documents: 文档列表
+            ids: 文档ID列表
+            metadata: 元数据列表，会复制到每个块
+            chunker: 分块器，默认按配置并使用嵌入模型的分词器计数
+        
+        Returns:
+            块的同步统计：added / updated / unchanged / deleted
+        """
+        chunk_texts, chunk_ids, chunk_metadata = self.chunk_documents(documents, ids, metadata, chunker)
+        stale = self.stale_chunks(chunk_metadata)
+        
+        stats = self.upsert_documents(chunk_texts, chunk_ids, chunk_metadata)
+        stats["deleted"] = self.delete_documents(stale)
+        return stats
+    
+    def chunk_documents(
+        self,
+        documents: List[str],
+        ids: List[str],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        chunker: Optional[DocumentChunker] = None
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """
+        切分文档（不读写知识库内容，可在其他线程中调用）
+        
+        Args:
+            documents: 文档列表
+            ids: 文档ID列表
+            metadata: 元数据列表，会复制到每个块
+            chunker: 分块器，默认按配置并使用嵌入模型的分词器计数
+        
+        Returns:
+            (块文本, 块ID, 块元数据)
+        """
+        metadata = metadata or [{} for _ in documents]
+        chunker = chunker or DocumentChunker(count_tokens=self._token_counter())
+        
+        chunk_texts: List[str] = []
+        chunk_ids: List[str] = []
+        chunk_metadata: List[Dict[str, Any]] = []
+        
+        for document, parent_id, meta in zip(documents, ids, metadata):
+            chunks = chunker.split(document)
+            for i, chunk in enumerate(chunks):
+                chunk_texts.append(chunk["text"])
+                chunk_ids.append(chunk_id(parent_id, i))
+                chunk_metadata.append({
+                    **meta,
+                    "parent_id": parent_id,
+                    "chunk_index": i,
+                    "chunk_count": len(chunks),
+                    "chunk_overlap": chunk["overlap"]
+                })
+        
+        log.info(f"{len(documents)} 条文档切分为 {len(chunk_texts)} 个块")
+        return chunk_texts, chunk_ids, chunk_metadata
+    
+    def stale_chunks(self, chunk_metadata: List[Dict[str, Any]]) -> List[str]:
+        """
+        文档重新分块后变短时，多出来需要删除的旧块ID
+        
+        Args:
+            chunk_metadata: chunk_documents() 返回的块元数据
+        """
+        stale: List[str] = []
+        for meta in chunk_metadata:
+            if meta["chunk_index"] != 0:
+                continue
+            parent_id = meta["parent_id"]
+            row = self._rows.get(chunk_id(parent_id, 0))
+            previous_count = self.metadata[row].get("chunk_count", 0) if row is not None else 0
+            stale.extend(chunk_id(parent_id, i) for i in range(meta["chunk_count"], previous_count))
+        return stale
+    
+    def expand_chunks(
+        self,
+        results: List[Dict[str, Any]],
+        neighbors: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        将检索命中的块按所属文档合并，并补上前后相邻的块
+        
+        同一文档的多个命中块合并为一段去除重叠后的连续文本，按文档的最高分排序；
+        未分块的文档原样返回
+        
+        Args:
+            results: search() 的结果
+            neighbors: 每个命中块向前后各扩展的块数，默认使用配置
+        
+        Returns:
+            合并后的结果，格式与 search() 相同，metadata 为所属文档的元数据
+        """
+        neighbors = settings.kb_chunk_neighbors if neighbors is None else neighbors
+        
+        grouped: Dict[str, Dict[str, Any]] = {}
+        expanded = []
+        for result in results:
+            meta = result["metadata"]
+            parent_id = meta.get("parent_id")
+            if parent_id is None:
+                expanded.append(result)
+                continue
+            
+            if parent_id not in grouped:
+                grouped[parent_id] = {"result": result, "indexes": set()}
+                expanded.append(grouped[parent_id])
+            index = meta["chunk_index"]
+            grouped[parent_id]["indexes"].update(
+                range(max(0, index - neighbors), min(meta["chunk_count"], index + neighbors + 1))
+            )
+        
+        merged = []
+        for item in expanded:
+            if "indexes" not in item:
+                merged.append(item)
+                continue
+            
+            best = item["result"]
+            parent_id = best["metadata"]["parent_id"]
+            chunks = [
+                chunk for chunk in (
+                    self.get_document(chunk_id(parent_id, index)) for index in sorted(item["indexes"])
+                )
+                if chunk is not None
+            ]
+            merged.append({
+                **best,
+                "id": parent_id,
+                "document": assemble_chunks(chunks),
+                "metadata": {
+                    k: v for k, v in best["metadata"].items()
+                    if k not in ("chunk_index", "chunk_count", "chunk_overlap")
+                }
+            })
+        return merged
+    
+    def _token_counter(self):
+        """嵌入模型分词器的token计数函数，远程模型没有分词器时返回None（按字符估算）"""
         self._load_embedding_model()
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return None
+        return lambda text: len(tokenizer.tokenize(text))
+    
+    def delete_documents(self, ids: List[str]) -> int:
+        """
+        按ID删除文档（记为删除标记，合并段时才真正移除）
         
-        log.info(f"添加 {len(documents)} 条文档到知识库")
+        Args:
+            ids: 文档ID列表
         
-        # 生成嵌入向量
-        embeddings = self.model.encode(documents, show_progress_bar=True)
-        embeddings = np.array(embeddings).astype('float32')
+        Returns:
+            实际删除的文档数
+        """
+        deleted = 0
+        for doc_id in ids:
+            row = self._rows.pop(doc_id, None)
+            if row is not None:
+                self._delete_row(row)
+                deleted += 1
         
-        # 创建或更新FAISS索引
-        if self.index is None:
-            dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
+        if deleted:
+            self.version += 1
+            log.info(f"删除 {deleted} 条文档，当前文档数: {self.count}")
+        return deleted
+    
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按ID获取文档
         
-        self.index.add(embeddings)
+        Returns:
+            包含 id、content、metadata 的字典，不存在时返回None
+        """
+        row = self._rows.get(doc_id)
+        if row is None:
+            return None
+        return {"id": doc_id, "content": self.documents[row], "metadata": self.metadata[row]}
+    
+    def _encode_documents(self, documents: List[str]) -> np.ndarray:
+        """生成归一化的文档向量，内积即余弦相似度"""
+        self._load_embedding_model()
+        embeddings = self.model.encode(documents, show_progress_bar=True, normalize_embeddings=True)
+        return np.array(embeddings).astype('float32')
+    
+    def _append(
+        self,
+        documents: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: List[str],
+        embeddings: np.ndarray
+    ):
+        """追加文档行；同ID的旧行标记为删除"""
+        # 创建FAISS索引模板（IVF类索引用首批文档训练）
+        if self.template is None:
+            self.template = build_index(self.index_spec, embeddings)
+        
+        # 新文档加入尚未保存的内存段
+        if not self.segments or self.segments[-1].name is not None:
+            tail = faiss.clone_index(self.template)
+            apply_search_params(tail, self.index_spec)
+            self.segments.append(IndexSegment(len(self.documents), tail))
+        
+        row = len(self.documents)
+        for doc_id in ids:
+            old_row = self._rows.get(doc_id)
+            if old_row is not None:
+                self._delete_row(old_row)
+            self._rows[doc_id] = row
+            row += 1
+        
+        self.segments[-1].add(embeddings)
+        self.metadata_index.add(len(self.documents), metadata)
+        if self.lexical is not None:
+            self.lexical.add(len(self.documents), documents)
         self.documents.extend(documents)
+        self.metadata.extend(metadata)
+        self.doc_ids.extend(ids)
+        self.content_hashes.extend(self.content_hash(document) for document in documents)
         
-        # 添加元数据
-        if metadata:
-            self.metadata.extend(metadata)
-        else:
-            self.metadata.extend([{} for _ in documents])
+        self.version += 1
+    
+    def _delete_row(self, row: int):
+        """将行标记为删除"""
+        self._deleted.add(row)
+        self._deletes_dirty = True
+        segment = self._segment_of(row)
+        segment.delete(row - segment.start)
+    
+    def _segment_of(self, row: int) -> IndexSegment:
+        """行所在的段"""
+        for segment in reversed(self.segments):
+            if row >= segment.start:
+                return segment
+        raise IndexError(row)
+    
+    def _vector(self, row: int) -> np.ndarray:
+        """取出某一行的文档向量"""
+        segment = self._segment_of(row)
+        return np.asarray(segment.vectors()[row - segment.start:row - segment.start + 1], dtype="float32")
+    
+    def get_vectors(self, ids: List[str]) -> np.ndarray:
+        """
+        按文档ID取出保存的文档向量，无需重新编码
+        
+        Args:
+            ids: 文档ID（分块文档为块ID）
+        
+        Returns:
+            float32 矩阵，第 i 行对应 ids[i]，已归一化
+        
+        Raises:
+            KeyError: 存在不在知识库中的ID
+        """
+        missing = [doc_id for doc_id in ids if doc_id not in self._rows]
+        if missing:
+            raise KeyError(f"文档不存在: {missing[:5]}")
+        rows = np.asarray([self._rows[doc_id] for doc_id in ids], dtype="int64")
+        dim = self.template.d if self.template is not None else 0
+        vectors = np.empty((len(rows), dim), dtype="float32")
+        for segment in self.segments:
+            mask = (rows >= segment.start) & (rows < segment.start + segment.count)
+            if mask.any():
+                vectors[mask] = segment.vectors()[rows[mask] - segment.start]
+        return vectors
+    
+    def iter_vectors(self, block_size: int = 4096) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """
+        按块遍历全部有效文档的向量，供聚类、去重等离线分析使用
+        
+        向量从各段的 vectors.npy 按需读取（mmap），内存中同时只有一块
+        
+        Args:
+            block_size: 每块最多的文档数
         
-        log.info(f"知识库当前文档数: {len(self.documents)}")
+        Yields:
+            (文档ID列表, float32 向量矩阵)
+        """
+        for rows in self._live_blocks(block_size):
+            yield [self.doc_ids[row] for row in rows], self._block_vectors(rows)
+    
+    def find_near_duplicates(
+        self,
+        threshold: Optional[float] = None,
+        block_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        检测近重复文档
+        
+        向量已归一化，内积即余弦相似度；按块做矩阵乘法只计算上三角的块对，
+        内存占用为 block_size² 而不是 N²
+        
+        Args:
+            threshold: 余弦相似度阈值，默认使用配置
+            block_size: 分块大小，默认使用配置
+        
+        Returns:
+            重复文档对列表，每项包含 id_a、id_b、score，按相似度降序；
+            id_a 为先写入的文档
+        """
+        threshold = settings.kb_dedup_threshold if threshold is None else threshold
+        block_size = block_size or settings.kb_dedup_block_size
+        
+        started = time.perf_counter()
+        blocks = list(self._live_blocks(block_size))
+        pairs: List[Tuple[int, int, float]] = []
+        for i, rows_a in enumerate(blocks):
+            vectors_a = self._block_vectors(rows_a)
+            for rows_b in blocks[i:]:
+                vectors_b = vectors_a if rows_b is rows_a else self._block_vectors(rows_b)
+                scores = vectors_a @ vectors_b.T
+                if rows_b is rows_a:
+                    # 同一块只取对角线以上，排除自身和重复的对
+                    scores = np.triu(scores, k=1)
+                a, b = np.nonzero(scores >= threshold)
+                pairs.extend(zip(rows_a[a].tolist(), rows_b[b].tolist(), scores[a, b].tolist()))
+        
+        pairs.sort(key=lambda pair: pair[2], reverse=True)
+        log.info(
+            f"近重复检测: {self.count} 条文档, 阈值 {threshold}, 发现 {len(pairs)} 对, "
+            f"耗时 {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return [
+            {"id_a": self.doc_ids[row_a], "id_b": self.doc_ids[row_b], "score": score}
+            for row_a, row_b, score in pairs
+        ]
+    
+    def _live_blocks(self, block_size: int) -> Iterator[np.ndarray]:
+        """按段切分的有效行号块（升序，块不跨段）"""
+        for segment in self.segments:
+            live = segment.live_ids() + segment.start
+            for i in range(0, len(live), block_size):
+                yield live[i:i + block_size]
+    
+    def _block_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """同一段内若干行的向量，转为float32"""
+        segment = self._segment_of(int(rows[0]))
+        return np.asarray(segment.vectors()[rows - segment.start], dtype="float32")
     
     def search(
         self,
         query: str,
         top_k: int = 3,
-        score_threshold: float = 10.0
+        score_threshold: Optional[float] = None,
+        filters: Optional[MetadataFilter] = None
     ) -> List[Dict[str, Any]]:
         """
         检索相关文档
@@ -108,86 +650,604 @@ class KnowledgeBase:
         Args:
             query: 查询文本
             top_k: 返回top-k个结果
-            score_threshold: 相似度阈值（L2距离，越小越相似）
+            score_threshold: 最低余弦相似度，默认使用配置
+            filters: 元数据过滤条件，如 {"category": "faq"}，格式见 filters 模块
         
         Returns:
-            检索结果列表，score字段为相似度（0-1，越大越相似）
+            检索结果列表，score字段为余弦相似度（越大越相似），编码查询跳过嵌入模型时为None
         """
-        if self.index is None or len(self.documents) == 0:
-            log.warning("知识库为空，无法检索")
+        return self.search_batch([query], top_k, score_threshold, filters)[0]
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        score_threshold: Optional[float] = None,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        批量检索相关文档
+        
+        所有查询一次编码、一次FAISS检索，分摊模型调用开销。
+        过滤条件在索引内生效（只在满足条件的文档中取 top_k），条件越严格结果也不会变少。
+        启用词法检索时与BM25结果按RRF融合，融合分数放在 fusion_score 字段，score 仍为余弦相似度，
+        只被词法召回的文档同样按 score_threshold 过滤；编码查询跳过嵌入模型时没有余弦相似度，
+        score 为 None，只按词法命中返回
+        
+        Args:
+            queries: 查询文本列表
+            top_k: 每个查询返回top-k个结果
+            score_threshold: 最低余弦相似度，默认使用配置
+            filters: 元数据过滤条件，对所有查询生效
+        
+        Returns:
+            与 queries 一一对应的检索结果列表，每项格式与 search() 相同
+        """
+        if score_threshold is None:
+            score_threshold = settings.kb_score_threshold
+        
+        if not queries:
             return []
         
-        self._load_embedding_model()
+        if self.count == 0:
+            log.warning("知识库为空，无法检索")
+            return [[] for _ in queries]
+        
+        rows = None
+        candidates = self.count
+        if filters:
+            rows = self._filter_rows(filters)
+            candidates = len(rows)
+            if candidates == 0:
+                log.debug(f"没有满足过滤条件的文档: {filters}")
+                return [[] for _ in queries]
+        
+        if self.lexical is None:
+            return self._dense_results(queries, top_k, score_threshold, rows, candidates)
+        
+        # 混合检索：两路各召回 kb_hybrid_candidates 个候选后按RRF融合
+        depth = max(top_k, settings.kb_hybrid_candidates)
+        deleted = np.fromiter(self._deleted, dtype="int64", count=len(self._deleted))
+        lexical_hits = [
+            self.lexical.search(query, depth, rows, deleted, settings.kb_lexical_min_match)
+            for query in queries
+        ]
+        
+        # 查询本身是编码（SKU、型号）且词法已精确命中时，不再调用嵌入模型
+        dense = [
+            i for i, query in enumerate(queries)
+            if not (settings.kb_lexical_skip_dense and lexical_hits[i] and is_code_query(query))
+        ]
+        dense_hits: Dict[int, List[Tuple[int, float]]] = {}
+        query_embeddings: Dict[int, np.ndarray] = {}
+        if dense:
+            embeddings = self.encode_queries([queries[i] for i in dense])
+            scores, indices = self._search_segments(embeddings, min(depth, candidates), rows)
+            for i, embedding, row_scores, row_indices in zip(dense, embeddings, scores, indices):
+                query_embeddings[i] = embedding
+                dense_hits[i] = [
+                    (int(idx), float(score)) for score, idx in zip(row_scores, row_indices)
+                    if idx >= 0 and score >= score_threshold
+                ]
         
+        batch_results = []
+        for i in range(len(queries)):
+            if i not in dense_hits:
+                # 编码精确命中：未计算余弦相似度，只给出词法排名的融合分数
+                fused = reciprocal_rank_fusion(
+                    [[row for row, _ in lexical_hits[i]]], [settings.kb_rrf_lexical_weight], settings.kb_rrf_k
+                )
+                batch_results.append([
+                    self._make_result(row, None, fusion_score=fusion_score) for row, fusion_score in fused[:top_k]
+                ])
+                continue
+            
+            cosine = dict(dense_hits[i])
+            fused = reciprocal_rank_fusion(
+                [[row for row, _ in dense_hits[i]], [row for row, _ in lexical_hits[i]]],
+                [settings.kb_rrf_dense_weight, settings.kb_rrf_lexical_weight],
+                settings.kb_rrf_k
+            )
+            results = []
+            for row, fusion_score in fused:
+                # 只被词法召回的文档用保存的向量补算余弦相似度，同样按阈值过滤
+                score = cosine.get(row)
+                if score is None:
+                    score = float(self._vector(row)[0] @ query_embeddings[i])
+                    if score < score_threshold:
+                        continue
+                results.append(self._make_result(row, score, fusion_score=fusion_score))
+                if len(results) == top_k:
+                    break
+            batch_results.append(results)
+        
+        log.debug(f"批量检索 {len(queries)} 个查询，共 {sum(len(r) for r in batch_results)} 条相关文档")
+        return batch_results
+    
+    def _dense_results(
+        self,
+        queries: List[str],
+        top_k: int,
+        score_threshold: float,
+        rows: Optional[np.ndarray],
+        candidates: int
+    ) -> List[List[Dict[str, Any]]]:
+        """仅向量检索"""
         # 生成查询向量
-        query_embedding = self.model.encode([query])
-        query_embedding = np.array(query_embedding).astype('float32')
-        
-        # 检索
-        distances, indices = self.index.search(query_embedding, min(top_k, len(self.documents)))
-        
-        # 整理结果
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if dist <= score_threshold:
-                # 将L2距离转换为相似度分数 (0-1, 越大越相似)
-                # 使用负指数函数将距离转换为相似度
-                similarity = np.exp(-dist)
-                
-                results.append({
-                    "document": self.documents[idx],
-                    "metadata": self.metadata[idx],
-                    "score": float(similarity),  # 相似度 (0-1)
-                    "distance": float(dist),      # 原始L2距离
-                    "index": int(idx)
-                })
+        query_embeddings = self.encode_queries(queries)
+        
+        # 检索（向量均已归一化，内积即余弦相似度）
+        scores, indices = self._search_segments(query_embeddings, min(top_k, candidates), rows)
+        
+        # 整理结果（近似索引结果不足 top_k 时以 -1 补位）
+        batch_results = []
+        for row_scores, row_indices in zip(scores, indices):
+            batch_results.append([
+                self._make_result(int(idx), float(score))
+                for score, idx in zip(row_scores, row_indices)
+                if idx >= 0 and score >= score_threshold
+            ])
+        
+        log.debug(f"批量检索 {len(queries)} 个查询，共 {sum(len(r) for r in batch_results)} 条相关文档")
+        return batch_results
+    
+    def _make_result(self, row: int, score: Optional[float], **extra) -> Dict[str, Any]:
+        """组装一条检索结果，score 为 None 表示未计算余弦相似度"""
+        return {
+            "id": self.doc_ids[row],
+            "document": self.documents[row],
+            "metadata": self.metadata[row],
+            "score": score,
+            "index": row,
+            **extra
+        }
+    
+    def _filter_rows(self, filters: MetadataFilter) -> np.ndarray:
+        """满足过滤条件且未删除的行号（升序）"""
+        rows = self.metadata_index.rows(filters)
+        if self._deleted and len(rows):
+            deleted = np.fromiter(self._deleted, dtype="int64", count=len(self._deleted))
+            rows = rows[~np.isin(rows, deleted)]
+        return rows
+    
+    def _search_segments(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        在各段中分别检索并按分数合并，已删除的文档由ID选择器排除
+        
+        Args:
+            query_embeddings: 查询向量矩阵
+            k: 每个查询的结果数
+            rows: 限定的候选行号（升序、不含已删除），None 表示不限定
         
-        log.debug(f"检索到 {len(results)} 条相关文档")
-        return results
+        Returns:
+            (分数矩阵, 全局文档序号矩阵)，不足 k 个结果时序号为 -1
+        """
+        # 候选很少时直接用保存的向量精确计算，近似索引在严格过滤下容易凑不满结果
+        if rows is not None and len(rows) <= settings.kb_filter_exact_max:
+            return self._search_exact(query_embeddings, k, rows)
+        
+        all_scores, all_ids = [], []
+        for segment in self.segments:
+            if segment.live_count == 0:
+                continue
+            if rows is None:
+                selector, selectivity, limit = segment.selector(), 1.0, segment.live_count
+            else:
+                local = self._segment_rows(segment, rows)
+                if len(local) == 0:
+                    continue
+                selector = make_id_selector(local, segment.count)
+                selectivity, limit = len(local) / segment.count, len(local)
+            params = make_search_params(self.index_spec, selector, selectivity)
+            scores, ids = segment.index.search(query_embeddings, min(k, limit), params=params)
+            all_scores.append(scores)
+            all_ids.append(np.where(ids >= 0, ids + segment.start, -1))
+        
+        scores = np.hstack(all_scores)
+        ids = np.hstack(all_ids)
+        if len(all_scores) > 1:
+            order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+            scores = np.take_along_axis(scores, order, axis=1)
+            ids = np.take_along_axis(ids, order, axis=1)
+        return scores, ids
+    
+    def _search_exact(self, query_embeddings: np.ndarray, k: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """在候选行的原始向量上精确计算内积并取 top-k"""
+        vectors = np.vstack([
+            segment.vectors()[self._segment_rows(segment, rows)] for segment in self.segments
+        ]).astype("float32", copy=False)
+        scores = query_embeddings @ vectors.T
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(scores, order, axis=1), rows[order]
     
-    def save(self):
-        """保存知识库到磁盘"""
-        if self.index is None:
+    @staticmethod
+    def _segment_rows(segment: IndexSegment, rows: np.ndarray) -> np.ndarray:
+        """落在段内的行号，转换为段内序号"""
+        low, high = np.searchsorted(rows, [segment.start, segment.start + segment.count])
+        return rows[low:high] - segment.start
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        生成查询向量
+        
+        Args:
+            queries: 查询文本列表
+        
+        Returns:
+            L2归一化后的float32向量矩阵（bge模型本身输出即为单位向量）
+        """
+        if self.query_cache is None:
+            return self._encode(queries)
+        
+        cached = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        
+        # 未命中的查询合并为一次模型调用
+        if missing:
+            embeddings = self._encode([queries[i] for i in missing])
+            for i, embedding in zip(missing, embeddings):
+                self.query_cache.put(queries[i], embedding)
+                cached[i] = embedding
+        
+        return np.vstack(cached)
+    
+    def _encode(self, queries: List[str]) -> np.ndarray:
+        """调用嵌入模型生成归一化的查询向量"""
+        self._load_embedding_model()
+        embeddings = self.model.encode(queries, normalize_embeddings=True)
+        return np.array(embeddings).astype('float32')
+    
+    def save_query_cache(self):
+        """持久化查询向量缓存（需开启 KB_QUERY_CACHE_PERSIST）"""
+        if self.query_cache is not None and settings.kb_query_cache_persist:
+            self.query_cache.save(self.query_cache_path, embedding_fingerprint())
+    
+    def save(self, compact: bool = True):
+        """
+        保存知识库到磁盘
+        
+        只把上次保存之后新增的文档写成一个新段，再原子替换清单（连同删除标记）；
+        已有的段不会被改写，写入中途崩溃时磁盘上仍是上一次提交的完整状态。
+        删除的文档占比超过 KB_COMPACT_DELETED_RATIO 时自动合并段
+        
+        Args:
+            compact: 是否按删除占比自动合并段，compact() 内部保存时为False，避免重复合并
+        """
+        if len(self.documents) == 0:
             log.warning("知识库为空，跳过保存")
             return
         
-        # 保存FAISS索引
-        faiss.write_index(self.index, str(self.index_path))
+        self.save_query_cache()
+        
+        has_new = self._persisted < len(self.documents)
+        if not has_new and not self._deletes_dirty and self._manifest is not None:
+            log.info("知识库没有变化，无需保存")
+            return
+        
+        self.store.root.mkdir(parents=True, exist_ok=True)
+        
+        manifest = self._manifest
+        if manifest is None:
+            # 新建存储：替换磁盘上已有的全部内容
+            manifest = {"segments": [], "template": None}
+        manifest = dict(manifest, segments=list(manifest["segments"]))
+        
+        if has_new:
+            name = self.store.next_segment_name()
+            if manifest["template"] is None:
+                manifest["template"] = self.store.write_template(name, self.template)
+            
+            tail = self.segments[-1]
+            self.store.write_segment(
+                name,
+                self.documents.pending(),
+                self.metadata[self._persisted:],
+                list(zip(self.doc_ids[self._persisted:], self.content_hashes[self._persisted:])),
+                tail.vectors(),
+                None if self.index_spec.type == "flat" else tail.index,
+                self.lexical.segments[-1] if self.lexical is not None else None,
+                settings.kb_vector_dtype
+            )
+            manifest["segments"].append({"name": name, "start": tail.start, "count": tail.count})
+        
+        manifest["deleted"] = sorted(self._deleted)
+        manifest["index_spec"] = self.index_spec.model_dump()
+        manifest["embedding_model"] = self.embedding_model_name
+        manifest["total_documents"] = self.count
+        self.store.commit(manifest)
+        
+        # 新段已提交，之后从磁盘读取文本和向量
+        if has_new:
+            tail.seal(name, self.store.read_vectors(name))
+            self.documents.seal(self.store.read_texts(name))
+            if self.lexical is not None:
+                self.lexical.seal()
+            log.info(f"知识库已保存: 新段 {name}, {tail.count} 条文档, 共 {len(manifest['segments'])} 个段")
+        else:
+            log.info(f"知识库删除标记已保存: {len(self._deleted)} 条")
+        self._persisted = len(self.documents)
+        self._deletes_dirty = False
+        self._manifest = manifest
+        
+        self.store.cleanup(manifest)
+        self._remove_legacy_files()
+        
+        if compact and len(self._deleted) > settings.kb_compact_deleted_ratio * len(self.documents):
+            self.compact()
+    
+    def compact(self):
+        """
+        将所有段合并为一个段，并真正移除已删除的文档
+        
+        段越多每次检索需要查询的索引越多，批量导入多次保存或大量删除后调用；
+        合并后的段写入完成并提交清单后，旧段才会被删除。文档行号会重新编排
+        """
+        if len(self.segments) <= 1 and not self._deleted:
+            return
+        
+        # 先提交未保存的改动，这里不能再触发自动合并，否则合并后的段会被写两次
+        self.save(compact=False)
+        
+        live = [row for row in range(len(self.documents)) if row not in self._deleted]
+        vectors = np.vstack([
+            segment.vectors()[segment.live_ids()] for segment in self.segments
+        ]).astype("float32", copy=False)
+        merged = faiss.clone_index(self.template)
+        merged.add(vectors)
+        apply_search_params(merged, self.index_spec)
+        lexical = self.lexical.compact(np.asarray(live, dtype="int64")) if self.lexical is not None else None
         
-        # 保存文档和元数据
-        with open(self.docs_path, 'wb') as f:
-            pickle.dump({
-                'documents': self.documents,
-                'metadata': self.metadata
-            }, f)
+        name = self.store.next_segment_name()
+        self.store.write_segment(
+            name,
+            [self.documents[row] for row in live],
+            [self.metadata[row] for row in live],
+            [(self.doc_ids[row], self.content_hashes[row]) for row in live],
+            vectors,
+            None if self.index_spec.type == "flat" else merged,
+            lexical,
+            settings.kb_vector_dtype
+        )
+        manifest = dict(
+            self._manifest,
+            segments=[{"name": name, "start": 0, "count": merged.ntotal}],
+            deleted=[],
+            total_documents=merged.ntotal
+        )
+        self.store.commit(manifest)
         
-        log.info(f"知识库已保存: {self.index_path}")
+        metadata = [self.metadata[row] for row in live]
+        doc_ids = [self.doc_ids[row] for row in live]
+        content_hashes = [self.content_hashes[row] for row in live]
+        
+        self._reset()
+        self.template = faiss.clone_index(merged)
+        self.template.reset()
+        self.segments = [IndexSegment(0, merged, name, self.store.read_vectors(name))]
+        self.documents.add_segment(self.store.read_texts(name))
+        self.metadata = metadata
+        self.metadata_index.add(0, metadata)
+        if self.lexical is not None:
+            self.lexical.add_segment(lexical)
+        self.doc_ids = doc_ids
+        self.content_hashes = content_hashes
+        self._rows = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        self._persisted = len(self.documents)
+        self._manifest = manifest
+        self.version += 1
+        
+        self.store.cleanup(manifest)
+        log.info(f"知识库段已合并: {name}, {merged.ntotal} 条文档")
     
-    def load(self):
-        """从磁盘加载知识库"""
+    def load(self, mmap_index: Optional[bool] = None, preload_model: Optional[bool] = None):
+        """
+        从磁盘加载知识库
+        
+        文档正文只建立mmap映射，检索命中时才从磁盘读取；嵌入模型默认推迟到
+        第一次查询时加载。各阶段耗时记录在 load_timings 中
+        
+        Args:
+            mmap_index: 是否以mmap方式映射段索引，默认使用配置；只对IVF类索引生效
+            preload_model: 是否立即加载嵌入模型，默认使用配置
+        """
+        mmap_index = settings.kb_mmap_index if mmap_index is None else mmap_index
+        preload_model = settings.kb_preload_model if preload_model is None else preload_model
+        
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        
+        manifest = self.store.read_manifest()
+        if manifest is None:
+            return self._load_legacy(preload_model)
+        
+        # 向量维度和语义空间随模型变化，换模型后必须重建知识库
+        saved_model = manifest.get("embedding_model")
+        if saved_model and saved_model != self.embedding_model_name:
+            raise ValueError(
+                f"知识库由嵌入模型 {saved_model} 生成，当前配置为 {self.embedding_model_name}，请重新导入知识库"
+            )
+        
+        self._reset()
+        
+        # 恢复保存时的索引规格和检索参数
+        self.index_spec = IndexSpec(**manifest["index_spec"])
+        self.template = self.store.read_template(manifest["template"])
+        timings["manifest"] = (time.perf_counter() - started) * 1000
+        
+        # faiss 只能mmap IVF类索引的倒排表，Flat/HNSW 索引总是完整读入内存
+        mmap_index = mmap_index and self.index_spec.type in ("ivf_flat", "ivf_pq")
+        
+        timings["index"] = timings["documents"] = timings["metadata"] = 0.0
+        for entry in manifest["segments"]:
+            name = entry["name"]
+            step = time.perf_counter()
+            index = self.store.read_index(name, mmap_index=mmap_index)
+            apply_search_params(index, self.index_spec)
+            self.segments.append(IndexSegment(entry["start"], index, name, self.store.read_vectors(name)))
+            timings["index"] += (time.perf_counter() - step) * 1000
+            
+            step = time.perf_counter()
+            texts = self.store.read_texts(name)
+            self.documents.add_segment(texts)
+            timings["documents"] += (time.perf_counter() - step) * 1000
+            
+            if self.lexical is not None:
+                step = time.perf_counter()
+                self.lexical.add_segment(self._read_lexical(name, entry["start"], texts))
+                timings["lexical"] = timings.get("lexical", 0.0) + (time.perf_counter() - step) * 1000
+            
+            step = time.perf_counter()
+            metadata = self.store.read_metadata(name)
+            self.metadata_index.add(len(self.metadata), metadata)
+            self.metadata.extend(metadata)
+            for doc_id, content_hash in self.store.read_ids(name):
+                self.doc_ids.append(doc_id)
+                self.content_hashes.append(content_hash)
+            timings["metadata"] += (time.perf_counter() - step) * 1000
+        
+        # 恢复删除标记和ID映射（同一ID以最后一次写入的行为准）
+        for row in manifest.get("deleted", []):
+            self._delete_row(row)
+        self._deletes_dirty = False
+        self._rows = {
+            doc_id: row for row, doc_id in enumerate(self.doc_ids) if row not in self._deleted
+        }
+        
+        self._persisted = len(self.documents)
+        self._manifest = manifest
+        
+        self._finish_load(preload_model, timings, started)
+        
+        log.info(
+            f"知识库已加载: {self.count} 条文档, {len(self.segments)} 个段, "
+            f"耗时 {self._format_timings()}"
+        )
+        return True
+    
+    def _read_lexical(self, name: str, start: int, texts) -> LexicalSegment:
+        """读取段的BM25倒排索引，启用词法检索之前写入的段从文本重建（合并段后写入磁盘）"""
+        path = self.store.lexical_path(name)
+        if path is not None:
+            return LexicalSegment.load(path, start)
+        log.warning(f"段 {name} 没有词法索引，从文本重建（合并段时写入磁盘）")
+        segment = LexicalSegment(start)
+        segment.add([texts[i] for i in range(len(texts))])
+        return segment
+    
+    def _finish_load(self, preload_model: bool, timings: Dict[str, float], started: float):
+        """加载的收尾阶段：查询向量缓存、（可选）嵌入模型，并记录耗时"""
+        step = time.perf_counter()
+        if self.query_cache is not None and settings.kb_query_cache_persist:
+            self.query_cache.load(self.query_cache_path, embedding_fingerprint())
+        timings["query_cache"] = (time.perf_counter() - step) * 1000
+        
+        step = time.perf_counter()
+        if preload_model:
+            self._load_embedding_model()
+        timings["model"] = (time.perf_counter() - step) * 1000
+        
+        timings["total"] = (time.perf_counter() - started) * 1000
+        self.load_timings = {name: round(ms, 1) for name, ms in timings.items()}
+        self.version += 1
+    
+    def _format_timings(self) -> str:
+        """格式化加载耗时"""
+        return ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.load_timings.items())
+    
+    def _load_legacy(self, preload_model: bool) -> bool:
+        """加载旧版单文件存储（faiss.index + documents.pkl），下次 save() 时转为分段存储"""
         if not self.index_path.exists() or not self.docs_path.exists():
             log.warning("知识库文件不存在，跳过加载")
             return False
         
-        self._load_embedding_model()
+        started = time.perf_counter()
+        self._reset()
+        
+        index = faiss.read_index(str(self.index_path))
+        spec = IndexSpec.load(self.spec_path)
+        if spec is None:
+            # 更早的版本保存的是未归一化向量上的L2索引
+            if index.metric_type == faiss.METRIC_L2:
+                index = migrate_l2_index(index)
+            spec = IndexSpec(type="flat")
+        self.index_spec = spec
+        apply_search_params(index, self.index_spec)
         
-        # 加载FAISS索引
-        self.index = faiss.read_index(str(self.index_path))
+        # 清空后的克隆保留训练结果，作为后续段的模板
+        self.template = faiss.clone_index(index)
+        self.template.reset()
         
-        # 加载文档和元数据
         with open(self.docs_path, 'rb') as f:
             data = pickle.load(f)
-            self.documents = data['documents']
-            self.metadata = data['metadata']
         
-        log.info(f"知识库已加载: {len(self.documents)} 条文档")
+        # 全部视为尚未保存的内存段，旧版存储没有文档ID，按需生成
+        documents = data['documents']
+        segment = IndexSegment(0, faiss.clone_index(self.template))
+        segment.add(reconstruct_all(index))
+        apply_search_params(segment.index, self.index_spec)
+        self.segments.append(segment)
+        self.documents.extend(documents)
+        self.metadata.extend(data['metadata'])
+        self.metadata_index.add(0, data['metadata'])
+        if self.lexical is not None:
+            self.lexical.add(0, documents)
+        self.doc_ids = [uuid.uuid4().hex for _ in documents]
+        self.content_hashes = [self.content_hash(document) for document in documents]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        
+        self._finish_load(preload_model, {}, started)
+        
+        log.info(f"旧版知识库已加载: {len(self.documents)} 条文档，保存时将转为分段存储")
         return True
     
-    def clear(self):
-        """清空知识库"""
-        self.index = None
-        self.documents = []
+    def _remove_legacy_files(self):
+        """分段存储提交后删除旧版单文件存储"""
+        for path in (self.index_path, self.docs_path, self.spec_path):
+            if path.exists():
+                path.unlink()
+                log.info(f"已删除旧版知识库文件: {path.name}")
+    
+    def _reset(self):
+        """清空内存中的索引和文档"""
+        self.documents.close()
+        self.template = None
+        self.segments = []
+        self.documents = DocumentColumn()
         self.metadata = []
+        self.metadata_index = MetadataIndex()
+        self.lexical = LexicalIndex() if settings.kb_lexical_enabled else None
+        self.doc_ids = []
+        self.content_hashes = []
+        self._rows = {}
+        self._deleted = set()
+        self._deletes_dirty = False
+        self._persisted = 0
+        self._manifest = None
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        调整检索参数，在召回率和延迟之间取舍
+        
+        Args:
+            nprobe: IVF检索访问的聚类数
+            ef_search: HNSW检索候选列表大小
+        """
+        if nprobe is not None:
+            self.index_spec.nprobe = nprobe
+        if ef_search is not None:
+            self.index_spec.ef_search = ef_search
+        for segment in self.segments:
+            apply_search_params(segment.index, self.index_spec)
+    
+    def clear(self):
+        """清空知识库（磁盘上的存储在下次 save() 时整体替换）"""
+        self._reset()
+        self.version += 1
         log.info("知识库已清空")
     
     def get_stats(self) -> Dict[str, Any]:
@@ -198,14 +1258,20 @@ class KnowledgeBase:
             统计信息字典
         """
         stats = {
-            'total_documents': len(self.documents),
-            'vector_dim': self.index.d if self.index is not None else 0,
-            'index_built': self.index is not None,
+            'total_documents': self.count,
+            'deleted_documents': len(self._deleted),
+            'vector_dim': self.template.d if self.template is not None else 0,
+            'index_built': self.template is not None,
+            'index_type': self.index_spec.type,
+            'segments': len(self.segments),
+            'query_cache': self.query_cache.get_stats() if self.query_cache is not None else None,
             'categories': {}
         }
         
         # 统计分类
-        for meta in self.metadata:
+        for row, meta in enumerate(self.metadata):
+            if row in self._deleted:
+                continue
             category = meta.get('category', '未分类')
             stats['categories'][category] = stats['categories'].get(category, 0) + 1
         
@@ -216,13 +1282,15 @@ class KnowledgeBase:
         获取所有文档
         
         Returns:
-            文档列表，每个文档包含content和metadata
+            文档列表，每个文档包含id、content和metadata
         """
         return [
             {
+                'id': doc_id,
                 'content': doc,
                 'metadata': meta
             }
-            for doc, meta in zip(self.documents, self.metadata)
+            for row, (doc_id, doc, meta) in enumerate(zip(self.doc_ids, self.documents, self.metadata))
+            if row not in self._deleted
         ]
 
@@ -0,0 +1,206 @@
+"""
+LLM补全缓存模块
+按模型参数和消息内容精确匹配，复用已有的模型输出
+"""
+from typing import List, Dict, Any, Optional
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from config import settings
+from langraph_customer_service.utils import log
+
+
+def make_cache_key(
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    messages: List[Dict[str, str]],
+    **params
+) -> str:
+    """
+    生成缓存键
+
+    Args:
+        model: 模型名称
+        temperature: 温度参数
+        max_tokens: 最大token数
+        messages: 消息列表
+        **params: 其他会影响输出的调用参数（如 response_format）
+
+    Returns:
+        sha256 十六进制摘要
+    """
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "messages": messages,
+        "params": params
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache(ABC):
+    """LLM补全缓存基类"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """读取缓存值"""
+
+    @abstractmethod
+    def set(self, key: str, value: str):
+        """写入缓存值"""
+
+    @abstractmethod
+    def clear(self):
+        """清空缓存"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """缓存条目数"""
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存并记录命中统计
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            命中时返回模型输出，否则返回None
+        """
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class InMemoryLLMCache(LLMCache):
+    """进程内LRU缓存"""
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Args:
+            max_size: 最大缓存条目数，超出后淘汰最久未使用的条目
+        """
+        super().__init__()
+        self.max_size = max_size
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteLLMCache(LLMCache):
+    """SQLite磁盘缓存，跨进程、跨重启复用"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite数据库文件路径
+        """
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, response, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+
+def create_llm_cache(backend: Optional[str] = None) -> Optional[LLMCache]:
+    """
+    按配置创建缓存
+
+    Args:
+        backend: none / memory / sqlite，默认使用配置
+
+    Returns:
+        缓存实例，backend 为 none 时返回None
+    """
+    backend = (backend or settings.llm_cache_backend).lower()
+
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return InMemoryLLMCache(max_size=settings.llm_cache_max_size)
+    if backend == "sqlite":
+        return SQLiteLLMCache(settings.llm_cache_path)
+
+    log.warning(f"未知的LLM缓存后端: {backend}，不启用缓存")
+    return None
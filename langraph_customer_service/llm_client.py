@@ -6,6 +6,7 @@ from typing import List, Dict, Any, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
 from config import settings
+from langraph_customer_service.llm_cache import LLMCache, make_cache_key, create_llm_cache
 from langraph_customer_service.utils import log
 
 
@@ -16,7 +17,8 @@ class LLMClient:
         self,
         model: Optional[str] = None,
         temperature: float = 0.7,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        cache: Optional[LLMCache] = None
     ):
         """
         初始化LLM客户端
@@ -25,10 +27,12 @@ class LLMClient:
             model: 模型名称，默认使用配置中的模型
             temperature: 温度参数，控制输出随机性
             max_tokens: 最大token数
+            cache: 补全缓存，默认按配置创建（LLM_CACHE_BACKEND）
         """
         self.model = model or settings.default_model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.cache = cache if cache is not None else create_llm_cache()
         
         self.client = ChatOpenAI(
             model=self.model,
@@ -43,6 +47,7 @@ class LLMClient:
     def invoke(
         self,
         messages: List[Dict[str, str]],
+        use_cache: bool = True,
         **kwargs
     ) -> str:
         """
@@ -50,11 +55,19 @@ class LLMClient:
         
         Args:
             messages: 消息列表，格式为 [{"role": "user", "content": "..."}]
+            use_cache: 是否使用补全缓存（仅在配置了缓存时生效）
             **kwargs: 其他参数
         
         Returns:
             生成的回复文本
         """
+        cache_key = self._cache_key(messages, kwargs) if use_cache else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                log.debug("LLM缓存命中")
+                return cached
+        
         try:
             # 转换消息格式
             lc_messages = self._convert_messages(messages)
@@ -63,6 +76,8 @@ class LLMClient:
             response = self.client.invoke(lc_messages, **kwargs)
             
             log.debug(f"LLM调用成功: {len(response.content)} 字符")
+            if cache_key is not None:
+                self.cache.set(cache_key, response.content)
             return response.content
             
         except Exception as e:
@@ -72,18 +87,36 @@ class LLMClient:
     async def ainvoke(
         self,
         messages: List[Dict[str, str]],
+        use_cache: bool = True,
         **kwargs
     ) -> str:
         """异步调用LLM"""
+        cache_key = self._cache_key(messages, kwargs) if use_cache else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                log.debug("LLM缓存命中")
+                return cached
+        
         try:
             lc_messages = self._convert_messages(messages)
             response = await self.client.ainvoke(lc_messages, **kwargs)
             log.debug(f"LLM异步调用成功: {len(response.content)} 字符")
+            if cache_key is not None:
+                self.cache.set(cache_key, response.content)
             return response.content
         except Exception as e:
             log.error(f"LLM异步调用失败: {e}")
             raise
     
+    def _cache_key(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> Optional[str]:
+        """计算缓存键，未配置缓存时返回None"""
+        if self.cache is None:
+            return None
+        # config 只携带回调等运行时信息，不影响模型输出
+        params = {k: v for k, v in kwargs.items() if k != "config"}
+        return make_cache_key(self.model, self.temperature, self.max_tokens, messages, **params)
+    
     def _convert_messages(self, messages: List[Dict[str, str]]) -> List[BaseMessage]:
         """将字典格式的消息转换为LangChain消息对象"""
         lc_messages = []
@@ -0,0 +1,454 @@
+"""
+会话存储模块
+提供带容量上限、TTL过期和LRU淘汰的会话状态存储
+"""
+from typing import Dict, Any, Optional
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+import asyncio
+import json
+import sqlite3
+import sys
+import threading
+import time
+from config import settings
+from langraph_customer_service.state import Message
+from langraph_customer_service.utils import log
+
+
+# 以 Message 对象保存的状态字段，序列化时转为字典，读取时重新校验为 Message
+MESSAGE_FIELDS = ("messages", "unsummarized_messages")
+
+
+def _dumps(state: Dict[str, Any]) -> bytes:
+    """
+    序列化会话状态为JSON
+
+    共享存储（SQLite/Redis）中的数据可能被其他进程写入，不使用pickle，避免读取时执行任意代码
+    """
+    data = dict(state)
+    for field in MESSAGE_FIELDS:
+        if field in data:
+            data[field] = [
+                message.model_dump(mode="json") if isinstance(message, Message) else message
+                for message in data[field]
+            ]
+    return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _loads(data: bytes) -> Optional[Dict[str, Any]]:
+    """反序列化会话状态，无法解析（如旧版本以pickle写入）时返回None"""
+    try:
+        state = json.loads(data)
+    except (UnicodeDecodeError, ValueError) as e:
+        log.warning(f"无法解析的会话数据，按会话不存在处理: {e}")
+        return None
+    for field in MESSAGE_FIELDS:
+        if field in state:
+            state[field] = [Message.model_validate(message) for message in state[field]]
+    return state
+
+
+def _estimate_size(value: Any) -> int:
+    """估算对象占用的内存字节数（递归累加 sys.getsizeof，不做序列化）"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    if isinstance(value, Message):
+        return sys.getsizeof(value) + _estimate_size(value.__dict__)
+    return sys.getsizeof(value)
+
+
+class SessionStore(ABC):
+    """会话存储基类"""
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        Args:
+            max_size: 最大会话数，超出后淘汰最久未访问的会话
+            ttl: 会话空闲过期时间（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """读取会话状态，并刷新访问时间"""
+
+    @abstractmethod
+    def set(self, session_id: str, state: Dict[str, Any]):
+        """写入会话状态"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """删除会话，返回会话是否存在"""
+
+    @abstractmethod
+    def clear(self):
+        """清空所有会话"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """当前会话数"""
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def memory_usage(self) -> int:
+        """会话数据占用的字节数（进程内存储为内存占用估算，外部存储为序列化大小）"""
+        return 0
+
+    async def aget(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """异步读取：默认放到线程池执行，避免外部存储的网络/磁盘IO阻塞事件循环"""
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def aset(self, session_id: str, state: Dict[str, Any]):
+        """异步写入"""
+        await asyncio.to_thread(self.set, session_id, state)
+
+    async def adelete(self, session_id: str) -> bool:
+        """异步删除"""
+        return await asyncio.to_thread(self.delete, session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            "backend": type(self).__name__,
+            "active_sessions": len(self),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "memory_bytes": self.memory_usage(),
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    进程内会话存储
+
+    OrderedDict 按访问顺序排列，队首即最久未访问的会话，
+    淘汰和过期清理都只需检查队首，单次操作均摊 O(1)
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_bytes: int = 0):
+        """
+        Args:
+            max_size: 最大会话数
+            ttl: 会话空闲过期时间（秒）
+            max_bytes: 会话数据总大小上限，0表示不限制
+        """
+        super().__init__(max_size, ttl)
+        self.max_bytes = max_bytes
+        # session_id -> (状态, 估算的内存大小, 最后访问时间)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expire(time.time())
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            self._data[session_id] = (entry[0], entry[1], time.time())
+            self._data.move_to_end(session_id)
+            return entry[0]
+
+    def set(self, session_id: str, state: Dict[str, Any]):
+        size = _estimate_size(state)
+        with self._lock:
+            old = self._data.pop(session_id, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+
+            self._data[session_id] = (state, size, time.time())
+            self._total_bytes += size
+
+            self._expire(time.time())
+            while len(self._data) > 1 and (
+                len(self._data) > self.max_size
+                or (self.max_bytes and self._total_bytes > self.max_bytes)
+            ):
+                self._pop_oldest()
+                self.evictions += 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._data.pop(session_id, None)
+            if entry is None:
+                return False
+            self._total_bytes -= entry[1]
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def memory_usage(self) -> int:
+        return self._total_bytes
+
+    async def aget(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.get(session_id)
+
+    async def aset(self, session_id: str, state: Dict[str, Any]):
+        self.set(session_id, state)
+
+    async def adelete(self, session_id: str) -> bool:
+        return self.delete(session_id)
+
+    def _expire(self, now: float):
+        """清理队首的过期会话（需持有锁）"""
+        while self._data:
+            _, (_, _, accessed_at) = next(iter(self._data.items()))
+            if now - accessed_at <= self.ttl:
+                break
+            self._pop_oldest()
+            self.expirations += 1
+
+    def _pop_oldest(self):
+        """删除最久未访问的会话（需持有锁）"""
+        _, (_, size, _) = self._data.popitem(last=False)
+        self._total_bytes -= size
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite会话存储，同一台机器上的多个worker进程可共享"""
+
+    def __init__(self, path: str, max_size: int, ttl: float):
+        """
+        Args:
+            path: SQLite数据库文件路径
+            max_size: 最大会话数
+            ttl: 会话空闲过期时间（秒）
+        """
+        super().__init__(max_size, ttl)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_accessed ON sessions (accessed_at)")
+        # 会话数由触发器增量维护，写入时不必每次 COUNT(*) 全表计数
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_count ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), count INTEGER NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO session_count (id, count) SELECT 0, COUNT(*) FROM sessions")
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS sessions_insert AFTER INSERT ON sessions "
+            "BEGIN UPDATE session_count SET count = count + 1; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS sessions_delete AFTER DELETE ON sessions "
+            "BEGIN UPDATE session_count SET count = count - 1; END"
+        )
+        self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, accessed_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._conn.commit()
+                self.expirations += 1
+                return None
+            self._conn.execute(
+                "UPDATE sessions SET accessed_at = ? WHERE session_id = ?", (now, session_id)
+            )
+            self._conn.commit()
+        return _loads(row[0])
+
+    def set(self, session_id: str, state: Dict[str, Any]):
+        data = _dumps(state)
+        now = time.time()
+        with self._lock:
+            # 不用 INSERT OR REPLACE：REPLACE 删除旧行时不会触发删除触发器，会话计数会偏大
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, data, size, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET "
+                "data = excluded.data, size = excluded.size, accessed_at = excluded.accessed_at",
+                (session_id, data, len(data), now)
+            )
+            cursor = self._conn.execute("DELETE FROM sessions WHERE accessed_at < ?", (now - self.ttl,))
+            self.expirations += cursor.rowcount
+
+            excess = self._conn.execute("SELECT count FROM session_count").fetchone()[0] - self.max_size
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE session_id IN "
+                    "(SELECT session_id FROM sessions ORDER BY accessed_at LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE accessed_at >= ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM sessions WHERE accessed_at >= ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis会话存储，多个worker/多台机器共享会话
+
+    会话数据使用带过期时间的字符串键保存，另用有序集合按访问时间记录LRU顺序；
+    兼容 redis-py 接口的客户端均可使用（如测试中的 fakeredis）
+    """
+
+    def __init__(self, client, max_size: int, ttl: float, prefix: str = "cs:session:"):
+        """
+        Args:
+            client: redis-py 兼容客户端
+            max_size: 最大会话数
+            ttl: 会话空闲过期时间（秒）
+            prefix: 键前缀
+        """
+        super().__init__(max_size, ttl)
+        self.client = client
+        self.prefix = prefix
+        self._lru_key = f"{prefix}__lru__"
+        self._size_key = f"{prefix}__size__"
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = self.client.get(self._key(session_id))
+        if data is None:
+            self.client.zrem(self._lru_key, session_id)
+            self.client.hdel(self._size_key, session_id)
+            return None
+
+        pipe = self.client.pipeline()
+        pipe.expire(self._key(session_id), int(self.ttl))
+        pipe.zadd(self._lru_key, {session_id: time.time()})
+        pipe.execute()
+        return _loads(data)
+
+    def set(self, session_id: str, state: Dict[str, Any]):
+        data = _dumps(state)
+        now = time.time()
+
+        pipe = self.client.pipeline()
+        pipe.set(self._key(session_id), data, ex=int(self.ttl))
+        pipe.zadd(self._lru_key, {session_id: now})
+        pipe.hset(self._size_key, session_id, len(data))
+        pipe.execute()
+
+        self._purge_expired(now)
+
+        excess = self.client.zcard(self._lru_key) - self.max_size
+        if excess > 0:
+            for oldest_id, _ in self.client.zpopmin(self._lru_key, excess):
+                oldest_id = oldest_id.decode() if isinstance(oldest_id, bytes) else oldest_id
+                self.client.delete(self._key(oldest_id))
+                self.client.hdel(self._size_key, oldest_id)
+                self.evictions += 1
+
+    def delete(self, session_id: str) -> bool:
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(session_id))
+        pipe.zrem(self._lru_key, session_id)
+        pipe.hdel(self._size_key, session_id)
+        deleted, _, _ = pipe.execute()
+        return bool(deleted)
+
+    def clear(self):
+        session_ids = self.client.zrange(self._lru_key, 0, -1)
+        keys = [
+            self._key(sid.decode() if isinstance(sid, bytes) else sid)
+            for sid in session_ids
+        ]
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(self._lru_key, self._size_key)
+
+    def __len__(self) -> int:
+        self._purge_expired(time.time())
+        return self.client.zcard(self._lru_key)
+
+    def memory_usage(self) -> int:
+        return sum(int(size) for size in self.client.hvals(self._size_key))
+
+    def _purge_expired(self, now: float):
+        """清理LRU集合中已由Redis过期删除的会话"""
+        expired = self.client.zrangebyscore(self._lru_key, "-inf", now - self.ttl)
+        if not expired:
+            return
+        self.client.zremrangebyscore(self._lru_key, "-inf", now - self.ttl)
+        self.client.hdel(self._size_key, *expired)
+        self.expirations += len(expired)
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """
+    按配置创建会话存储
+
+    Args:
+        backend: memory / sqlite / redis，默认使用配置
+
+    Returns:
+        会话存储实例
+    """
+    backend = (backend or settings.session_backend).lower()
+    max_size = settings.session_max_size
+    ttl = settings.session_ttl
+
+    if backend == "sqlite":
+        log.info(f"使用SQLite会话存储: {settings.session_sqlite_path}")
+        return SQLiteSessionStore(settings.session_sqlite_path, max_size, ttl)
+
+    if backend == "redis":
+        import redis
+
+        log.info(f"使用Redis会话存储: {settings.redis_url}")
+        return RedisSessionStore(redis.Redis.from_url(settings.redis_url), max_size, ttl)
+
+    if backend != "memory":
+        log.warning(f"未知的会话存储后端: {backend}，使用内存存储")
+
+    return InMemorySessionStore(max_size, ttl, max_bytes=settings.session_max_memory_mb * 1024 * 1024)
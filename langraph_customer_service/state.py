@@ -5,7 +5,21 @@
 from typing import List, Dict, Any, Optional, Literal, TypedDict, Annotated
 from pydantic import BaseModel, Field
 from datetime import datetime
-import operator
+
+
+class ReplaceList(list):
+    """用于整体替换列表字段的更新值（如历史压缩后的窗口），而不是追加"""
+
+
+def append_or_replace(existing: Optional[List[Any]], update: List[Any]) -> List[Any]:
+    """
+    列表字段的合并函数
+    
+    普通列表追加到已有内容之后；ReplaceList 直接替换已有内容
+    """
+    if isinstance(update, ReplaceList):
+        return list(update)
+    return (existing or []) + update
 
 
 class Message(BaseModel):
@@ -19,8 +33,14 @@ class Message(BaseModel):
 class ConversationState(TypedDict, total=False):
     """对话状态模型 - 使用 TypedDict 以兼容 LangGraph"""
     
-    # 对话历史 - 使用 operator.add 来追加消息
-    messages: Annotated[List[Message], operator.add]
+    # 对话历史 - 追加消息，历史压缩时以 ReplaceList 整体替换为最近窗口
+    messages: Annotated[List[Message], append_or_replace]
+    
+    # 窗口之外的早期对话摘要
+    history_summary: Optional[str]
+    
+    # 已移出窗口、后台摘要尚未写回的消息
+    unsummarized_messages: List[Message]
     
     # 用户信息
     user_id: Optional[str]
@@ -33,8 +53,8 @@ class ConversationState(TypedDict, total=False):
     # 业务上下文
     context: Dict[str, Any]
     
-    # 工具调用记录 - 使用 operator.add 来追加工具调用
-    tool_calls: Annotated[List[Dict[str, Any]], operator.add]
+    # 工具调用记录 - 追加工具调用，历史压缩时只保留最近几次
+    tool_calls: Annotated[List[Dict[str, Any]], append_or_replace]
     
     # 检索结果
     retrieved_docs: List[str]
@@ -42,6 +62,9 @@ class ConversationState(TypedDict, total=False):
     # 当前回复
     current_response: str
     
+    # 无需再调用LLM生成的现成回复（单次调用模式起草的闲聊回复或语义缓存命中）
+    draft_response: Optional[str]
+    
     # 是否需要人工介入
     requires_human: bool
     
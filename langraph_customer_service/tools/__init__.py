@@ -5,10 +5,13 @@ from .business_tools import (
     check_inventory,
     get_logistics_info
 )
+from .executor import ToolRegistry, ToolExecutor
 
 __all__ = [
     "query_order",
     "process_refund", 
     "check_inventory",
-    "get_logistics_info"
+    "get_logistics_info",
+    "ToolRegistry",
+    "ToolExecutor"
 ]
@@ -60,7 +60,12 @@ def query_order(order_id: str) -> Dict[str, Any]:
         }
 
 
-def process_refund(order_id: str, reason: str, amount: Optional[float] = None) -> Dict[str, Any]:
+def process_refund(
+    order_id: str,
+    reason: str,
+    amount: Optional[float] = None,
+    order: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
     处理退款请求
     
@@ -68,6 +73,7 @@ def process_refund(order_id: str, reason: str, amount: Optional[float] = None) -
         order_id: 订单号
         reason: 退款原因
         amount: 退款金额（可选，默认全额退款）
+        order: 同一轮对话中刚查询到的订单信息（可选），提供时不再重复查询订单
     
     Returns:
         退款处理结果
@@ -75,16 +81,18 @@ def process_refund(order_id: str, reason: str, amount: Optional[float] = None) -
     log.info(f"处理退款: order_id={order_id}, reason={reason}, amount={amount}")
     
     # 先查询订单
-    order_result = query_order(order_id)
-    
-    if not order_result["success"]:
-        return {
-            "success": False,
-            "refund_id": None,
-            "message": "订单不存在，无法申请退款"
-        }
+    if order is None:
+        order_result = query_order(order_id)
+        
+        if not order_result["success"]:
+            return {
+                "success": False,
+                "refund_id": None,
+                "message": "订单不存在，无法申请退款"
+            }
+        
+        order = order_result["data"]
     
-    order = order_result["data"]
     refund_amount = amount or order["price"]
     
     # 模拟退款处理
@@ -0,0 +1,264 @@
+"""
+工具执行模块
+工具注册表与并发执行引擎：同一轮对话中相互独立的工具调用并行执行，
+每个工具单独设置超时和重试次数
+
+工具调用的格式为 {"intent": 意图, "tool": 工具名, "args": 参数字典}，
+执行记录在此基础上增加 result、attempts、elapsed_ms 和 timestamp
+"""
+from typing import Dict, Any, List, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+import asyncio
+import functools
+import threading
+import time
+from config import settings
+from langraph_customer_service.utils import log
+
+
+class ToolSpec:
+    """已注册的工具及其执行策略"""
+
+    def __init__(self, name: str, func: Callable[..., Any], timeout: float, retries: int):
+        """
+        Args:
+            name: 工具名称
+            func: 工具函数（同步函数或协程函数）
+            timeout: 单次调用超时（秒）
+            retries: 超时或抛出异常后的重试次数，有副作用的工具应为0
+        """
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.retries = retries
+        self.is_async = asyncio.iscoroutinefunction(func)
+
+
+class ToolRegistry:
+    """工具注册表"""
+
+    def __init__(self):
+        self._tools: Dict[str, ToolSpec] = {}
+
+    @classmethod
+    def from_tools(
+        cls,
+        tools: Dict[str, Callable[..., Any]],
+        policies: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> "ToolRegistry":
+        """
+        从 {工具名: 函数} 映射创建注册表
+
+        Args:
+            tools: 工具映射
+            policies: 按工具覆盖的执行策略 {工具名: {"timeout": 秒, "retries": 次数}}，默认使用配置
+        """
+        policies = settings.tool_policies if policies is None else policies
+        registry = cls()
+        for name, func in tools.items():
+            registry.register(name, func, **policies.get(name, {}))
+        return registry
+
+    def register(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None
+    ):
+        """
+        注册工具
+
+        Args:
+            name: 工具名称
+            func: 工具函数
+            timeout: 单次调用超时（秒），默认使用配置
+            retries: 重试次数，默认使用配置
+        """
+        self._tools[name] = ToolSpec(
+            name,
+            func,
+            settings.tool_timeout if timeout is None else timeout,
+            settings.tool_max_retries if retries is None else retries
+        )
+
+    def get(self, name: str) -> ToolSpec:
+        """按名称获取工具"""
+        if name not in self._tools:
+            raise ValueError(f"未注册的工具: {name}")
+        return self._tools[name]
+
+    def names(self) -> List[str]:
+        """已注册的工具名称"""
+        return list(self._tools)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+
+class ToolExecutor:
+    """
+    工具并发执行引擎
+
+    一批调用同时提交到线程池，总耗时约为其中最慢的一个而不是各调用之和；
+    超时的调用不会被强行终止（线程无法中断），只是不再等待其结果。
+    业务失败（返回 success=False）不重试，只有超时和异常才重试
+    """
+
+    def __init__(self, registry: ToolRegistry, max_workers: Optional[int] = None):
+        """
+        Args:
+            registry: 工具注册表
+            max_workers: 线程池大小，默认使用配置
+        """
+        self.registry = registry
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or settings.tool_max_workers,
+            thread_name_prefix="tool"
+        )
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+    def run(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        并行执行一批工具调用（同步）
+
+        Args:
+            calls: 工具调用列表
+
+        Returns:
+            与 calls 一一对应的执行记录
+        """
+        started = time.perf_counter()
+        # 先提交所有调用的首次尝试，再逐个等待结果
+        submitted = [(call, self._submit(call), time.perf_counter()) for call in calls]
+        records = [self._collect(call, future, submit_time) for call, future, submit_time in submitted]
+        self._log_batch(records, started)
+        return records
+
+    async def arun(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """并行执行一批工具调用（异步）"""
+        started = time.perf_counter()
+        records = list(await asyncio.gather(*(self._acall(call) for call in calls)))
+        self._log_batch(records, started)
+        return records
+
+    def _submit(self, call: Dict[str, Any]) -> Future:
+        """提交一次调用到线程池"""
+        spec = self.registry.get(call["tool"])
+        if spec.is_async:
+            return self._pool.submit(asyncio.run, spec.func(**call["args"]))
+        return self._pool.submit(spec.func, **call["args"])
+
+    def _collect(self, call: Dict[str, Any], future: Future, submit_time: float) -> Dict[str, Any]:
+        """等待调用结果，超时或异常时按策略重试"""
+        spec = self.registry.get(call["tool"])
+        error = None
+        for attempt in range(spec.retries + 1):
+            if attempt > 0:
+                self._backoff(attempt)
+                future, submit_time = self._submit(call), time.perf_counter()
+            try:
+                remaining = max(0.0, submit_time + spec.timeout - time.perf_counter())
+                result = future.result(timeout=remaining)
+                return self._record(call, result, attempt + 1, submit_time)
+            except FutureTimeoutError:
+                future.cancel()
+                error = self._timeout_error(spec, attempt)
+            except Exception as e:
+                error = self._exception_error(spec, attempt, e)
+        return self._record(call, error, spec.retries + 1, submit_time)
+
+    async def _acall(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个调用（异步），超时或异常时按策略重试"""
+        spec = self.registry.get(call["tool"])
+        loop = asyncio.get_running_loop()
+        error = None
+        for attempt in range(spec.retries + 1):
+            if attempt > 0:
+                await asyncio.sleep(self._backoff_seconds(attempt))
+                with self._lock:
+                    self.retries += 1
+            started = time.perf_counter()
+            try:
+                if spec.is_async:
+                    awaitable = spec.func(**call["args"])
+                else:
+                    awaitable = loop.run_in_executor(self._pool, functools.partial(spec.func, **call["args"]))
+                result = await asyncio.wait_for(awaitable, timeout=spec.timeout)
+                return self._record(call, result, attempt + 1, started)
+            except asyncio.TimeoutError:
+                error = self._timeout_error(spec, attempt)
+            except Exception as e:
+                error = self._exception_error(spec, attempt, e)
+        return self._record(call, error, spec.retries + 1, started)
+
+    @staticmethod
+    def _backoff_seconds(attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（指数退避）"""
+        return settings.tool_retry_backoff * 2 ** (attempt - 1)
+
+    def _backoff(self, attempt: int):
+        """同步重试前等待"""
+        time.sleep(self._backoff_seconds(attempt))
+        with self._lock:
+            self.retries += 1
+
+    def _timeout_error(self, spec: ToolSpec, attempt: int) -> Dict[str, Any]:
+        """超时的失败结果"""
+        with self._lock:
+            self.timeouts += 1
+        log.warning(f"工具调用超时: {spec.name}（{spec.timeout}s，第 {attempt + 1} 次）")
+        return {"success": False, "message": f"工具调用超时: {spec.name}", "data": None}
+
+    def _exception_error(self, spec: ToolSpec, attempt: int, e: Exception) -> Dict[str, Any]:
+        """抛出异常的失败结果"""
+        with self._lock:
+            self.errors += 1
+        log.error(f"工具调用异常: {spec.name}（第 {attempt + 1} 次）: {e}")
+        return {"success": False, "message": f"工具调用异常: {str(e)}", "data": None}
+
+    def _record(self, call: Dict[str, Any], result: Any, attempts: int, started: float) -> Dict[str, Any]:
+        """生成执行记录"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.calls += 1
+            self.total_ms += elapsed_ms
+        return {
+            **call,
+            "result": result,
+            "attempts": attempts,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def _log_batch(records: List[Dict[str, Any]], started: float):
+        """记录一批调用的耗时"""
+        if records:
+            log.info(
+                f"工具调用完成: {[record['tool'] for record in records]}, "
+                f"耗时 {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取工具调用统计信息"""
+        with self._lock:
+            return {
+                "tools": self.registry.names(),
+                "calls": self.calls,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0
+            }
+
+    def close(self):
+        """关闭线程池，不等待已超时仍在运行的调用"""
+        self._pool.shutdown(wait=False)
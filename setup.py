@@ -30,6 +30,7 @@ setup(
     entry_points={
         "console_scripts": [
             "customer-service=langraph_customer_service.cli:main",
+            "kb-ingest=langraph_customer_service.knowledge_base.ingest:main",
         ],
     },
     classifiers=[
@@ -0,0 +1,74 @@
+"""异步对话流程测试"""
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+from langraph_customer_service.llm_client import llm_client
+
+
+class FakeKnowledgeBase:
+    """记录检索所在线程的知识库替身"""
+
+    version = 0
+
+    def __init__(self):
+        self.threads = []
+
+    def search(self, query, top_k=3, **kwargs):
+        self.threads.append(threading.current_thread())
+        return [{"document": "iPhone 15 Pro 售价7999元", "score": 0.9}]
+
+    def expand_chunks(self, results):
+        return results
+
+    def encode_queries(self, queries):
+        return np.ones((len(queries), 8), dtype="float32") / np.sqrt(8)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """意图分类返回给定JSON，回复生成返回固定文本；同步接口不允许被调用"""
+    calls = []
+
+    def use(intent, **context):
+        async def ainvoke(messages, **kwargs):
+            calls.append(messages)
+            if "意图分类器" in messages[0]["content"]:
+                return json.dumps({"intent": intent, "entities": {}, **context})
+            return "您好，请问有什么可以帮您？"
+
+        def invoke(messages, **kwargs):
+            raise AssertionError("异步流程不应调用同步LLM接口")
+
+        monkeypatch.setattr(llm_client, "ainvoke", ainvoke)
+        monkeypatch.setattr(llm_client, "invoke", invoke)
+        return calls
+
+    return use
+
+
+def test_achat_general_chat(fake_llm):
+    calls = fake_llm("general_chat")
+    agent = CustomerServiceAgent(knowledge_base=FakeKnowledgeBase())
+
+    response, state = asyncio.run(agent.achat("你好"))
+
+    assert response == "您好，请问有什么可以帮您？"
+    assert state["intent"] == "general_chat"
+    assert [m.role for m in state["messages"]] == ["user", "assistant"]
+    assert len(calls) == 2
+
+
+def test_achat_runs_search_off_event_loop(fake_llm):
+    fake_llm("product_info", needs_knowledge=True)
+    knowledge_base = FakeKnowledgeBase()
+    agent = CustomerServiceAgent(knowledge_base=knowledge_base)
+
+    response, state = asyncio.run(agent.achat("iPhone 15 Pro多少钱"))
+
+    assert state["retrieved_docs"] == ["iPhone 15 Pro 售价7999元"]
+    assert knowledge_base.threads and knowledge_base.threads[0] is not threading.main_thread()
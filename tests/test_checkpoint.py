@@ -0,0 +1,89 @@
+"""对话检查点测试"""
+import asyncio
+import json
+
+import pytest
+
+from config import settings
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+from langraph_customer_service.checkpoint import acreate_checkpointer, is_async_only
+from langraph_customer_service.llm_client import llm_client
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """所有消息都识别为闲聊"""
+    async def ainvoke(messages, **kwargs):
+        if "意图分类器" in messages[0]["content"]:
+            return json.dumps({"intent": "general_chat", "entities": {}})
+        return "您好"
+
+    monkeypatch.setattr(llm_client, "ainvoke", ainvoke)
+
+
+def test_backends(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "checkpoint_path", str(tmp_path / "db" / "checkpoints.sqlite"))
+
+    async def create():
+        memory = await acreate_checkpointer("memory")
+        sqlite = await acreate_checkpointer("sqlite")
+        await sqlite.conn.close()
+        return memory, sqlite, await acreate_checkpointer("none")
+
+    memory, sqlite, none = asyncio.run(create())
+
+    assert memory is not None and not is_async_only(memory)
+    assert is_async_only(sqlite)
+    assert none is None
+    assert (tmp_path / "db").is_dir()
+
+
+def test_sync_api_rejects_async_only_checkpointer(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "checkpoint_path", str(tmp_path / "checkpoints.sqlite"))
+
+    async def run():
+        checkpointer = await acreate_checkpointer("sqlite")
+        agent = CustomerServiceAgent(checkpointer=checkpointer)
+        try:
+            with pytest.raises(RuntimeError, match="achat"):
+                agent.chat("你好", {"session_id": "s1"})
+            with pytest.raises(RuntimeError):
+                agent.get_state("s1")
+            # 异步接口可以正常使用
+            assert await agent.aget_state("s1") is None
+            await agent.adelete_session("s1")
+        finally:
+            await checkpointer.conn.close()
+
+    asyncio.run(run())
+
+
+def test_memory_checkpointer_supports_sync_api():
+    agent = CustomerServiceAgent(checkpointer=asyncio.run(acreate_checkpointer("memory")))
+
+    assert agent.get_state("s1") is None
+    agent.delete_session("s1")
+
+
+def test_history_restored_from_checkpoint(tmp_path, monkeypatch, fake_llm):
+    monkeypatch.setattr(settings, "checkpoint_path", str(tmp_path / "checkpoints.sqlite"))
+
+    async def run():
+        checkpointer = await acreate_checkpointer("sqlite")
+        try:
+            agent = CustomerServiceAgent(checkpointer=checkpointer)
+            _, first = await agent.achat("你好", {"session_id": "s1"})
+            # 第二轮只传 session_id，历史由检查点恢复
+            _, second = await agent.achat("在吗", {"session_id": "s1"})
+            other = await agent.aget_state("s2")
+            await agent.adelete_session("s1")
+            return first, second, other, await agent.aget_state("s1")
+        finally:
+            await checkpointer.conn.close()
+
+    first, second, other, deleted = asyncio.run(run())
+
+    assert first["session_id"] == second["session_id"] == "s1"
+    assert [m.content for m in second["messages"]][::2] == ["你好", "在吗"]
+    assert other is None
+    assert deleted is None
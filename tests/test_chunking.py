@@ -0,0 +1,84 @@
+"""文档分块测试"""
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.chunking import (
+    DocumentChunker,
+    assemble_chunks,
+    estimate_tokens,
+    split_sentences,
+)
+
+
+class FakeModel:
+    """按文本哈希生成固定单位向量的嵌入模型替身（无分词器）"""
+
+    def encode(self, sentences, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(16) for text in sentences
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_document(count):
+    return "".join(f"第{i}条规定：商品签收后七天内可以申请退货。" for i in range(count))
+
+
+def test_split_sentences_keeps_punctuation():
+    assert split_sentences("你好！请问（有货吗？）\n\n好的") == ["你好！", "请问（有货吗？）", "好的"]
+    assert split_sentences("第一行\n第二行") == ["第一行\n", "第二行"]
+
+
+def test_chunks_respect_size_and_reassemble():
+    chunker = DocumentChunker(chunk_size=80, overlap=30)
+    document = make_document(12)
+
+    chunks = chunker.split(document)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk["text"]) <= 80 for chunk in chunks)
+    assert chunks[0]["overlap"] == 0
+    assert all(chunk["overlap"] > 0 for chunk in chunks[1:])
+    stored = [
+        {"content": chunk["text"], "metadata": {"chunk_index": i, "chunk_overlap": chunk["overlap"]}}
+        for i, chunk in enumerate(chunks)
+    ]
+    assert assemble_chunks(stored[::-1]) == document
+
+
+def test_long_sentence_is_hard_split():
+    chunks = DocumentChunker(chunk_size=10, overlap=0).split("退" * 35)
+
+    assert "".join(chunk["text"] for chunk in chunks) == "退" * 35
+    assert all(len(chunk["text"]) <= 10 for chunk in chunks)
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        DocumentChunker(chunk_size=10, overlap=10)
+
+
+def test_ingest_and_expand_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    kb = KnowledgeBase()
+    kb.model = FakeModel()
+    chunker = DocumentChunker(chunk_size=80, overlap=30)
+    long_document = make_document(12)
+
+    stats = kb.ingest_documents([long_document, "短文档"], ["policy", "note"], [{"category": "faq"}, {}], chunker)
+    chunk_count = kb.get_document("policy#0")["metadata"]["chunk_count"]
+
+    assert stats["added"] == chunk_count + 1
+    hit = kb.search(kb.get_document("policy#2")["content"], top_k=1)
+    expanded = kb.expand_chunks(hit, neighbors=1)
+    assert expanded[0]["id"] == "policy"
+    assert expanded[0]["metadata"] == {"category": "faq", "parent_id": "policy"}
+    assert len(expanded[0]["document"]) > len(hit[0]["document"])
+    assert expanded[0]["document"] in long_document
+
+    # 文档变短后多出的旧块被删除，未变化的块不重新编码
+    stats = kb.ingest_documents([make_document(3)], ["policy"], [{"category": "faq"}], chunker)
+    assert stats["deleted"] == chunk_count - kb.get_document("policy#0")["metadata"]["chunk_count"]
+    assert kb.get_document(f"policy#{chunk_count - 1}") is None
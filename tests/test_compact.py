@@ -0,0 +1,56 @@
+"""知识库段合并测试"""
+import numpy as np
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+
+
+def make_kb(tmp_path, monkeypatch):
+    """使用随机向量代替嵌入模型的知识库，记录每次写入的段"""
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    kb = KnowledgeBase()
+    rng = np.random.default_rng(0)
+
+    def encode(documents):
+        vectors = rng.random((len(documents), 16)).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    kb._encode_documents = encode
+    written = []
+    write_segment = kb.store.write_segment
+
+    def record(name, texts, *args, **kwargs):
+        written.append((name, len(texts)))
+        return write_segment(name, texts, *args, **kwargs)
+
+    kb.store.write_segment = record
+    return kb, written
+
+
+def test_compact_with_unsaved_changes_writes_merged_segment_once(tmp_path, monkeypatch):
+    kb, written = make_kb(tmp_path, monkeypatch)
+    ids = kb.add_documents([f"文档{i}" for i in range(10)])
+    kb.save()
+    kb.add_documents([f"新文档{i}" for i in range(4)])
+    kb.delete_documents(ids[:8])
+    written.clear()
+
+    kb.compact()
+
+    # 未保存的新文档写一个段，合并后的段只写一次
+    assert written == [("seg_000002", 4), ("seg_000003", 6)]
+    assert kb.count == 6
+    assert len(kb.segments) == 1
+
+
+def test_save_compacts_when_deleted_ratio_exceeded(tmp_path, monkeypatch):
+    kb, written = make_kb(tmp_path, monkeypatch)
+    ids = kb.add_documents([f"文档{i}" for i in range(10)])
+    kb.save()
+    kb.delete_documents(ids[:8])
+    written.clear()
+
+    kb.save()
+
+    assert written == [("seg_000002", 2)]
+    assert kb.count == 2
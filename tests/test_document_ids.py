@@ -0,0 +1,87 @@
+"""文档ID、更新与删除测试"""
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+
+
+class FakeModel:
+    """按文本哈希生成固定单位向量的嵌入模型替身，记录被编码的文本"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, sentences, **kwargs):
+        self.encoded.extend(sentences)
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(16) for text in sentences
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture(autouse=True)
+def store_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    return tmp_path
+
+
+def make_kb():
+    kb = KnowledgeBase()
+    kb.model = FakeModel()
+    return kb
+
+
+def found(kb, query, top_k=5):
+    return [result["document"] for result in kb.search(query, top_k=top_k, score_threshold=-1)]
+
+
+def test_upsert_only_encodes_changed_content():
+    kb = make_kb()
+    kb.upsert_documents(["退货政策", "保修政策"], ["faq-1", "faq-2"], [{"v": 1}, {"v": 1}])
+    kb.model.encoded.clear()
+
+    stats = kb.upsert_documents(
+        ["退货政策", "保修政策（更新）", "发票说明"],
+        ["faq-1", "faq-2", "faq-3"],
+        [{"v": 2}, {"v": 1}, {"v": 1}]
+    )
+
+    assert stats == {"added": 1, "updated": 2, "unchanged": 0}
+    # faq-1 只改了元数据，复用已有向量
+    assert kb.model.encoded == ["保修政策（更新）", "发票说明"]
+    assert kb.get_document("faq-1")["metadata"] == {"v": 2}
+    assert kb.get_document("faq-2")["content"] == "保修政策（更新）"
+    assert kb.count == 3
+    assert "保修政策" not in found(kb, "保修政策")
+
+    unchanged = kb.upsert_documents(["发票说明"], ["faq-3"], [{"v": 1}])
+    assert unchanged == {"added": 0, "updated": 0, "unchanged": 1}
+
+
+def test_add_delete_save_load_compact_round_trip():
+    kb = make_kb()
+    ids = kb.add_documents([f"文档{i}" for i in range(6)])
+    kb.save()
+    kb.add_documents(["文档2（新版）"], ids=[ids[2]])
+    assert kb.delete_documents([ids[0], "不存在"]) == 1
+    kb.save(compact=False)
+
+    loaded = make_kb()
+    loaded.load()
+    assert loaded.count == 5
+    assert loaded.get_document(ids[0]) is None
+    assert loaded.get_document(ids[2])["content"] == "文档2（新版）"
+    assert "文档0" not in found(loaded, "文档0")
+    assert "文档2" not in found(loaded, "文档2")
+
+    loaded.compact()
+    assert len(loaded.segments) == 1
+    assert loaded.count == 5
+
+    reloaded = make_kb()
+    reloaded.load()
+    assert sorted(reloaded.get_document(doc_id)["content"] for doc_id in ids[1:]) == [
+        "文档1", "文档2（新版）", "文档3", "文档4", "文档5"
+    ]
+    assert found(reloaded, "文档4", top_k=1) == ["文档4"]
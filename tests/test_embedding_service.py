@@ -0,0 +1,109 @@
+"""共享嵌入服务测试"""
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+import numpy as np
+import pytest
+
+from api import main
+from config import settings
+from langraph_customer_service.knowledge_base.embedding_service import _handle_connection
+from langraph_customer_service.knowledge_base.embeddings import (
+    RemoteEmbeddingModel,
+    parse_service_address,
+    service_authkey,
+)
+
+
+class FakeModel:
+    def encode(self, sentences, **kwargs):
+        return np.full((len(sentences), 4), float(kwargs.get("batch_size", 1)), dtype="float32")
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+
+@pytest.fixture
+def service():
+    """在后台线程中运行嵌入服务，返回 (地址, 密钥)"""
+    authkey = b"test-key"
+    listener = Listener(("127.0.0.1", 0), authkey=authkey)
+
+    def accept():
+        while True:
+            try:
+                conn = listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                return
+            threading.Thread(
+                target=_handle_connection, args=(conn, FakeModel(), threading.Lock()), daemon=True
+            ).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    host, port = listener.address
+    yield f"{host}:{port}", authkey
+    listener.close()
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("127.0.0.1:8765", ("127.0.0.1", 8765)),
+    (":8765", ("127.0.0.1", 8765)),
+    ("/tmp/embedding.sock", "/tmp/embedding.sock"),
+    ("./data/embedding:1.sock", "./data/embedding:1.sock"),
+])
+def test_parse_service_address(address, expected):
+    assert parse_service_address(address) == expected
+
+
+def test_service_authkey_is_required(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_service_authkey", "")
+    with pytest.raises(ValueError):
+        service_authkey()
+
+    monkeypatch.setattr(settings, "embedding_service_authkey", "secret")
+    assert service_authkey() == b"secret"
+
+
+def test_remote_model_encodes_through_service(service):
+    address, authkey = service
+    model = RemoteEmbeddingModel(address, authkey)
+
+    assert model.ping()
+    assert model.get_sentence_embedding_dimension() == 4
+    vectors = model.encode(["你好", "退款"], batch_size=8, show_progress_bar=True)
+    assert vectors.shape == (2, 4)
+    assert np.all(vectors == 8)
+
+
+def test_remote_model_rejects_wrong_authkey(service):
+    address, _ = service
+
+    with pytest.raises(AuthenticationError):
+        RemoteEmbeddingModel(address, b"wrong-key").encode(["你好"])
+
+
+def test_production_mode_starts_shared_service(monkeypatch):
+    started = {}
+    monkeypatch.setattr(settings, "session_backend", "memory")
+    monkeypatch.setattr(settings, "embedding_service_address", "")
+    monkeypatch.setattr(settings, "embedding_service_authkey", "")
+    for name in ("SESSION_BACKEND", "EMBEDDING_SERVICE_ADDRESS", "EMBEDDING_SERVICE_AUTHKEY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(main, "start_embedding_service", lambda address, authkey: started.update(
+        address=address, authkey=authkey
+    ))
+    monkeypatch.setattr(main, "stop_embedding_service", lambda process: None)
+    monkeypatch.setattr(main.uvicorn, "run", lambda *args, **kwargs: started.update(workers=kwargs["workers"]))
+
+    main._run_production("127.0.0.1", 8000, 4)
+
+    assert started["workers"] == 4
+    assert os.environ["SESSION_BACKEND"] == "sqlite"
+    assert os.environ["EMBEDDING_SERVICE_ADDRESS"] == started["address"]
+    # 未配置密钥时随机生成
+    assert len(started["authkey"]) == 64
+    assert os.environ["EMBEDDING_SERVICE_AUTHKEY"].encode("utf-8") == started["authkey"]
@@ -0,0 +1,95 @@
+"""嵌入模型后端测试"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.embeddings import (
+    OnnxEmbeddingModel,
+    embedding_fingerprint,
+    load_local_embedding_model,
+    local_model_path,
+)
+
+
+def make_onnx_model(pooling):
+    """不加载真实模型的 OnnxEmbeddingModel：隐藏层第 t 个位置的向量为 [文本长度, t]"""
+    model = object.__new__(OnnxEmbeddingModel)
+    model.max_seq_length = 8
+    model.pooling = pooling
+    model._dimension = None
+    model._input_names = {"input_ids", "attention_mask"}
+    fed = []
+
+    def tokenizer(texts, **kwargs):
+        width = max(len(text) for text in texts)
+        mask = np.array([[1] * len(text) + [0] * (width - len(text)) for text in texts], dtype="int32")
+        return {"input_ids": mask.copy(), "attention_mask": mask, "token_type_ids": np.zeros_like(mask)}
+
+    def run(outputs, feed):
+        fed.append(feed)
+        lengths = feed["attention_mask"].sum(axis=1)
+        positions = np.arange(feed["input_ids"].shape[1])
+        hidden = np.stack([
+            np.stack([np.full_like(positions, length), positions], axis=1) for length in lengths
+        ])
+        return [hidden.astype("float32")]
+
+    model.tokenizer = tokenizer
+    model.session = SimpleNamespace(run=run)
+    return model, fed
+
+
+def test_local_model_path_follows_model_name(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_model_path", "")
+    monkeypatch.setattr(settings, "embedding_model", "BAAI/bge-small-zh-v1.5")
+    assert local_model_path().name == "bge-small-zh-v1.5"
+
+    monkeypatch.setattr(settings, "embedding_model_path", "/opt/models/bge")
+    assert str(local_model_path()) == "/opt/models/bge"
+    assert local_model_path("BAAI/bge-large-zh-v1.5").name == "bge-large-zh-v1.5"
+
+
+def test_fingerprint_distinguishes_backends(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_backend", "torch")
+    torch_fingerprint = embedding_fingerprint()
+    monkeypatch.setattr(settings, "embedding_backend", "onnx")
+    assert embedding_fingerprint() != torch_fingerprint
+
+
+def test_load_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_local_embedding_model("torch", tmp_path / "missing")
+    with pytest.raises(ValueError):
+        load_local_embedding_model("tensorrt", tmp_path)
+
+
+def test_onnx_encode_keeps_input_order_and_pools():
+    model, fed = make_onnx_model("cls")
+    texts = ["a", "ccc", "bb"]
+
+    vectors = model.encode(texts, batch_size=2)
+
+    # [CLS] 池化取第一个位置，批内按长度排序后仍按输入顺序返回
+    assert vectors.tolist() == [[1, 0], [3, 0], [2, 0]]
+    assert [len(feed["input_ids"]) for feed in fed] == [2, 1]
+    assert set(fed[0]) == {"input_ids", "attention_mask"}
+    assert fed[0]["input_ids"].dtype == np.int64
+
+    model.pooling = "mean"
+    assert model.encode("ccc").tolist() == [3, 1]
+    assert model.encode(texts, normalize_embeddings=True)[0].tolist() == pytest.approx([1, 0])
+    assert model.get_sentence_embedding_dimension() == 2
+
+
+def test_load_rejects_knowledge_base_from_other_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    kb = KnowledgeBase(embedding_model="BAAI/bge-large-zh-v1.5")
+    kb.model = SimpleNamespace(encode=lambda texts, **kwargs: np.eye(len(texts), 4, dtype="float32"))
+    kb.add_documents(["文档一", "文档二"])
+    kb.save()
+
+    with pytest.raises(ValueError, match="重新导入"):
+        KnowledgeBase(embedding_model="BAAI/bge-small-zh-v1.5").load()
@@ -0,0 +1,82 @@
+"""元数据过滤测试"""
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.filters import MetadataIndex, filter_key
+from langraph_customer_service.knowledge_base.index import IndexSpec
+
+
+METADATA = [
+    {"category": "faq", "price": 0},
+    {"category": "product", "price": 7999, "tags": ["apple", "phone"]},
+    {"category": "product", "price": "12999", "tags": ["apple", "laptop"]},
+    {"category": "tech", "price": 1999},
+    {"category": "faq"},
+]
+
+
+class FakeModel:
+    """按文本哈希生成固定单位向量的嵌入模型替身"""
+
+    def encode(self, sentences, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(16) for text in sentences
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def index():
+    index = MetadataIndex()
+    index.add(0, METADATA)
+    return index
+
+
+@pytest.mark.parametrize("filters, rows", [
+    ({"category": "faq"}, [0, 4]),
+    ({"category": ["product", "tech"]}, [1, 2, 3]),
+    ({"tags": "apple"}, [1, 2]),
+    ({"price": {"gte": 1999, "lt": 12999}}, [1, 3]),
+    ({"price": {"gt": 5000}}, [1, 2]),
+    ({"category": {"in": ["product"]}, "tags": {"eq": "laptop"}}, [2]),
+    ({"category": "faq", "price": {"gt": 0}}, []),
+    ({"brand": "Apple"}, []),
+])
+def test_metadata_index_rows(index, filters, rows):
+    assert index.rows(filters).tolist() == rows
+
+
+def test_invalid_filters(index):
+    with pytest.raises(ValueError):
+        index.rows({"price": {"between": [1, 2]}})
+    with pytest.raises(ValueError):
+        index.rows({})
+
+
+def test_filter_key_is_order_independent():
+    assert filter_key({"a": 1, "b": [2]}) == filter_key({"b": [2], "a": 1})
+    assert filter_key(None) == filter_key({})
+
+
+@pytest.mark.parametrize("exact_max", [0, 4096])
+def test_filtered_search_respects_filters(tmp_path, monkeypatch, exact_max):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    # exact_max=0 时走索引内按ID过滤，否则用保存的向量精确计算
+    monkeypatch.setattr(settings, "kb_filter_exact_max", exact_max)
+    kb = KnowledgeBase(index_spec=IndexSpec(type="hnsw", hnsw_m=8))
+    kb.model = FakeModel()
+    ids = kb.add_documents([f"文档{i}" for i in range(len(METADATA))], METADATA)
+    kb.save()
+    kb.add_documents(["新的常见问题"], [{"category": "faq"}])
+    kb.delete_documents([ids[4]])
+
+    results = kb.search("文档1", top_k=5, score_threshold=-1, filters={"category": "faq"})
+
+    assert sorted(r["document"] for r in results) == ["文档0", "新的常见问题"]
+    assert kb.search("文档1", top_k=1, filters={"category": "product"})[0]["document"] == "文档1"
+    assert kb.search("文档1", filters={"category": "none"}) == []
+    batch = kb.search_batch(["文档2", "文档3"], top_k=1, score_threshold=-1, filters={"tags": "apple"})
+    assert batch[0][0]["document"] == "文档2"
+    assert batch[1][0]["document"] in ("文档1", "文档2")
@@ -0,0 +1,111 @@
+"""对话历史压缩测试"""
+from datetime import datetime, timedelta
+import threading
+
+from langraph_customer_service.history import HistoryCompactor
+from langraph_customer_service.state import Message
+
+
+class FakeLLM:
+    """记录调用次数，可阻塞到测试放行"""
+
+    def __init__(self, block: bool = False):
+        self.calls = 0
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def invoke(self, messages):
+        self.calls += 1
+        self.release.wait(timeout=5)
+        return f"摘要{self.calls}"
+
+
+def make_messages(count: int, start: int = 0):
+    base = datetime(2026, 1, 1)
+    return [
+        Message(
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"消息{i}",
+            timestamp=base + timedelta(seconds=i)
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def apply(state, update):
+    state = dict(state)
+    state.update(update)
+    if "messages" in update:
+        state["messages"] = list(update["messages"])
+    return state
+
+
+def wait_for_task(compactor, session_id):
+    with compactor._lock:
+        task = compactor._tasks.get(session_id)
+    if task is not None:
+        task[2].result(timeout=5)
+
+
+def test_no_trim_within_margin():
+    llm = FakeLLM()
+    compactor = HistoryCompactor(max_messages=4, margin=4, summarize=True, llm=llm)
+    state = {"session_id": "s1", "messages": make_messages(8)}
+
+    assert compactor.compact(state) == {}
+    assert llm.calls == 0
+
+
+def test_trim_in_batches_and_summarize_in_background():
+    llm = FakeLLM(block=True)
+    compactor = HistoryCompactor(max_messages=4, margin=4, summarize=True, llm=llm)
+    state = {"session_id": "s1", "messages": make_messages(10)}
+
+    update = compactor.compact(state)
+    # 一次裁剪回窗口大小，移出的消息等待后台摘要，压缩本身不等待LLM
+    assert [m.content for m in update["messages"]] == ["消息6", "消息7", "消息8", "消息9"]
+    assert [m.content for m in update["unsummarized_messages"]] == [f"消息{i}" for i in range(6)]
+    assert "history_summary" not in update
+    state = apply(state, update)
+
+    # 摘要写回之前，格式化历史仍包含待摘要的消息
+    assert "消息5" in compactor.format_history(state, 6)
+
+    llm.release.set()
+    wait_for_task(compactor, "s1")
+
+    state["messages"] = state["messages"] + make_messages(2, start=10)
+    update = compactor.compact(state)
+    assert update["history_summary"] == "摘要1"
+    assert update["unsummarized_messages"] == []
+    assert "messages" not in update
+    assert llm.calls == 1
+
+
+def test_stale_summary_is_discarded():
+    llm = FakeLLM()
+    compactor = HistoryCompactor(max_messages=2, margin=0, summarize=True, llm=llm)
+    state = {"session_id": "s1", "messages": make_messages(4)}
+    state = apply(state, compactor.compact(state))
+    wait_for_task(compactor, "s1")
+
+    # 摘要已被其他进程更新，本进程的结果作废并重新生成
+    state["history_summary"] = "其他worker的摘要"
+    update = compactor.compact(state)
+    assert "history_summary" not in update
+    wait_for_task(compactor, "s1")
+    assert llm.calls == 2
+
+
+def test_close_stops_background_summaries():
+    llm = FakeLLM()
+    compactor = HistoryCompactor(max_messages=4, margin=4, summarize=True, llm=llm)
+    compactor.close(wait=True)
+
+    update = compactor.compact({"session_id": "s1", "messages": make_messages(10)})
+
+    # 关闭后仍正常裁剪，移出的消息留在状态中等待之后摘要
+    assert len(update["unsummarized_messages"]) == 6
+    assert llm.calls == 0
+    assert compactor._tasks == {}
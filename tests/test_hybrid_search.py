@@ -0,0 +1,49 @@
+"""混合检索（向量 + BM25）测试"""
+import numpy as np
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+
+
+DOCUMENTS = ["苹果手机价格说明", "退货流程说明", "型号 A1234 规格参数"]
+
+
+def make_kb(tmp_path, monkeypatch):
+    """每条文档的向量为一个坐标轴方向，查询向量固定指向第一条文档"""
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    monkeypatch.setattr(settings, "kb_lexical_enabled", True)
+    monkeypatch.setattr(settings, "kb_lexical_skip_dense", True)
+    monkeypatch.setattr(settings, "kb_score_threshold", 0.3)
+    kb = KnowledgeBase()
+    kb._encode_documents = lambda documents: np.eye(4, dtype="float32")[:len(documents)]
+    encoded = []
+
+    def encode_queries(queries):
+        encoded.extend(queries)
+        return np.tile(np.eye(4, dtype="float32")[0], (len(queries), 1))
+
+    kb.encode_queries = encode_queries
+    kb.add_documents(DOCUMENTS)
+    return kb, encoded
+
+
+def test_lexical_only_hits_respect_score_threshold(tmp_path, monkeypatch):
+    kb, _ = make_kb(tmp_path, monkeypatch)
+
+    results = kb.search("退货流程", top_k=3)
+
+    # “退货流程说明”只被词法召回，余弦相似度为0，低于阈值
+    assert [result["document"] for result in results] == ["苹果手机价格说明"]
+    assert results[0]["score"] > 0.99
+    assert "fusion_score" in results[0]
+
+
+def test_code_query_skips_dense_without_faking_score(tmp_path, monkeypatch):
+    kb, encoded = make_kb(tmp_path, monkeypatch)
+
+    results = kb.search("A1234", top_k=3)
+
+    assert encoded == []
+    assert [result["document"] for result in results] == ["型号 A1234 规格参数"]
+    assert results[0]["score"] is None
+    assert results[0]["fusion_score"] > 0
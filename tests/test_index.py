@@ -0,0 +1,93 @@
+"""向量索引测试"""
+import faiss
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.index import IndexSpec, build_index, migrate_l2_index
+
+
+def random_vectors(count, dimension=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimension)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class FakeModel:
+    """按文本哈希生成固定单位向量的嵌入模型替身"""
+
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        return np.stack([random_vectors(1, seed=abs(hash(text)) % 2 ** 32)[0] for text in sentences])
+
+
+@pytest.mark.parametrize("spec", [
+    IndexSpec(type="flat"),
+    IndexSpec(type="hnsw", hnsw_m=8),
+    IndexSpec(type="ivf_flat", nlist=8, nprobe=8),
+    IndexSpec(type="ivf_pq", nlist=4, nprobe=4, pq_m=8, pq_nbits=4),
+])
+def test_index_types_find_each_vector(spec):
+    vectors = random_vectors(500)
+    index = build_index(spec, vectors)
+    index.add(vectors)
+
+    scores, ids = index.search(vectors[:20], 10)
+
+    assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+    if spec.type == "ivf_pq":
+        # PQ为有损压缩，只要求原向量出现在前10条结果中
+        assert np.mean([i in row for i, row in enumerate(ids)]) >= 0.9
+    else:
+        assert np.array_equal(ids[:, 0], np.arange(20))
+        assert np.allclose(scores[:, 0], 1.0, atol=1e-4)
+
+
+def test_ivf_nlist_shrinks_for_small_training_set():
+    spec = IndexSpec(type="ivf_flat", nlist=1024, nprobe=16)
+
+    build_index(spec, random_vectors(100))
+
+    assert spec.nlist == 100 // 39
+    assert spec.nprobe == spec.nlist
+
+
+def test_ivf_pq_falls_back_to_flat_without_enough_samples():
+    spec = IndexSpec(type="ivf_pq", pq_m=4, pq_nbits=8)
+
+    index = build_index(spec, random_vectors(100))
+
+    assert spec.type == "flat"
+    assert isinstance(index, faiss.IndexFlatIP)
+
+
+def test_migrate_l2_index_normalizes_vectors():
+    vectors = random_vectors(10) * 3
+    legacy = faiss.IndexFlatL2(16)
+    legacy.add(vectors)
+
+    migrated = migrate_l2_index(legacy)
+    scores, ids = migrated.search(vectors[:1] / 3, 1)
+
+    assert ids[0, 0] == 0
+    assert scores[0, 0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_knowledge_base_search_scores_are_cosine(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    kb = KnowledgeBase(index_spec=IndexSpec(type="hnsw", hnsw_m=8, ef_search=32))
+    kb.model = FakeModel()
+    kb.add_documents(["iPhone 15 Pro 售价7999元", "退货政策：7天无理由退货"])
+
+    results = kb.search("退货政策：7天无理由退货", top_k=2, score_threshold=-1)
+
+    assert results[0]["document"] == "退货政策：7天无理由退货"
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-4)
+    assert -1 <= results[1]["score"] < 1
+
+    kb.save()
+    loaded = KnowledgeBase(index_spec=IndexSpec(type="flat"))
+    loaded.model = FakeModel()
+    assert loaded.load()
+    assert loaded.index_spec.type == "hnsw"
+    assert loaded.index_spec.ef_search == 32
+    assert loaded.search("退货政策：7天无理由退货", top_k=1)[0]["document"] == "退货政策：7天无理由退货"
@@ -0,0 +1,95 @@
+"""知识库批量导入测试"""
+import json
+
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.ingest import BulkIngestor, IngestCheckpoint, read_records
+
+
+class FakeModel:
+    """按文本哈希生成固定单位向量的嵌入模型替身，记录编码的文本数"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.encoded = 0
+
+    def encode(self, sentences, **kwargs):
+        if self.fail:
+            raise RuntimeError("encode failed")
+        self.encoded += len(sentences)
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(16) for text in sentences
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """25 条记录的JSONL导出文件，第5条正文为空"""
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path / "kb"))
+    path = tmp_path / "catalog.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(25):
+            record = {"sku": f"SKU{i}", "description": "" if i == 5 else f"商品{i}的介绍", "brand": "Apple"}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return path
+
+
+def make_ingestor(checkpoint_path, model=None, **kwargs):
+    kb = KnowledgeBase()
+    kb.model = model or FakeModel()
+    kb.load()
+    checkpoint = IngestCheckpoint(checkpoint_path)
+    checkpoint.load()
+    return BulkIngestor(kb, checkpoint, batch_size=4, save_every=2, chunk=False, **kwargs)
+
+
+def test_read_records_formats(tmp_path):
+    path = tmp_path / "faq.csv"
+    path.write_text("question,answer,category\n怎么退货,7天无理由,faq\n,没有问题,faq\n", encoding="utf-8")
+
+    records = list(read_records(path, "question", "answer", ["category"]))
+
+    assert records[0] == {"id": "怎么退货", "text": "7天无理由", "metadata": {"category": "faq"}}
+    assert records[1]["id"] == "faq-1"
+    assert list(read_records(path, "question", "answer", skip=1))[0]["metadata"] == {"category": "faq"}
+    (tmp_path / "faq.txt").write_text("怎么退货", encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(read_records(tmp_path / "faq.txt", "id", "content"))
+
+
+def test_ingest_and_rerun_is_idempotent(tmp_path, catalog):
+    ingestor = make_ingestor(tmp_path / "checkpoint.json")
+    ingestor.run([catalog], "sku", "description", None)
+
+    assert ingestor.kb.count == 24
+    assert ingestor.skipped == 1
+    assert ingestor.kb.get_document("SKU3") == {"id": "SKU3", "content": "商品3的介绍", "metadata": {"brand": "Apple"}}
+    assert not (tmp_path / "checkpoint.json").exists()
+
+    rerun = make_ingestor(tmp_path / "checkpoint.json")
+    rerun.run([catalog], "sku", "description", None)
+    assert rerun.kb.count == 24
+    assert rerun.encoded == 0
+
+
+def test_resume_from_checkpoint(tmp_path, catalog):
+    IngestCheckpoint(tmp_path / "checkpoint.json").save({str(catalog.resolve()): 20})
+
+    ingestor = make_ingestor(tmp_path / "checkpoint.json")
+    ingestor.run([catalog], "sku", "description", None)
+
+    assert ingestor.records == 5
+    assert ingestor.kb.get_document("SKU19") is None
+    assert ingestor.kb.get_document("SKU24") is not None
+
+
+def test_encoder_error_stops_ingest(tmp_path, catalog):
+    ingestor = make_ingestor(tmp_path / "checkpoint.json", model=FakeModel(fail=True))
+
+    with pytest.raises(RuntimeError, match="encode failed"):
+        ingestor.run([catalog], "sku", "description", None)
+    assert ingestor.kb.count == 0
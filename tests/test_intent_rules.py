@@ -0,0 +1,74 @@
+"""规则意图识别测试"""
+import pytest
+
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+from langraph_customer_service.agents.intent_rules import RuleBasedIntentClassifier
+from langraph_customer_service.state import Message
+
+
+@pytest.fixture
+def classifier():
+    return RuleBasedIntentClassifier(threshold=0.9)
+
+
+@pytest.mark.parametrize("text", [
+    "ORD001 我要退款",
+    "订单ORD001申请退款，因为屏幕有坏点",
+    "退款",
+])
+def test_refund_request_goes_to_llm(classifier, text):
+    # 退款有副作用，规则不直接判定
+    result = classifier.classify(text)
+    assert result is None or result["intent"] != "refund_request"
+    scored = classifier.score(text)
+    assert scored is None or not (scored["intent"] == "refund_request" and scored["confidence"] >= 0.9)
+
+
+@pytest.mark.parametrize("text", [
+    "不要退款 ORD001",
+    "ORD001 不想退货了",
+    "ORD001退款进度",
+    "ORD001 退款多久到账",
+    "ORD001的退款成功了吗",
+])
+def test_negated_or_status_refund_is_not_refund_request(classifier, text):
+    scored = classifier.score(text)
+    assert scored is not None
+    assert scored["intent"] != "refund_request"
+    assert "refund_request" not in scored["intents"]
+
+
+def test_order_query_fast_path(classifier):
+    result = classifier.classify("查一下订单ORD001")
+    assert result["intent"] == "order_query"
+    assert result["entities"]["order_id"] == "ORD001"
+
+
+def test_multi_intent_message(classifier):
+    result = classifier.classify("查订单ORD001和物流")
+    assert result["intent"] == "order_query"
+    assert result["intents"] == ["order_query", "logistics_query"]
+
+
+def test_logistics_fast_path(classifier):
+    result = classifier.classify("SF1234567890到哪了")
+    assert result["intent"] == "logistics_query"
+    assert result["entities"]["tracking_number"] == "SF1234567890"
+
+
+def test_classifier_counts_hits_and_fallbacks(classifier):
+    classifier.classify("查一下订单ORD001")
+    classifier.classify("你们几点下班")
+
+    stats = classifier.get_stats()
+    assert (stats["total"], stats["hits"], stats["fallbacks"]) == (2, 1, 1)
+    assert stats["intent_hits"] == {"order_query": 1}
+
+
+def test_agent_skips_llm_on_rule_hit():
+    agent = CustomerServiceAgent()
+    state = {"messages": [Message(role="user", content="查一下订单ORD001")], "context": {}}
+
+    assert agent._fast_path_intent(state)["intent"] == "order_query"
+    state["messages"] = [Message(role="user", content="你们几点下班")]
+    assert agent._fast_path_intent(state) is None
@@ -0,0 +1,66 @@
+"""BM25 词法检索测试"""
+import pickle
+
+import numpy as np
+import pytest
+
+from langraph_customer_service.knowledge_base.lexical import (
+    LexicalIndex, LexicalSegment, is_code_query, reciprocal_rank_fusion
+)
+
+
+DOCUMENTS = ["退货流程说明", "型号 A1234 规格参数", "苹果手机价格说明", "退款到账时间"]
+
+
+def make_index():
+    index = LexicalIndex()
+    index.add(0, DOCUMENTS)
+    return index
+
+
+def test_search_ranks_matching_documents():
+    hits = make_index().search("退货流程", 3)
+
+    assert hits[0][0] == 0
+    assert all(score > 0 for _, score in hits)
+
+
+def test_search_respects_rows_and_deleted():
+    index = make_index()
+
+    assert [row for row, _ in index.search("说明", 5, rows=np.array([2]))] == [2]
+    assert 0 not in [row for row, _ in index.search("说明", 5, deleted=np.array([0]))]
+
+
+def test_code_query_matches_whole_token():
+    assert is_code_query("A1234")
+    assert not is_code_query("退货流程")
+    assert [row for row, _ in make_index().search("A1234", 3)] == [1]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index()
+    path = tmp_path / "lexical.npz"
+    index.segments[0].save(path)
+
+    restored = LexicalIndex()
+    restored.add_segment(LexicalSegment.load(path, 0))
+
+    for query in ("退货流程", "A1234", "说明"):
+        assert restored.search(query, 4) == index.search(query, 4)
+
+
+def test_load_rejects_pickled_file(tmp_path):
+    path = tmp_path / "lexical.npz"
+    with open(path, "wb") as f:
+        pickle.dump({"lengths": [], "postings": {}}, f)
+
+    with pytest.raises(Exception):
+        LexicalSegment.load(path, 0)
+
+
+def test_reciprocal_rank_fusion_weights_lists():
+    fused = reciprocal_rank_fusion([[1, 2], [2, 3]], [1.0, 1.0], k=60)
+
+    assert fused[0][0] == 2
+    assert {row for row, _ in fused} == {1, 2, 3}
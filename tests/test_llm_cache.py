@@ -0,0 +1,62 @@
+"""LLM补全缓存测试"""
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from langraph_customer_service.llm_cache import InMemoryLLMCache, SQLiteLLMCache, make_cache_key
+from langraph_customer_service.llm_client import LLMClient
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+def make_client(cache):
+    client = LLMClient(model="test-model", cache=cache)
+    client.client = FakeListChatModel(responses=["第一次回复", "第二次回复", "第三次回复"])
+    return client
+
+
+def test_cache_key_depends_on_output_params():
+    key = make_cache_key("m", 0.7, 100, MESSAGES)
+
+    assert key == make_cache_key("m", 0.7, 100, [dict(MESSAGES[0])])
+    assert key != make_cache_key("m", 0.2, 100, MESSAGES)
+    assert key != make_cache_key("m", 0.7, 100, MESSAGES, response_format={"type": "json_object"})
+
+
+def test_client_reuses_cached_completion():
+    client = make_client(InMemoryLLMCache())
+
+    assert client.invoke(MESSAGES) == "第一次回复"
+    assert asyncio.run(client.ainvoke(MESSAGES, config={"callbacks": []})) == "第一次回复"
+    assert client.invoke(MESSAGES, use_cache=False) == "第二次回复"
+    assert client.invoke(MESSAGES, response_format={"type": "json_object"}) == "第三次回复"
+    assert client.cache.get_stats()["hits"] == 1
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = InMemoryLLMCache(max_size=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert len(cache) == 2
+
+
+@pytest.mark.parametrize("reopen", [False, True])
+def test_sqlite_cache_persists(tmp_path, reopen):
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = SQLiteLLMCache(path)
+    cache.set("key", "回复")
+
+    if reopen:
+        cache = SQLiteLLMCache(path)
+
+    assert cache.get("key") == "回复"
+    assert len(cache) == 1
+    cache.clear()
+    assert cache.get("key") is None
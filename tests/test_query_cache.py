@@ -0,0 +1,47 @@
+"""查询向量缓存测试"""
+import pickle
+
+import numpy as np
+
+from langraph_customer_service.knowledge_base.query_cache import QueryEmbeddingCache, normalize_query
+
+
+def test_normalized_queries_share_entry():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("iPhone 15  Pro ", np.ones(4, dtype="float32"))
+
+    assert normalize_query("ｉPhone 15 Pro") == "iPhone 15 Pro"
+    assert cache.get("ｉPhone 15 Pro") is not None
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", np.zeros(4, dtype="float32"))
+    cache.put("b", np.zeros(4, dtype="float32"))
+    cache.get("a")
+    cache.put("c", np.zeros(4, dtype="float32"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "query_cache.npz"
+    cache = QueryEmbeddingCache(max_size=10)
+    cache.put("怎么退货", np.arange(4, dtype="float32"))
+    cache.save(path, "model-a")
+
+    restored = QueryEmbeddingCache(max_size=10)
+    assert restored.load(path, "model-a")
+    np.testing.assert_array_equal(restored.get("怎么退货"), np.arange(4, dtype="float32"))
+
+    assert not QueryEmbeddingCache(max_size=10).load(path, "model-b")
+
+
+def test_load_rejects_pickled_file(tmp_path):
+    path = tmp_path / "query_cache.npz"
+    with open(path, "wb") as f:
+        pickle.dump({"model": "model-a", "entries": []}, f)
+
+    assert not QueryEmbeddingCache(max_size=10).load(path, "model-a")
@@ -0,0 +1,119 @@
+"""重排序测试"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+from langraph_customer_service.knowledge_base import CrossEncoderReranker
+from langraph_customer_service.llm_client import llm_client
+
+
+RESULTS = [{"document": f"文档{i}", "score": 1 - i / 10} for i in range(6)]
+
+
+class FakeCrossEncoder:
+    """文档序号越大分数越高，可模拟每批推理耗时"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs, **kwargs):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return np.array([float(document[-1]) for _, document in pairs])
+
+
+def make_reranker(model, **kwargs):
+    reranker = CrossEncoderReranker(batch_size=2, **kwargs)
+    reranker._model = model
+    return reranker
+
+
+def test_rerank_orders_by_cross_encoder_score():
+    model = FakeCrossEncoder()
+    reranker = make_reranker(model, budget_ms=0)
+
+    reranked = reranker.rerank("查询", RESULTS, top_k=3)
+
+    assert [r["document"] for r in reranked] == ["文档5", "文档4", "文档3"]
+    assert reranked[0]["rerank_score"] == 5.0
+    assert model.batches == [2, 2, 2]
+    assert reranker.get_stats()["calls"] == 1
+
+
+def test_rerank_over_budget_keeps_retrieval_order():
+    reranker = make_reranker(FakeCrossEncoder(delay=0.05), budget_ms=10)
+
+    reranked = reranker.rerank("查询", RESULTS, top_k=3)
+
+    assert reranked == RESULTS[:3]
+    assert reranker.get_stats()["timeouts"] == 1
+
+
+def test_onnx_backend_feeds_model_inputs():
+    reranker = CrossEncoderReranker(backend="onnx")
+    fed = {}
+
+    def tokenizer(queries, documents, **kwargs):
+        ids = np.arange(len(documents) * 4, dtype="int32").reshape(len(documents), 4)
+        return {"input_ids": ids, "attention_mask": np.ones_like(ids), "token_type_ids": np.zeros_like(ids)}
+
+    def run(outputs, feed):
+        fed.update(feed)
+        return [np.array([[0.1], [2.0], [-1.0]], dtype="float32")]
+
+    reranker._tokenizer = tokenizer
+    reranker._session = SimpleNamespace(
+        get_inputs=lambda: [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")],
+        run=run
+    )
+
+    scores = reranker.score("查询", ["a", "b", "c"])
+
+    assert scores.tolist() == pytest.approx([0.1, 2.0, -1.0])
+    assert set(fed) == {"input_ids", "attention_mask"}
+    assert fed["input_ids"].dtype == np.int64
+
+
+def test_load_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CrossEncoderReranker(model_path=str(tmp_path / "missing")).load()
+    with pytest.raises(ValueError):
+        CrossEncoderReranker(model_path=str(tmp_path), backend="tensorrt").load()
+
+
+def test_agent_falls_back_when_rerank_fails(monkeypatch):
+    class FakeKnowledgeBase:
+        version = 0
+
+        def search(self, query, top_k=3, **kwargs):
+            return RESULTS[:top_k]
+
+        def expand_chunks(self, results):
+            return results
+
+    class FailingReranker:
+        def rerank(self, query, results, top_k):
+            raise RuntimeError("model crashed")
+
+    async def ainvoke(messages, **kwargs):
+        if "意图分类器" in messages[0]["content"]:
+            return json.dumps({"intent": "general_chat", "entities": {}, "needs_knowledge": True})
+        return "回复"
+
+    monkeypatch.setattr(llm_client, "ainvoke", ainvoke)
+    monkeypatch.setattr(settings, "kb_rerank_enabled", True)
+    monkeypatch.setattr(settings, "kb_rerank_candidates", 5)
+    monkeypatch.setattr(settings, "kb_rerank_top_k", 2)
+    agent = CustomerServiceAgent(knowledge_base=FakeKnowledgeBase())
+    agent.reranker = FailingReranker()
+
+    _, state = asyncio.run(agent.achat("保修政策"))
+
+    assert state["retrieved_docs"] == ["文档0", "文档1"]
@@ -0,0 +1,144 @@
+"""检索微批处理测试"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+from langraph_customer_service.knowledge_base.search_batcher import SearchBatcher
+
+
+class FakeKnowledgeBase:
+    """记录每次批量检索的调用参数，结果中带上查询和过滤条件"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def search_batch(self, queries, top_k=3, filters=None):
+        with self._lock:
+            self.calls.append((list(queries), top_k, filters))
+        return [
+            [{"query": query, "filters": filters, "rank": i} for i in range(top_k)]
+            for query in queries
+        ]
+
+
+class FakeModel:
+    """按文本哈希生成固定单位向量的嵌入模型替身"""
+
+    def encode(self, sentences, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(16) for text in sentences
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_single_search():
+    kb = FakeKnowledgeBase()
+    batcher = SearchBatcher(kb, max_batch_size=8, max_wait_ms=10)
+    try:
+        results = batcher.search("退款多久到账", top_k=2)
+    finally:
+        batcher.close()
+
+    assert [r["rank"] for r in results] == [0, 1]
+    assert results[0]["filters"] is None
+    assert kb.calls == [(["退款多久到账"], 2, None)]
+
+
+def test_search_with_filters():
+    kb = FakeKnowledgeBase()
+    batcher = SearchBatcher(kb, max_batch_size=8, max_wait_ms=10)
+    try:
+        results = batcher.search("保修政策", top_k=1, filters={"category": "faq"})
+    finally:
+        batcher.close()
+
+    assert results == [{"query": "保修政策", "filters": {"category": "faq"}, "rank": 0}]
+    assert kb.calls == [(["保修政策"], 1, {"category": "faq"})]
+
+
+def test_concurrent_requests_share_one_batch():
+    kb = FakeKnowledgeBase()
+    # 等待时间足够长，保证并发请求落在同一批
+    batcher = SearchBatcher(kb, max_batch_size=3, max_wait_ms=500)
+    requests = [("iPhone 价格", 3), ("退货条件", 1), ("MacBook 续航", 2)]
+    try:
+        with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+            futures = [pool.submit(batcher.search, query, top_k=k) for query, k in requests]
+            results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.close()
+
+    assert batcher.get_stats() == {"batches": 1, "requests": 3, "avg_batch_size": 3.0}
+    # 按最大 top_k 检索，每个请求按自己的 top_k 截取
+    assert sorted(kb.calls[0][0]) == sorted(query for query, _ in requests)
+    assert kb.calls[0][1] == 3
+    for (query, k), result in zip(requests, results):
+        assert len(result) == k
+        assert all(r["query"] == query for r in result)
+
+
+def test_mixed_filters_are_grouped():
+    kb = FakeKnowledgeBase()
+    batcher = SearchBatcher(kb, max_batch_size=4, max_wait_ms=500)
+    requests = [
+        ("iPhone 价格", 3, None),
+        ("退货条件", 1, {"category": "faq"}),
+        ("MacBook 续航", 2, None),
+        ("发票", 2, {"category": ["faq"]}),
+    ]
+    try:
+        with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+            futures = [
+                pool.submit(batcher.search, query, top_k=k, filters=filters)
+                for query, k, filters in requests
+            ]
+            results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.close()
+
+    assert batcher.get_stats()["batches"] == 1
+    # 条件不同的请求分组检索，组内按最大 top_k 检索
+    assert len(kb.calls) == 3
+    by_filter = {str(filters): (sorted(queries), top_k) for queries, top_k, filters in kb.calls}
+    assert by_filter["None"] == (["MacBook 续航", "iPhone 价格"], 3)
+    assert by_filter[str({"category": "faq"})] == (["退货条件"], 1)
+    assert by_filter[str({"category": ["faq"]})] == (["发票"], 2)
+
+    for (query, k, filters), result in zip(requests, results):
+        assert len(result) == k
+        assert all(r["query"] == query and r["filters"] == filters for r in result)
+
+
+def test_search_batch_error_propagates():
+    class FailingKnowledgeBase:
+        def search_batch(self, queries, top_k=3, filters=None):
+            raise RuntimeError("index unavailable")
+
+    batcher = SearchBatcher(FailingKnowledgeBase(), max_batch_size=2, max_wait_ms=10)
+    try:
+        try:
+            batcher.search("test", filters={"category": "faq"})
+        except RuntimeError as e:
+            assert "index unavailable" in str(e)
+        else:
+            raise AssertionError("expected RuntimeError")
+    finally:
+        batcher.close()
+
+
+def test_search_batch_matches_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    kb = KnowledgeBase()
+    kb.model = FakeModel()
+    kb.add_documents([f"文档{i}" for i in range(20)])
+    queries = ["文档3", "文档7", "不存在的问题"]
+
+    batch = kb.search_batch(queries, top_k=3, score_threshold=-1)
+
+    assert batch == [kb.search(query, top_k=3, score_threshold=-1) for query in queries]
+    assert batch[0][0]["document"] == "文档3"
+    assert kb.search_batch([]) == []
@@ -0,0 +1,157 @@
+"""知识库分段存储测试"""
+import json
+import pickle
+
+import faiss
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase, vector_store
+from langraph_customer_service.knowledge_base.index import IndexSpec
+from langraph_customer_service.knowledge_base.storage import MANIFEST_NAME
+
+
+class FakeModel:
+    """按文本哈希生成固定单位向量的嵌入模型替身"""
+
+    def encode(self, sentences, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(16) for text in sentences
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_kb(spec=None):
+    kb = KnowledgeBase(index_spec=spec)
+    kb.model = FakeModel()
+    return kb
+
+
+@pytest.fixture(autouse=True)
+def store_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    return tmp_path
+
+
+def top_document(kb, query):
+    return kb.search(query, top_k=1, score_threshold=-1)[0]["document"]
+
+
+def test_save_appends_segments_and_load_restores(store_path):
+    kb = make_kb()
+    kb.add_documents([f"文档{i}" for i in range(5)], [{"category": "faq"}] * 5)
+    kb.save()
+    kb.add_documents(["新文档"])
+    kb.save()
+
+    manifest = json.loads((store_path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert [segment["count"] for segment in manifest["segments"]] == [5, 1]
+    assert manifest["total_documents"] == 6
+
+    loaded = make_kb()
+    assert loaded.load()
+    assert list(loaded.documents) == [f"文档{i}" for i in range(5)] + ["新文档"]
+    assert loaded.metadata[0] == {"category": "faq"}
+    assert top_document(loaded, "新文档") == "新文档"
+    assert top_document(loaded, "文档2") == "文档2"
+
+
+def test_uncommitted_segment_is_ignored_and_cleaned(store_path):
+    kb = make_kb()
+    kb.add_documents(["文档"])
+    kb.save()
+    # 模拟写入新段后、提交清单前崩溃
+    (store_path / "seg_000009").mkdir()
+
+    loaded = make_kb()
+    loaded.load()
+    assert len(loaded.documents) == 1
+    loaded.add_documents(["新文档"])
+    loaded.save()
+
+    assert not (store_path / "seg_000009").exists()
+
+
+def test_compact_merges_ivf_segments(store_path):
+    kb = make_kb(IndexSpec(type="ivf_flat", nlist=2, nprobe=2))
+    for batch in range(3):
+        kb.add_documents([f"批次{batch}文档{i}" for i in range(40)])
+        kb.save()
+    before = [top_document(kb, f"批次{batch}文档7") for batch in range(3)]
+
+    kb.compact()
+
+    assert len(kb.segments) == 1
+    assert kb.segments[0].count == 120
+    assert [top_document(kb, f"批次{batch}文档7") for batch in range(3)] == before
+    assert len(list(store_path.glob("seg_*"))) == 1
+
+    loaded = make_kb()
+    loaded.load()
+    assert len(loaded.documents) == 120
+    assert top_document(loaded, "批次1文档7") == "批次1文档7"
+
+
+def test_legacy_store_converted_on_save(store_path):
+    vectors = FakeModel().encode(["旧文档1", "旧文档2"])
+    index = faiss.IndexFlatIP(16)
+    index.add(vectors)
+    faiss.write_index(index, str(store_path / "faiss.index"))
+    (store_path / "index_spec.json").write_text(IndexSpec(type="flat").model_dump_json(), encoding="utf-8")
+    with open(store_path / "documents.pkl", "wb") as f:
+        pickle.dump({"documents": ["旧文档1", "旧文档2"], "metadata": [{}, {}]}, f)
+
+    kb = make_kb()
+    assert kb.load()
+    assert top_document(kb, "旧文档2") == "旧文档2"
+    kb.save()
+
+    assert (store_path / MANIFEST_NAME).exists()
+    assert not (store_path / "documents.pkl").exists()
+    loaded = make_kb()
+    loaded.load()
+    assert list(loaded.documents) == ["旧文档1", "旧文档2"]
+
+
+def test_load_defers_embedding_model(monkeypatch):
+    kb = make_kb()
+    kb.add_documents(["文档1", "文档2"])
+    kb.save()
+    loads = []
+    monkeypatch.setattr(vector_store, "load_local_embedding_model", lambda: loads.append(1) or FakeModel())
+
+    loaded = KnowledgeBase()
+    loaded.load(preload_model=False)
+
+    assert loaded.model is None
+    assert set(loaded.load_timings) >= {"manifest", "index", "documents", "model", "total"}
+    assert top_document(loaded, "文档2") == "文档2"
+    assert len(loads) == 1
+
+    KnowledgeBase().load(preload_model=True)
+    assert len(loads) == 2
+
+
+@pytest.mark.parametrize("spec, mapped", [
+    (IndexSpec(type="ivf_flat", nlist=2, nprobe=2), True),
+    (IndexSpec(type="flat"), False),
+])
+def test_only_ivf_indexes_are_memory_mapped(monkeypatch, spec, mapped):
+    kb = make_kb(spec)
+    kb.add_documents([f"文档{i}" for i in range(80)])
+    kb.save()
+
+    loaded = make_kb()
+    flags = []
+    read_index = loaded.store.read_index
+
+    def record(name, mmap_index=False):
+        flags.append(mmap_index)
+        return read_index(name, mmap_index=mmap_index)
+
+    monkeypatch.setattr(loaded.store, "read_index", record)
+    loaded.load(mmap_index=True)
+
+    assert flags == [mapped]
+    assert top_document(loaded, "文档42") == "文档42"
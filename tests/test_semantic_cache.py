@@ -0,0 +1,92 @@
+"""语义回复缓存测试"""
+import asyncio
+import json
+
+import numpy as np
+
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+from langraph_customer_service.knowledge_base import SemanticCache
+from langraph_customer_service.llm_client import llm_client
+from langraph_customer_service.state import Message
+
+
+class FakeKnowledgeBase:
+    """相同文本得到相同向量的知识库替身"""
+
+    version = 0
+
+    def encode_queries(self, queries):
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(query)) % 2 ** 32).random(8) for query in queries
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def search(self, query, top_k=3, **kwargs):
+        return [{"document": "iPhone 15 Pro 售价7999元", "score": 0.9}]
+
+    def expand_chunks(self, results):
+        return results
+
+
+def make_state(*contents):
+    return {
+        "messages": [Message(role="user", content=content) for content in contents],
+        "intent": "product_info",
+        "context": {"needs_knowledge": True, "needs_tool": False}
+    }
+
+
+def test_lookup_requires_same_scope():
+    cache = SemanticCache(FakeKnowledgeBase(), threshold=0.95, ttl=60, max_size=10)
+    cache.store("iPhone 15 Pro多少钱", "product_info|{}", "7999元")
+
+    assert cache.lookup("iPhone 15 Pro多少钱", "product_info|{}") == "7999元"
+    assert cache.lookup("iPhone 15 Pro多少钱", "product_info|null") is None
+
+
+def test_same_query_cached_under_two_scopes():
+    cache = SemanticCache(FakeKnowledgeBase(), threshold=0.95, ttl=60, max_size=10)
+    cache.store("怎么退货", "refund_request|{}", "退货流程")
+    cache.store("怎么退货", "general_chat|{}", "闲聊回复")
+
+    assert cache.lookup("怎么退货", "refund_request|{}") == "退货流程"
+    assert cache.lookup("怎么退货", "general_chat|{}") == "闲聊回复"
+    assert cache.get_stats()["size"] == 2
+
+
+def test_follow_up_questions_skip_cache():
+    agent = CustomerServiceAgent()
+    agent.semantic_cache = SemanticCache(FakeKnowledgeBase())
+
+    assert agent._use_semantic_cache(make_state("iPhone 15 Pro多少钱"))
+    assert not agent._use_semantic_cache(make_state("iPhone 15 Pro怎么样", "那它多少钱"))
+    assert not agent._use_semantic_cache(make_state("这个有货吗"))
+
+
+def test_repeated_question_skips_generation(monkeypatch):
+    generated = []
+
+    async def ainvoke(messages, **kwargs):
+        if "意图分类器" in messages[0]["content"]:
+            return json.dumps({"intent": "product_info", "entities": {}, "needs_knowledge": True})
+        generated.append(messages)
+        return "iPhone 15 Pro 售价7999元"
+
+    monkeypatch.setattr(llm_client, "ainvoke", ainvoke)
+    agent = CustomerServiceAgent(knowledge_base=FakeKnowledgeBase())
+
+    first, _ = asyncio.run(agent.achat("iPhone 15 Pro多少钱"))
+    second, _ = asyncio.run(agent.achat("iPhone 15 Pro多少钱"))
+
+    assert first == second == "iPhone 15 Pro 售价7999元"
+    assert len(generated) == 1
+    assert agent.semantic_cache.get_stats()["hits"] == 1
+
+
+def test_scope_includes_intent_filters():
+    state = make_state("iPhone 15 Pro多少钱")
+
+    scope = CustomerServiceAgent._semantic_cache_scope(state)
+
+    assert scope.startswith("product_info|")
+    assert "category" in scope
@@ -0,0 +1,65 @@
+"""会话存储测试"""
+import pickle
+
+from langraph_customer_service.session_store import InMemorySessionStore, SQLiteSessionStore
+from langraph_customer_service.state import Message
+
+
+def make_state(text: str):
+    return {
+        "session_id": text,
+        "messages": [Message(role="user", content=text), Message(role="assistant", content="好的")],
+        "unsummarized_messages": [Message(role="user", content="更早的消息")],
+        "context": {"intents": ["product_info"]},
+        "tool_calls": []
+    }
+
+
+def test_memory_store_evicts_by_estimated_size():
+    store = InMemorySessionStore(max_size=10, ttl=60, max_bytes=6000)
+    store.set("a", make_state("短消息"))
+    small = store.memory_usage()
+    store.set("b", make_state("长消息" * 2000))
+
+    assert small > 0
+    assert store.get("a") is None
+    assert store.get("b") is not None
+    assert store.evictions == 1
+
+
+def test_sqlite_store_round_trips_messages_as_json(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_size=10, ttl=60)
+    original = make_state("iPhone 15 Pro多少钱")
+    store.set("s1", original)
+
+    state = store.get("s1")
+
+    assert state["messages"] == original["messages"]
+    assert isinstance(state["unsummarized_messages"][0], Message)
+    assert state["context"] == {"intents": ["product_info"]}
+
+
+def test_sqlite_store_ignores_pickled_rows(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_size=10, ttl=60)
+    store.set("s1", make_state("你好"))
+    store._conn.execute("UPDATE sessions SET data = ? WHERE session_id = ?", (pickle.dumps({"x": 1}), "s1"))
+    store._conn.commit()
+
+    assert store.get("s1") is None
+
+
+def test_sqlite_store_counts_sessions_incrementally(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, max_size=3, ttl=60)
+    for i in range(5):
+        store.set(f"s{i}", make_state(str(i)))
+    # 覆盖已有会话不增加计数
+    store.set("s4", make_state("4"))
+
+    assert len(store) == 3
+    assert store.evictions == 2
+    assert store.get("s0") is None and store.get("s4") is not None
+
+    store.delete("s4")
+    reopened = SQLiteSessionStore(path, max_size=3, ttl=60)
+    assert reopened._conn.execute("SELECT count FROM session_count").fetchone()[0] == 2
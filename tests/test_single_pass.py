@@ -0,0 +1,72 @@
+"""单次调用模式测试"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+from langraph_customer_service.llm_client import llm_client
+
+
+class FakeKnowledgeBase:
+    version = 0
+
+    def search(self, query, top_k=3, **kwargs):
+        return [{"document": "iPhone 15 Pro 售价7999元", "score": 0.9}]
+
+    def expand_chunks(self, results):
+        return results
+
+    def encode_queries(self, queries):
+        return np.ones((len(queries), 8), dtype="float32") / np.sqrt(8)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """第一次调用返回给定的意图JSON，之后返回生成的回复，记录每次调用的参数"""
+    calls = []
+
+    def use(plan):
+        async def ainvoke(messages, **kwargs):
+            calls.append(kwargs)
+            return json.dumps(plan, ensure_ascii=False) if len(calls) == 1 else "生成的回复"
+
+        monkeypatch.setattr(llm_client, "ainvoke", ainvoke)
+        return calls
+
+    return use
+
+
+def test_chit_chat_uses_drafted_answer(fake_llm):
+    calls = fake_llm({"intent": "general_chat", "entities": {}, "answer": "您好，很高兴为您服务"})
+    agent = CustomerServiceAgent(knowledge_base=FakeKnowledgeBase(), single_pass=True)
+
+    response, state = asyncio.run(agent.achat("你好"))
+
+    assert response == "您好，很高兴为您服务"
+    assert len(calls) == 1
+    assert calls[0]["response_format"] == {"type": "json_object"}
+
+
+def test_missing_draft_falls_back_to_generation(fake_llm):
+    calls = fake_llm({"intent": "general_chat", "entities": {}, "answer": ""})
+    agent = CustomerServiceAgent(knowledge_base=FakeKnowledgeBase(), single_pass=True)
+
+    response, _ = asyncio.run(agent.achat("你好"))
+
+    assert response == "生成的回复"
+    assert len(calls) == 2
+
+
+def test_knowledge_turn_ignores_draft(fake_llm):
+    calls = fake_llm({
+        "intent": "product_info", "entities": {}, "needs_knowledge": True, "answer": "猜测的价格"
+    })
+    agent = CustomerServiceAgent(knowledge_base=FakeKnowledgeBase(), single_pass=True)
+
+    response, state = asyncio.run(agent.achat("iPhone 15 Pro多少钱"))
+
+    assert response == "生成的回复"
+    assert state["retrieved_docs"] == ["iPhone 15 Pro 售价7999元"]
+    assert len(calls) == 2
@@ -0,0 +1,45 @@
+"""流式回复测试"""
+import asyncio
+import json
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+from langraph_customer_service.llm_client import llm_client
+
+
+def collect(agent, message):
+    async def run():
+        return [event async for event in agent.astream_chat(message)]
+
+    return asyncio.run(run())
+
+
+def test_stream_forwards_only_response_tokens(monkeypatch):
+    intent = json.dumps({"intent": "general_chat", "entities": {}})
+    monkeypatch.setattr(llm_client, "client", FakeListChatModel(responses=[intent, "您好！"]))
+    agent = CustomerServiceAgent()
+
+    events = collect(agent, "你好")
+
+    tokens = [event["content"] for event in events if event["type"] == "token"]
+    assert "".join(tokens) == "您好！"
+    assert len(tokens) > 1
+    assert events[-1]["type"] == "end"
+    assert events[-1]["response"] == "您好！"
+    assert events[-1]["state"]["intent"] == "general_chat"
+
+
+def test_stream_sends_whole_response_when_not_streamed(monkeypatch):
+    async def ainvoke(messages, **kwargs):
+        if "意图分类器" in messages[0]["content"]:
+            return json.dumps({"intent": "general_chat", "entities": {}})
+        return "您好！"
+
+    monkeypatch.setattr(llm_client, "ainvoke", ainvoke)
+    agent = CustomerServiceAgent()
+
+    events = collect(agent, "你好")
+
+    assert [event["type"] for event in events] == ["token", "end"]
+    assert events[0]["content"] == "您好！"
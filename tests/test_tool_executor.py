@@ -0,0 +1,115 @@
+"""工具并发执行测试"""
+import asyncio
+import time
+
+import pytest
+
+from config import settings
+from langraph_customer_service.tools.executor import ToolExecutor, ToolRegistry
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "tool_retry_backoff", 0.0)
+
+
+def slow(seconds):
+    def tool(name):
+        time.sleep(seconds)
+        return {"success": True, "message": name, "data": None}
+    return tool
+
+
+def flaky(failures):
+    """前 failures 次调用抛出异常"""
+    state = {"calls": 0}
+
+    def tool():
+        state["calls"] += 1
+        if state["calls"] <= failures:
+            raise ConnectionError("upstream reset")
+        return {"success": True, "message": "ok", "data": None}
+    return tool, state
+
+
+def make_executor(tools, policies=None):
+    return ToolExecutor(ToolRegistry.from_tools(tools, policies or {}), max_workers=4)
+
+
+def call(tool, **args):
+    return {"intent": "test", "tool": tool, "args": args}
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_independent_calls_run_in_parallel(mode):
+    executor = make_executor({"a": slow(0.2), "b": slow(0.2), "c": slow(0.2)})
+    calls = [call("a", name="a"), call("b", name="b"), call("c", name="c")]
+
+    started = time.perf_counter()
+    records = executor.run(calls) if mode == "sync" else asyncio.run(executor.arun(calls))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.45
+    assert [record["result"]["message"] for record in records] == ["a", "b", "c"]
+    assert all(record["attempts"] == 1 for record in records)
+    executor.close()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_timeout_returns_failure_without_blocking_others(mode):
+    executor = make_executor(
+        {"fast": slow(0.0), "stuck": slow(1.0)},
+        {"stuck": {"timeout": 0.1, "retries": 0}}
+    )
+    calls = [call("stuck", name="stuck"), call("fast", name="fast")]
+
+    started = time.perf_counter()
+    records = executor.run(calls) if mode == "sync" else asyncio.run(executor.arun(calls))
+
+    assert time.perf_counter() - started < 0.5
+    assert records[0]["result"]["success"] is False
+    assert "超时" in records[0]["result"]["message"]
+    assert records[1]["result"]["success"] is True
+    assert executor.get_stats()["timeouts"] == 1
+    executor.close()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_exceptions_are_retried(mode):
+    tool, state = flaky(failures=2)
+    executor = make_executor({"flaky": tool}, {"flaky": {"retries": 2}})
+
+    records = executor.run([call("flaky")]) if mode == "sync" else asyncio.run(executor.arun([call("flaky")]))
+
+    assert records[0]["result"]["success"] is True
+    assert records[0]["attempts"] == 3
+    assert state["calls"] == 3
+    stats = executor.get_stats()
+    assert (stats["retries"], stats["errors"]) == (2, 2)
+    executor.close()
+
+
+def test_side_effect_tools_are_not_retried():
+    tool, state = flaky(failures=1)
+    executor = make_executor({"refund": tool}, {"refund": {"retries": 0}})
+
+    record = executor.run([call("refund")])[0]
+
+    assert record["result"]["success"] is False
+    assert "upstream reset" in record["result"]["message"]
+    assert state["calls"] == 1
+    executor.close()
+
+
+def test_async_tools_and_unknown_tool():
+    async def lookup(order_id):
+        await asyncio.sleep(0)
+        return {"success": True, "message": "", "data": order_id}
+
+    executor = make_executor({"lookup": lookup})
+
+    assert executor.run([call("lookup", order_id="ORD001")])[0]["result"]["data"] == "ORD001"
+    assert asyncio.run(executor.arun([call("lookup", order_id="ORD002")]))[0]["result"]["data"] == "ORD002"
+    with pytest.raises(ValueError):
+        executor.run([call("missing")])
+    executor.close()
@@ -0,0 +1,61 @@
+"""工具调用规划测试"""
+import asyncio
+
+from langraph_customer_service.agents.customer_service import CustomerServiceAgent
+
+
+ORDER = {"order_id": "ORD001", "status": "已发货", "tracking_number": "SF123"}
+
+
+def order_record():
+    return {
+        "intent": "order_query",
+        "tool": "query_order",
+        "args": {"order_id": "ORD001"},
+        "result": {"success": True, "message": "", "data": ORDER}
+    }
+
+
+def test_refund_does_not_reuse_order_from_previous_turns():
+    agent = CustomerServiceAgent()
+
+    calls, _, missing = agent._plan_tool_calls(["refund_request"], {"order_id": "ORD001"}, [order_record()])
+
+    assert missing == []
+    assert calls[0]["tool"] == "process_refund"
+    assert "order" not in calls[0]["args"]
+
+
+def test_refund_reuses_order_from_same_turn():
+    agent = CustomerServiceAgent()
+    record = order_record()
+
+    calls, _, _ = agent._plan_tool_calls(["refund_request"], {"order_id": "ORD001"}, [record], [record])
+
+    assert calls[0]["args"]["order"] == ORDER
+
+
+def test_logistics_uses_tracking_number_from_history():
+    agent = CustomerServiceAgent()
+
+    calls, deferred, _ = agent._plan_tool_calls(["logistics_query"], {}, [order_record()])
+
+    assert deferred == []
+    assert calls == [{"intent": "logistics_query", "tool": "get_logistics_info", "args": {"tracking_number": "SF123"}}]
+
+
+def test_logistics_waits_for_order_in_same_turn():
+    agent = CustomerServiceAgent()
+    state = {
+        "intent": "order_query",
+        "entities": {"order_id": "ORD001"},
+        "context": {"intents": ["order_query", "logistics_query"]},
+        "tool_calls": [],
+        "messages": []
+    }
+
+    records = asyncio.run(agent._acall_tools(state))["tool_calls"]
+
+    assert [record["tool"] for record in records] == ["query_order", "get_logistics_info"]
+    assert records[1]["args"]["tracking_number"] == records[0]["result"]["data"]["tracking_number"]
+    assert all(record["result"]["success"] for record in records)
@@ -0,0 +1,92 @@
+"""文档向量读取与近重复检测测试"""
+import numpy as np
+import pytest
+
+from config import settings
+from langraph_customer_service.knowledge_base import KnowledgeBase
+
+
+class TableModel:
+    """按预设表返回向量的嵌入模型替身"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def encode(self, sentences, **kwargs):
+        return np.stack([self.table[text] for text in sentences])
+
+
+def unit(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype("float32")
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """两个段共 40 条文档，其中 doc3 / doc25 和 doc7 / doc8 为近重复"""
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    vectors = unit(np.random.default_rng(0).standard_normal((40, 32)))
+    vectors[25] = unit(vectors[3:4] + 0.01)[0]
+    vectors[8] = unit(vectors[7:8] + 0.02)[0]
+    texts = [f"文档{i}" for i in range(40)]
+    model = TableModel(dict(zip(texts, vectors)))
+    return texts, vectors, model
+
+
+def make_kb(corpus):
+    texts, _, model = corpus
+    kb = KnowledgeBase()
+    kb.model = model
+    ids = kb.add_documents(texts[:20])
+    kb.save()
+    ids += kb.add_documents(texts[20:])
+    return kb, ids
+
+
+def test_get_vectors_across_segments(corpus):
+    kb, ids = make_kb(corpus)
+    vectors = corpus[1]
+
+    got = kb.get_vectors([ids[30], ids[2], ids[25]])
+
+    np.testing.assert_allclose(got, vectors[[30, 2, 25]], atol=1e-6)
+    assert got.dtype == np.float32
+    with pytest.raises(KeyError):
+        kb.get_vectors([ids[0], "missing"])
+
+
+def test_iter_vectors_skips_deleted(corpus):
+    kb, ids = make_kb(corpus)
+    kb.delete_documents([ids[1], ids[21]])
+
+    blocks = list(kb.iter_vectors(block_size=7))
+
+    seen = [doc_id for block_ids, _ in blocks for doc_id in block_ids]
+    assert seen == [doc_id for doc_id in ids if doc_id not in (ids[1], ids[21])]
+    assert max(len(block_ids) for block_ids, _ in blocks) == 7
+
+
+@pytest.mark.parametrize("block_size", [3, 16, 4096])
+def test_find_near_duplicates_matches_brute_force(corpus, block_size):
+    kb, ids = make_kb(corpus)
+    vectors = corpus[1]
+
+    pairs = kb.find_near_duplicates(threshold=0.9, block_size=block_size)
+
+    scores = np.triu(vectors @ vectors.T, k=1)
+    expected = {(ids[a], ids[b]) for a, b in zip(*np.nonzero(scores >= 0.9))}
+    assert {(pair["id_a"], pair["id_b"]) for pair in pairs} == expected == {(ids[3], ids[25]), (ids[7], ids[8])}
+    assert pairs[0]["score"] >= pairs[1]["score"]
+
+
+def test_float16_vectors_round_trip(corpus, monkeypatch):
+    monkeypatch.setattr(settings, "kb_vector_dtype", "float16")
+    kb, ids = make_kb(corpus)
+    kb.save()
+
+    loaded = KnowledgeBase()
+    assert loaded.load()
+    loaded.model = corpus[2]
+
+    assert loaded.segments[0].vectors().dtype == np.float16
+    np.testing.assert_allclose(loaded.get_vectors(ids), corpus[1], atol=1e-3)
+    assert loaded.search("文档5", top_k=1, score_threshold=-1)[0]["document"] == "文档5"
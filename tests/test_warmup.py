@@ -0,0 +1,97 @@
+"""启动预热与就绪检查测试"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from api import main
+from config import settings
+from langraph_customer_service.knowledge_base import CrossEncoderReranker, KnowledgeBase
+from langraph_customer_service.knowledge_base import embeddings, vector_store
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, **kwargs):
+        self.calls.append(len(sentences))
+        vectors = np.ones((len(sentences), 8), dtype="float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def readiness(monkeypatch):
+    state = {"status": "loading", "phase": "startup"}
+    monkeypatch.setattr(main, "readiness", state)
+    monkeypatch.setattr(main, "startup_timings", {})
+    return state
+
+
+def test_kb_warm_up_loads_model_encodes_and_searches(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    monkeypatch.setattr(settings, "embedding_service_address", "")
+    model = CountingModel()
+    monkeypatch.setattr(vector_store, "load_local_embedding_model", lambda: model)
+    kb = KnowledgeBase()
+    kb.add_documents(["文档一", "文档二"])
+    model.calls.clear()
+
+    timings = kb.warm_up(rounds=2)
+
+    texts = len(vector_store.WARMUP_TEXTS)
+    assert model.calls == ([1] * texts + [texts]) * 2
+    assert set(timings) == {"model", "encode", "search"}
+    # 合成查询不进入查询向量缓存
+    assert kb.query_cache is None or kb.query_cache.get(vector_store.WARMUP_TEXTS[0]) is None
+
+
+def test_reranker_warm_up_scores_once():
+    reranker = CrossEncoderReranker(batch_size=8)
+    scored = []
+    reranker._model = SimpleNamespace(predict=lambda pairs, **kwargs: scored.append(len(pairs)) or np.zeros(len(pairs)))
+
+    assert reranker.warm_up() >= 0
+    assert scored == [4]
+
+
+def test_ready_returns_503_until_warm_up_finishes(readiness, monkeypatch):
+    warmed = []
+    kb = SimpleNamespace(warm_up=lambda: warmed.append("kb") or {"encode": 1.0})
+    monkeypatch.setattr(main, "agent", SimpleNamespace(knowledge_base=kb, reranker=None))
+
+    response = asyncio.run(main.ready())
+    assert response.status_code == 503
+    assert asyncio.run(main.health_check()).status == "loading"
+
+    asyncio.run(main._run_warmup())
+
+    assert warmed == ["kb"]
+    assert asyncio.run(main.ready())["status"] == "ready"
+    assert main.startup_timings["warmup"]["knowledge_base"] == {"encode": 1.0}
+
+
+def test_failed_warm_up_still_turns_ready(readiness, monkeypatch):
+    def fail():
+        raise RuntimeError("模型文件损坏")
+
+    monkeypatch.setattr(main, "agent", SimpleNamespace(knowledge_base=SimpleNamespace(warm_up=fail), reranker=None))
+
+    asyncio.run(main._run_warmup())
+
+    assert readiness["status"] == "ready"
+    assert readiness["warmup_error"] == "模型文件损坏"
+
+
+def test_configure_inference_threads_sets_env(monkeypatch):
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        monkeypatch.delenv(name, raising=False)
+
+    embeddings.configure_inference_threads(threads=0, interop_threads=0)
+    assert "OMP_NUM_THREADS" not in os.environ
+
+    embeddings.configure_inference_threads(threads=2, interop_threads=0)
+    assert os.environ["OMP_NUM_THREADS"] == "2"
+    assert os.environ["MKL_NUM_THREADS"] == "2"